@@ -3,6 +3,8 @@ import streamlit as st # First Streamlit import
 import pandas as pd # Keep pandas import if used elsewhere or for potential debugging
 import os # Example of another standard/3rd party import
 import json # Example
+import time
+script_run_started = time.perf_counter() # For the time-to-first-render log below
 
 # --- Page Configuration (MUST BE THE FIRST STREAMLIT COMMAND) ---
 st.set_page_config(page_title="🧠 QueryPath SQL", layout="wide", initial_sidebar_state="expanded")
@@ -13,10 +15,10 @@ from core.session_state_manager import (
     initialize_session_state,
     get_current_user_query,
     navigate_to_challenge,
-    is_challenge_already_solved_in_session
+    is_challenge_already_solved_in_session,
+    has_pending_grading
 )
 from core.data_loader import get_challenge, get_max_challenges_for_day, get_total_days
-from core.db_connector import get_connection
 
 # UI imports
 from ui.sidebar import display_sidebar
@@ -27,7 +29,9 @@ from ui.challenge_display import (
 )
 from ui.query_input import display_query_area
 from ui.navigation import display_navigation_buttons
-from ui.feedback_display import display_feedback, handle_query_execution
+from ui.feedback_display import display_feedback, submit_query_for_grading, collect_grading_result
+from core.grading_executor import GRADING_POLL_SECONDS
+from core.rag_helper import start_hint_system_warmup
 
 
 # --- Initialize Session State ---
@@ -46,6 +50,10 @@ st.markdown(
 )
 st.divider()
 
+# --- Pick up a finished background grading result ---
+# Before anything renders, so points, solved state and buttons reflect it on this run
+grading_pending = collect_grading_result()
+
 # --- Sidebar ---
 display_sidebar()
 
@@ -84,12 +92,9 @@ with col_solution_area:
     # 3. Handle Query Execution if "Run Query" was clicked (won't happen if already solved)
     if run_button_clicked: # This condition implicitly checks if not already solved
         st.session_state.show_balloons_once = False # Reset balloon flag for a fresh run
-        db_conn = get_connection()
-        if db_conn:
-            handle_query_execution(current_query_in_box, db_conn, current_challenge_data)
-            # After execution, the solved state is updated.
-        else:
-            st.error("❌ Critical Error: Could not establish database connection.")
+        # Graded on the executor's threads; this script run doesn't wait for the SQL
+        # (a resubmitted query is answered straight from the result cache)
+        grading_pending = submit_query_for_grading(current_query_in_box, current_challenge_data)
 
     # 4. Display Navigation Buttons (Previous / Conditional Next)
     # This will read the potentially updated solved state.
@@ -100,7 +105,8 @@ with col_solution_area:
     # Ensure current_challenge_data is passed for the RAG hint button context
     display_feedback(
         current_challenge_data.get("expected_output", []),
-        current_challenge_data
+        current_challenge_data,
+        grading_pending=grading_pending
     )
 
 
@@ -113,5 +119,18 @@ with st.expander("🤔 Reflection & Hints", expanded=False):
         st.session_state.current_challenge_index
     )
 
+# --- Warm up the hint system after the first render ---
+# The embedding model and Chroma load in a background thread instead of at import time,
+# so they no longer delay the first page; a hint click before it finishes just waits.
+if start_hint_system_warmup():
+    print(f"INFO: First page rendered in {time.perf_counter() - script_run_started:.2f}s; warming up hint system.")
+
+# --- Poll for pending grading results ---
+# After the page has rendered, so the learner sees the pending state while waiting. Keeps
+# going while any challenge has a submission out, not only the one on screen.
+if grading_pending or has_pending_grading():
+    time.sleep(GRADING_POLL_SECONDS)
+    st.rerun()
+
 # --- Debugging (Optional) ---
 # (Commented out debug code remains the same)
\ No newline at end of file
@@ -0,0 +1,62 @@
+# benchmark_hint_retrieval.py
+# Compares the two hint retrievers in core/rag_helper.py: the persistent Chroma collection
+# and the NumPy brute-force index exported next to it. Checks that both return the same
+# hints in the same order, then reports per-lookup latency and resident memory.
+# Query vectors are hint embeddings plus noise, so no embedding model is needed.
+# Chroma is opened on a temporary copy so the committed database is never modified.
+# Run from the project root: python benchmark_hint_retrieval.py
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from core.hint_index import NumpyHintIndex
+from core.rag_helper import CHROMA_DB_PATH, COLLECTION_NAME, search_hint_documents
+
+QUERIES = 500
+TOP_K = 2
+NOISE_SCALE = 0.05 # Relative to a unit-length embedding
+
+def resident_mb():
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+def make_query_vectors(index, count, seed=0):
+    rng = np.random.default_rng(seed)
+    base = np.asarray(index.embeddings)[rng.integers(0, index.count(), size=count)]
+    return base + rng.normal(scale=NOISE_SCALE, size=base.shape)
+
+def time_lookups(hints_collection, query_vectors):
+    results = []
+    started = time.perf_counter()
+    for vector in query_vectors:
+        results.append(search_hint_documents(hints_collection, vector.tolist(), TOP_K))
+    return results, (time.perf_counter() - started) / len(query_vectors)
+
+if __name__ == "__main__":
+    print("--- Hint retrieval: NumPy index vs ChromaDB ---")
+    before = resident_mb()
+    numpy_index = NumpyHintIndex()
+    numpy_mb = resident_mb() - before
+    query_vectors = make_query_vectors(numpy_index, QUERIES)
+    numpy_results, numpy_seconds = time_lookups(numpy_index, query_vectors)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chroma_copy = os.path.join(tmp, "chroma")
+        shutil.copytree(CHROMA_DB_PATH, chroma_copy)
+        before = resident_mb()
+        import chromadb
+        chroma_collection = chromadb.PersistentClient(path=chroma_copy).get_collection(COLLECTION_NAME)
+        chroma_results, chroma_seconds = time_lookups(chroma_collection, query_vectors)
+        chroma_mb = resident_mb() - before
+
+    mismatches = sum(1 for a, b in zip(numpy_results, chroma_results) if a != b)
+    print(f"Hints indexed: {numpy_index.count()}, lookups: {QUERIES}, top_k: {TOP_K}")
+    print(f"Identical results: {QUERIES - mismatches}/{QUERIES}")
+    print(f"NumPy  per lookup: {numpy_seconds * 1e6:8.1f} us   RSS added: {numpy_mb:6.1f} MB")
+    print(f"Chroma per lookup: {chroma_seconds * 1e6:8.1f} us   RSS added: {chroma_mb:6.1f} MB (incl. client import)")
+    if mismatches:
+        raise SystemExit(f"ERROR: {mismatches} lookups returned different hints")
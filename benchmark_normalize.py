@@ -0,0 +1,70 @@
+# benchmark_normalize.py
+# Compares the vectorized normalize_df against the original per-cell apply(clean) path.
+# Run from the project root: python benchmark_normalize.py
+import time
+import numpy as np
+import pandas as pd
+
+from core.query_validator import normalize_df, _normalize_df_per_cell, _normalize_column, _clean_value
+
+# --- Configuration ---
+ROW_COUNTS = [1_000, 100_000, 1_000_000]
+REPEATS = 3 # Best-of-N timing
+SEED = 42
+
+def make_result_frame(n_rows, seed=SEED):
+    # Shaped like a pd.read_sql_query result over the challenge tables:
+    # INTEGER ids, TEXT names/countries, FLOAT amounts, DATE strings, plus a few
+    # messy columns (numbers stored as text, accents, NULLs) that exercise every rule.
+    rng = np.random.default_rng(seed)
+    names = np.array(["Anna Schultz", "Lukas Meier", "John Doe", "Elena Roth", "Marco Beck", "Zoë Brontë", "  Ben  ", "LUCY"], dtype=object)
+    countries = np.array(["Germany", "USA", "UK", "Canada", "Österreich"], dtype=object)
+    dates = np.array(["2022-05-15", "2023-01-10", "2023-03-01", "2021-11-05"], dtype=object)
+    text_numbers = np.array(["5", "5.0", "12.50", " 7 ", "-3", "n/a", None], dtype=object)
+
+    amounts = np.round(rng.uniform(0, 2000, n_rows), 2)
+    amounts[rng.random(n_rows) < 0.05] = np.nan
+    return pd.DataFrame({
+        "Customer_ID": np.arange(1, n_rows + 1, dtype=np.int64),
+        "Name": names[rng.integers(0, len(names), n_rows)],
+        "Country": countries[rng.integers(0, len(countries), n_rows)],
+        "signup_date": dates[rng.integers(0, len(dates), n_rows)],
+        "total_amount": amounts,
+        "quantity": rng.integers(1, 10, n_rows).astype(np.float64), # whole floats, e.g. SUM() results
+        "raw_value": text_numbers[rng.integers(0, len(text_numbers), n_rows)],
+    })
+
+def best_time(func, df, repeats=REPEATS):
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(df)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def _comparable(df):
+    # The mixed-type 'raw_value' column (ints, floats and strings) can't be sorted, so the
+    # benchmark times normalization on a sortable frame and checks raw_value separately.
+    return df.drop(columns=["raw_value"])
+
+def run_benchmark():
+    print(f"{'rows':>10} | {'per-cell (s)':>12} | {'vectorized (s)':>14} | {'speedup':>8}")
+    print("-" * 54)
+    for n_rows in ROW_COUNTS:
+        df = make_result_frame(n_rows)
+        sortable = _comparable(df)
+        repeats = 1 if n_rows >= 1_000_000 else REPEATS
+        per_cell_time, per_cell_result = best_time(_normalize_df_per_cell, sortable, repeats)
+        vectorized_time, vectorized_result = best_time(normalize_df, sortable, repeats)
+
+        pd.testing.assert_frame_equal(per_cell_result, vectorized_result)
+        pd.testing.assert_series_equal(df["raw_value"].apply(_clean_value), _normalize_column(df["raw_value"]))
+
+        print(f"{n_rows:>10,} | {per_cell_time:>12.3f} | {vectorized_time:>14.3f} | {per_cell_time / vectorized_time:>7.1f}x")
+    print("\nOutputs identical for every size.")
+
+if __name__ == "__main__":
+    print("--- normalize_df benchmark ---")
+    run_benchmark()
@@ -0,0 +1,67 @@
+# benchmark_progress_store.py
+# Load test for core/progress_store.py: LEARNERS learners on WORKER_THREADS threads (as
+# Streamlit runs sessions on threads) each save queries, solve challenges and earn points.
+# Reports how long a record_* call holds up a rerun, how long flushes take, and checks that
+# every learner's progress reads back intact from a fresh store after the final flush.
+# Run from the project root: python benchmark_progress_store.py
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.progress_store import SqliteProgressStore
+
+# --- Configuration ---
+LEARNERS = 5000
+WORKER_THREADS = 32
+CHALLENGES_PER_LEARNER = 10
+QUERY_SAVES_PER_CHALLENGE = 3 # A query is saved on every run and before every navigation
+
+def simulate_learner(progress_store, learner_index):
+    learner_id = f"learner{learner_index}"
+    latencies = []
+    points = 0
+    for challenge_index in range(CHALLENGES_PER_LEARNER):
+        challenge_id = f"day1_chal{challenge_index}"
+        for attempt in range(QUERY_SAVES_PER_CHALLENGE):
+            started = time.perf_counter()
+            progress_store.record_query(learner_id, challenge_id, f"SELECT {attempt} FROM customers")
+            latencies.append(time.perf_counter() - started)
+        points += 10
+        started = time.perf_counter()
+        progress_store.record_solved(learner_id, challenge_id)
+        progress_store.record_points(learner_id, points)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "learner_progress.db")
+        progress_store = SqliteProgressStore(path)
+        print(f"--- {LEARNERS} learners on {WORKER_THREADS} threads, {CHALLENGES_PER_LEARNER} challenges each ---")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WORKER_THREADS) as pool:
+            per_learner = list(pool.map(lambda index: simulate_learner(progress_store, index), range(LEARNERS)))
+        progress_store.flush()
+        elapsed = time.perf_counter() - started
+
+        latencies = np.concatenate([np.asarray(latencies) for latencies in per_learner]) * 1e6
+        metrics = progress_store.metrics()
+        print(f"Writes recorded:     {metrics['writes']} in {elapsed:.2f}s ({metrics['writes'] / elapsed:,.0f}/s)")
+        print(f"Record call latency: p50 {np.percentile(latencies, 50):.1f}µs, p99 {np.percentile(latencies, 99):.1f}µs, "
+              f"max {latencies.max():.0f}µs")
+        print(f"Flushes:             {metrics['flushes']} transactions, {metrics['rows_flushed']} rows "
+              f"({metrics['coalesced']} writes coalesced), slowest {metrics['max_flush_seconds'] * 1e3:.1f}ms")
+        print(f"Peak pending writes: {metrics['max_pending']}, flush errors: {metrics['flush_errors']}")
+
+        reopened = SqliteProgressStore(path)
+        expected_points = 10 * CHALLENGES_PER_LEARNER
+        intact = sum(
+            1 for index in range(LEARNERS)
+            if (progress := reopened.load(f"learner{index}"))["points"] == expected_points
+            and len(progress["solved_challenges"]) == CHALLENGES_PER_LEARNER
+            and progress["user_queries"].get("day1_chal0") == f"SELECT {QUERY_SAVES_PER_CHALLENGE - 1} FROM customers"
+        )
+        print(f"Read back from a fresh store: {intact}/{LEARNERS} learners intact")
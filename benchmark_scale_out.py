@@ -0,0 +1,171 @@
+# benchmark_scale_out.py
+# Multi-process load test for the shared state backend (core/state_backend.py).
+# Each worker process stands in for one Streamlit server behind a load balancer: it owns
+# its own learners (a session stays on the worker it connected to) and, for DURATION_SECONDS,
+# handles "Run Query" requests the way app.py does: result cache lookup (local, then the
+# shared store), grading on a miss, then saving the query, solved state and points.
+# Throughput is reported for 1, 2, 4, ... workers, plus how many results one worker graded
+# and another reused, and whether every learner's progress reads back afterwards.
+# Before the load test, both backend implementations get the same quick round trip check
+# (the Redis one runs on fakeredis when it is installed).
+# Run from the project root:
+#   python benchmark_scale_out.py                      (local SQLite backend)
+#   python benchmark_scale_out.py --redis-url redis://localhost:6379/0
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import pandas as pd
+
+from core.challenge_catalog import get_challenge_catalog
+from core.data_loader import CHALLENGES_DIR
+from core.db_connector import DB_PATH
+from core.grading_executor import grade_submission, is_cacheable_outcome
+from core.query_validator import compile_expected_output
+from core.result_cache import get_cached_result, get_result_cache_stats, make_result_cache_key, store_result
+from core.result_preview import compact_preview
+from core.session_state_manager import get_challenge_id
+from core.state_backend import configure_state_backend, create_redis_backend, create_sqlite_backend
+
+# --- Configuration ---
+WORKER_COUNTS = [1, 2, 4, 8]
+DURATION_SECONDS = 5.0
+LEARNERS_PER_WORKER = 200
+QUERY_VARIANTS = 400 # Distinct (canonical) queries per challenge; learners pick among them
+
+def make_backend(spec):
+    if spec["kind"] == "redis":
+        import redis
+        client = redis.Redis.from_url(spec["url"])
+        return create_redis_backend(client, prefix=spec["prefix"])
+    return create_sqlite_backend(spec["progress_path"], spec["result_path"])
+
+def query_variant(challenge, variant):
+    # Same rows as the expected query, different canonical text: a distinct cache key
+    expected_query = challenge["expected_query"].strip().rstrip(";")
+    return f"SELECT * FROM ({expected_query}) AS attempt_{variant}"
+
+def run_worker(worker_index, spec, start_barrier, results):
+    state_backend = make_backend(spec)
+    configure_state_backend(state_backend)
+    catalog = get_challenge_catalog(CHALLENGES_DIR)
+    challenges = [(get_challenge_id(day, index), challenge) for (day, index), challenge in catalog.challenges.items()]
+    compiled = {challenge_id: compile_expected_output(challenge["expected_output"]) for challenge_id, challenge in challenges}
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+    rng = random.Random(worker_index)
+    learners = [f"{spec['prefix']}w{worker_index}-learner{index}" for index in range(LEARNERS_PER_WORKER)]
+    points = dict.fromkeys(learners, 0)
+    solved = {learner_id: set() for learner_id in learners}
+
+    start_barrier.wait() # The clock starts once every worker has imported and loaded the catalog
+    started = time.time()
+    for learner_id in learners:
+        state_backend.progress.load(learner_id) # Session start
+    requests, graded = 0, 0
+    deadline = started + DURATION_SECONDS # Same window for every worker, so requests add up to a rate
+    while time.time() < deadline:
+        learner_id = rng.choice(learners)
+        challenge_id, challenge = rng.choice(challenges)
+        user_query = query_variant(challenge, rng.randrange(QUERY_VARIANTS))
+        cache_key = make_result_cache_key(challenge_id, user_query, catalog.version)
+        outcome = get_cached_result(cache_key)
+        if outcome is None:
+            outcome = grade_submission(user_query, conn, challenge, compiled[challenge_id])
+            graded += 1
+            if is_cacheable_outcome(outcome):
+                store_result(cache_key, outcome)
+        state_backend.progress.record_query(learner_id, challenge_id, user_query)
+        if outcome.get("is_correct") and challenge_id not in solved[learner_id]:
+            solved[learner_id].add(challenge_id)
+            points[learner_id] += 10
+            state_backend.progress.record_solved(learner_id, challenge_id)
+            state_backend.progress.record_points(learner_id, points[learner_id])
+        requests += 1
+    state_backend.flush()
+    conn.close()
+    results.put({"worker": worker_index, "requests": requests, "graded": graded,
+                 "cache": get_result_cache_stats(), "progress": points, "solved": solved})
+
+def run_load(spec, worker_count):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    start_barrier = context.Barrier(worker_count)
+    workers = [context.Process(target=run_worker, args=(index, spec, start_barrier, results))
+               for index in range(worker_count)]
+    for worker in workers:
+        worker.start()
+    worker_results = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    return worker_results
+
+def verify_progress(spec, worker_results):
+    # A fresh backend (as a worker a learner reconnects to would open) sees what each worker wrote
+    state_backend = make_backend(spec)
+    intact, total = 0, 0
+    for result in worker_results:
+        for learner_id, learner_points in result["progress"].items():
+            progress = state_backend.progress.load(learner_id)
+            total += 1
+            intact += (progress["points"] == learner_points
+                       and progress["solved_challenges"] == result["solved"][learner_id])
+    return intact, total
+
+def check_backend(name, state_backend):
+    """Round trip through one backend: progress written, flushed and read back; a result stored and read back."""
+    learner_id = f"check-{time.time_ns()}"
+    state_backend.progress.record_query(learner_id, "day1_chal0", "SELECT 1")
+    state_backend.progress.record_solved(learner_id, "day1_chal0")
+    state_backend.progress.record_points(learner_id, 10)
+    state_backend.flush()
+    progress = state_backend.progress.load(learner_id)
+    outcome = {"preview": compact_preview(pd.DataFrame({"name": ["Anna", "Lukas"], "total": [1.5, None]})),
+               "is_correct": True, "row_count": 2, "row_count_is_exact": True}
+    cache_key = make_result_cache_key("day1_chal0", f"select {learner_id}", "check")
+    state_backend.results.put(cache_key, outcome)
+    stored = state_backend.results.get(cache_key)
+    ok = (progress == {"points": 10, "solved_challenges": {"day1_chal0"}, "user_queries": {"day1_chal0": "SELECT 1"}}
+          and stored is not None and stored["is_correct"] and stored["preview"].to_frame().equals(outcome["preview"].to_frame())
+          and not any(array.flags.writeable for array in stored["preview"].arrays))
+    print(f"  {name}: {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process load test for the shared state backend.")
+    parser.add_argument("--redis-url", help="Run the load test against this Redis server instead of local SQLite")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        print("--- Backend round trip check ---")
+        check_backend("sqlite", create_sqlite_backend(os.path.join(temp_dir, "check_progress.db"),
+                                                      os.path.join(temp_dir, "check_results.db")))
+        try:
+            import fakeredis
+            check_backend("redis (fakeredis)", create_redis_backend(fakeredis.FakeRedis()))
+        except ImportError:
+            print("  redis (fakeredis): skipped, fakeredis is not installed")
+
+        print(f"\n--- Load test: {DURATION_SECONDS:.0f}s per run, {LEARNERS_PER_WORKER} learners per worker, "
+              f"{os.cpu_count()} CPUs ---")
+        baseline = None
+        for worker_count in WORKER_COUNTS:
+            if args.redis_url:
+                spec = {"kind": "redis", "url": args.redis_url, "prefix": f"querypath-loadtest-{time.time_ns()}:"}
+            else:
+                run_dir = tempfile.mkdtemp(dir=temp_dir)
+                spec = {"kind": "sqlite", "prefix": "", "progress_path": os.path.join(run_dir, "learner_progress.db"),
+                        "result_path": os.path.join(run_dir, "shared_result_cache.db")}
+            worker_results = run_load(spec, worker_count)
+            requests = sum(result["requests"] for result in worker_results)
+            graded = sum(result["graded"] for result in worker_results)
+            shared_hits = sum(result["cache"]["shared_hits"] for result in worker_results)
+            throughput = requests / DURATION_SECONDS
+            baseline = baseline or throughput
+            intact, total = verify_progress(spec, worker_results)
+            print(f"{worker_count} worker(s): {throughput:8,.0f} requests/s ({throughput / baseline:.1f}x), "
+                  f"{graded} graded, {shared_hits} answered from another worker's result, "
+                  f"progress intact for {intact}/{total} learners")
@@ -0,0 +1,91 @@
+# benchmark_session_memory.py
+# Memory held per session for challenge data, at 1,000 concurrent sessions.
+#   Before: load_challenge_file_data was st.cache_data-cached (each call unpickles a fresh
+#           copy) and also stored its result in st.session_state.challenges_data_cache,
+#           so every session kept its own copy of every day it visited.
+#   After:  one process-wide catalog; sessions only hold references to its read-only views.
+# Each session below visits every day, as a learner who works through the course does.
+# The second part does the same for stored run results (set_last_run_output): records of
+# row dicts per challenge before, compact column previews (shared through the result
+# cache, or private when not cached) after.
+# Run from the project root: python benchmark_session_memory.py
+import json
+import pickle
+import tracemalloc
+
+import pandas as pd
+
+from core.challenge_catalog import CHALLENGE_CATALOG_PATH, get_challenge_catalog, read_day_sources
+from core.data_loader import CHALLENGES_DIR
+from core.result_preview import compact_preview
+from core.session_state_manager import LastRunOutput, get_session_result_memory
+
+SESSIONS = 1000
+
+def sessions_before(sources):
+    sessions = []
+    for _ in range(SESSIONS):
+        # What st.cache_data handed back (a fresh unpickled copy) was kept in session state
+        cache = {day: pickle.loads(pickle.dumps(data)) for day, data in sources.items()}
+        sessions.append({"challenges_data_cache": cache,
+                         "max_challenges_per_day": {day: len(data["challenges"]) for day, data in cache.items()}})
+    return sessions
+
+def sessions_after(catalog):
+    sessions = []
+    for _ in range(SESSIONS):
+        # A session only ever holds what get_challenge returned: a shared view
+        sessions.append({"current_challenge": catalog.get(1, 0)})
+        for day in range(1, catalog.total_days() + 1):
+            for challenge_index in range(catalog.challenge_count(day)):
+                sessions[-1]["current_challenge"] = catalog.get(day, challenge_index)
+    return sessions
+
+def result_frames(catalog):
+    # A learner's result for each challenge: here, the expected output itself
+    return {f"day{day}_chal{index}": pd.DataFrame(list(challenge["expected_output"]))
+            for (day, index), challenge in catalog.challenges.items()}
+
+def results_before(frames):
+    return [{challenge_id: {"output_df": df.to_dict('records'), "is_correct": True, "error_message": None,
+                            "row_count": len(df), "row_count_is_exact": True, "budget_message": None}
+             for challenge_id, df in frames.items()} for _ in range(SESSIONS)]
+
+def results_after(frames, shared):
+    previews = {challenge_id: compact_preview(df) for challenge_id, df in frames.items()}
+    return [{challenge_id: LastRunOutput(previews[challenge_id] if shared else compact_preview(df),
+                                         True, None, len(df), True, None)
+             for challenge_id, df in frames.items()} for _ in range(SESSIONS)]
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+if __name__ == "__main__":
+    sources, _ = read_day_sources(CHALLENGES_DIR)
+    source_bytes = sum(len(json.dumps(data)) for data in sources.values())
+    print(f"--- Challenge data memory at {SESSIONS} sessions ({len(sources)} days, {source_bytes / 1e3:.0f} KB of JSON) ---")
+
+    catalog, catalog_bytes = measure(lambda: get_challenge_catalog(CHALLENGES_DIR, CHALLENGE_CATALOG_PATH))
+    _, before_bytes = measure(lambda: sessions_before(sources))
+    _, after_bytes = measure(lambda: sessions_after(catalog))
+
+    print(f"Before (per-session copies): {before_bytes / 1e6:8.2f} MB total, {before_bytes / SESSIONS / 1e3:8.1f} KB per session")
+    print(f"After  (shared catalog):     {after_bytes / 1e6:8.2f} MB total, {after_bytes / SESSIONS / 1e3:8.1f} KB per session")
+    print(f"Shared catalog, once per process: {catalog_bytes / 1e6:.2f} MB")
+    print(f"Per-session reduction: {(before_bytes - after_bytes) / SESSIONS / 1e3:.1f} KB "
+          f"({before_bytes / max(after_bytes, 1):.0f}x less)")
+
+    frames = result_frames(catalog)
+    _, before_bytes = measure(lambda: results_before(frames))
+    _, private_bytes = measure(lambda: results_after(frames, shared=False))
+    shared_sessions, shared_bytes = measure(lambda: results_after(frames, shared=True))
+    print(f"\n--- Stored run results at {SESSIONS} sessions ({len(frames)} challenges run per session) ---")
+    print(f"Before (to_dict('records')):    {before_bytes / SESSIONS / 1e3:8.1f} KB per session")
+    print(f"After, previews not shared:     {private_bytes / SESSIONS / 1e3:8.1f} KB per session")
+    print(f"After, previews from the cache: {shared_bytes / SESSIONS / 1e3:8.1f} KB per session")
+    report = get_session_result_memory(shared_sessions[0])
+    print(f"get_session_result_memory() for one session: {report}")
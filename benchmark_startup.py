@@ -0,0 +1,47 @@
+# benchmark_startup.py
+# Measures what the first page render waits for, with the hint system loaded lazily
+# (current behavior) versus eagerly at import time (previous behavior of core/rag_helper.py).
+# Each measurement runs in a fresh interpreter so module and model caches start cold.
+# Run from the project root: python benchmark_startup.py
+import subprocess
+import sys
+
+RUNS = 3 # Best-of-N cold starts
+
+# Everything app.py imports before it can draw the page
+APP_IMPORTS = (
+    "import core.session_state_manager, core.data_loader, core.db_connector;"
+    "import ui.sidebar, ui.challenge_display, ui.query_input, ui.navigation, ui.feedback_display"
+)
+
+LAZY_SNIPPET = f"""
+import time
+started = time.perf_counter()
+{APP_IMPORTS}
+print(time.perf_counter() - started)
+"""
+
+# The old module did this at import: load the model and open Chroma before returning
+EAGER_SNIPPET = f"""
+import time
+started = time.perf_counter()
+{APP_IMPORTS}
+from core.rag_helper import get_hint_system
+get_hint_system()
+print(time.perf_counter() - started)
+"""
+
+def cold_start_seconds(snippet):
+    timings = []
+    for _ in range(RUNS):
+        completed = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, check=True)
+        timings.append(float(completed.stdout.strip().splitlines()[-1]))
+    return min(timings)
+
+if __name__ == "__main__":
+    print("--- Time to first render: hint system lazy vs eager ---")
+    lazy = cold_start_seconds(LAZY_SNIPPET)
+    eager = cold_start_seconds(EAGER_SNIPPET)
+    print(f"Eager (model + Chroma loaded at import): {eager:.2f}s")
+    print(f"Lazy  (loaded after first paint):        {lazy:.2f}s")
+    print(f"Saved on the critical path:              {eager - lazy:.2f}s")
@@ -0,0 +1,15 @@
+# build_challenge_catalog.py
+# Packs challenges/dayN.json into the single indexed catalog the app loads
+# (data/challenge_catalog.db). Run after editing challenges, e.g. after
+# validate_and_correct_challenges.py has corrected them.
+# Run from the project root: python build_challenge_catalog.py
+from core.challenge_catalog import CHALLENGE_CATALOG_PATH, compile_challenge_catalog
+from core.data_loader import CHALLENGES_DIR
+
+if __name__ == "__main__":
+    print(f"--- Compiling {CHALLENGES_DIR}/ into {CHALLENGE_CATALOG_PATH} ---")
+    manifest = compile_challenge_catalog(CHALLENGES_DIR)
+    for day, count in manifest["day_counts"].items():
+        print(f"  Day {day}: {count} challenges")
+    print(f"SUCCESS: {manifest['total_challenges']} challenges over {manifest['total_days']} days "
+          f"(catalog version {manifest['version']}).")
@@ -0,0 +1,77 @@
+# build_hint_candidates.py
+# Content-build step, run after validate_and_correct_challenges.py and populate_chroma_kb.py
+# whenever challenges or hints change. For every challenge it stores:
+#   - the top HINT_CANDIDATES_PER_CHALLENGE knowledge-base hints, chosen from the prompt,
+#     schema and expected query (vector + BM25 + SQL-topic rankings fused by RRF)
+#   - the embedding of the prompt, and each candidate's similarity to it
+# get_vector_db_hints then embeds only the learner's query/error and re-ranks those
+# candidates, instead of embedding the whole request and searching every hint.
+# Needs the embedding model (EMBEDDING_BACKEND in core/rag_helper.py).
+# Run from the project root: python build_hint_candidates.py
+import glob
+import json
+import os
+
+import numpy as np
+
+from core.data_loader import CHALLENGES_DIR
+from core.embedding_cache import build_prompt_embedding_text
+from core.hint_candidates import HINT_CANDIDATES_PATH, HINT_CANDIDATES_PER_CHALLENGE
+from core.hint_index import NumpyHintIndex
+from core.hint_router import classify_sql_topics, get_hint_router
+from core.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from core.rag_helper import embedding_model_key, get_hint_system
+from core.session_state_manager import get_challenge_id
+
+def challenge_text(challenge):
+    schema = challenge.get("schema", {})
+    tables = schema if isinstance(schema, list) else [schema]
+    schema_text = "; ".join(
+        f"{table.get('table', '')}({', '.join(str(column) for column in table.get('columns', []))})"
+        for table in tables if isinstance(table, dict)
+    )
+    return (f"Problem: {challenge.get('prompt', '')}\nSchema: {schema_text}\n"
+            f"Expected query: {challenge.get('expected_query', '')}")
+
+def challenge_candidates(challenge, embedding_model, hint_index, lexical_index, hint_router):
+    text = challenge_text(challenge)
+    vector_rows = [row for row, _ in hint_index.top_k(embedding_model.encode(text), HINT_CANDIDATES_PER_CHALLENGE)]
+    lexical_rows = [row for row, _ in lexical_index.top_k(text, HINT_CANDIDATES_PER_CHALLENGE)]
+    topics = classify_sql_topics(challenge.get("expected_query", ""), challenge.get("prompt", ""))
+    topic_rows = hint_router.rows_for([("topic", topic) for topic in topics])
+    return reciprocal_rank_fusion([vector_rows, lexical_rows, topic_rows], top_k=HINT_CANDIDATES_PER_CHALLENGE)
+
+def build_hint_candidates():
+    hint_system = get_hint_system()
+    embedding_model = hint_system["embedding_model"]
+    if embedding_model is None:
+        raise SystemExit(f"ERROR: Embedding model unavailable: {hint_system['errors']}")
+    hint_index = NumpyHintIndex()
+    lexical_index, hint_router = get_lexical_index(), get_hint_router()
+
+    challenges_out = {}
+    for filepath in sorted(glob.glob(os.path.join(CHALLENGES_DIR, "day*.json"))):
+        day = int(os.path.basename(filepath)[len("day"):-len(".json")])
+        with open(filepath, encoding="utf-8") as f:
+            challenges = json.load(f).get("challenges", [])
+        for challenge_index, challenge in enumerate(challenges):
+            rows = challenge_candidates(challenge, embedding_model, hint_index, lexical_index, hint_router)
+            prompt_embedding = np.asarray(
+                embedding_model.encode(build_prompt_embedding_text(challenge.get("prompt", ""))), dtype=np.float32
+            )
+            prompt_embedding /= max(float(np.linalg.norm(prompt_embedding)), 1e-12)
+            prompt_scores = np.asarray(hint_index.embeddings[rows]) @ prompt_embedding
+            challenges_out[get_challenge_id(day, challenge_index)] = {
+                "candidate_ids": [hint_index.ids[row] for row in rows],
+                "prompt_scores": [round(float(score), 6) for score in prompt_scores],
+                "prompt_embedding": [round(float(value), 6) for value in prompt_embedding],
+            }
+        print(f"  {filepath}: {len(challenges)} challenges")
+
+    with open(HINT_CANDIDATES_PATH, "w", encoding="utf-8") as f:
+        json.dump({"model": embedding_model_key(embedding_model), "challenges": challenges_out}, f)
+    print(f"SUCCESS: Wrote hint candidates for {len(challenges_out)} challenges to {HINT_CANDIDATES_PATH}")
+
+if __name__ == "__main__":
+    print("--- Building per-challenge hint candidates ---")
+    build_hint_candidates()
@@ -0,0 +1,242 @@
+# querypath_app/core/challenge_catalog.py
+# All challenge days packed into one indexed SQLite artifact, built by
+# build_challenge_catalog.py from challenges/dayN.json. The app reads it once per process
+# into a dict keyed on (day, challenge_index), so lookups, challenge counts and the number
+# of days never touch the per-day JSON files or list the challenges directory.
+# Every session shares that one copy through read-only views; a throttled mtime check
+# picks up a rebuilt catalog or edited day files without a restart.
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# --- Configuration ---
+CHALLENGE_CATALOG_PATH = "./data/challenge_catalog.db"
+CATALOG_FORMAT_VERSION = 1
+CATALOG_CHECK_INTERVAL_SECONDS = 2.0 # How often a lookup may stat the catalog and day files
+
+_DAY_FILE_PATTERN = re.compile(r"^day(\d+)\.json$")
+
+_catalog = None
+_catalog_signature = None # mtimes the current catalog was loaded against
+_catalog_checked_at = 0.0
+_catalog_lock = threading.Lock()
+
+class FrozenDict(dict):
+    """A dict that refuses mutation. Still a dict, so isinstance checks, pandas and json work."""
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("challenge data is shared between sessions and read-only")
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _readonly
+    __ior__ = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+class FrozenList(list):
+    """A list that refuses mutation."""
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("challenge data is shared between sessions and read-only")
+    __setitem__ = __delitem__ = append = clear = extend = insert = pop = remove = reverse = sort = _readonly
+    __iadd__ = __imul__ = _readonly
+
+    def __reduce__(self):
+        return (FrozenList, (list(self),))
+
+def freeze(value):
+    # Read-only view of parsed JSON, built once per catalog load
+    if isinstance(value, dict):
+        return FrozenDict({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+def find_day_files(challenges_dir: str):
+    """Returns {day: filepath} for every challenges/dayN.json."""
+    day_files = {}
+    for filename in os.listdir(challenges_dir):
+        match = _DAY_FILE_PATTERN.match(filename)
+        if match:
+            day_files[int(match.group(1))] = os.path.join(challenges_dir, filename)
+    return dict(sorted(day_files.items()))
+
+def _file_sha256(filepath):
+    with open(filepath, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class ChallengeCatalog:
+    """
+    In-memory catalog: challenges[(day, challenge_index)] -> challenge dict, plus the
+    manifest (challenge count per day and the fields of each day file besides its
+    challenges). Shared by every session in the process; treat it as read-only.
+    """
+    def __init__(self, day_headers, challenges_by_day, version, sources):
+        self.version = version # Changes whenever any source day file changes
+        self.sources = sources # day -> (filepath, sha256, mtime) of the day file it was built from
+        self.day_headers = {day: freeze(header) for day, header in day_headers.items()}
+        self.day_counts = {day: len(challenges) for day, challenges in challenges_by_day.items()}
+        self.challenges = {
+            (day, challenge_index): freeze(challenge)
+            for day, challenges in challenges_by_day.items()
+            for challenge_index, challenge in enumerate(challenges)
+        }
+        self._day_data = {}
+
+    def get(self, day: int, challenge_index: int):
+        return self.challenges.get((day, challenge_index))
+
+    def challenge_count(self, day: int):
+        return self.day_counts.get(day, 0)
+
+    def total_days(self):
+        return len(self.day_counts)
+
+    def has_day(self, day: int):
+        return day in self.day_counts
+
+    def day_data(self, day: int):
+        # The day file's shape, for callers that want a whole day
+        if day not in self.day_counts:
+            return None
+        if day not in self._day_data:
+            self._day_data[day] = FrozenDict(self.day_headers[day], challenges=FrozenList(
+                self.challenges[(day, index)] for index in range(self.day_counts[day])
+            ))
+        return self._day_data[day]
+
+def read_day_sources(challenges_dir: str):
+    """Parses every day file: returns ({day: data}, {day: (filepath, sha256, mtime)})."""
+    sources, fingerprints = {}, {}
+    for day, filepath in find_day_files(challenges_dir).items():
+        with open(filepath, encoding="utf-8") as f:
+            sources[day] = json.load(f)
+        fingerprints[day] = (filepath, _file_sha256(filepath), os.path.getmtime(filepath))
+    return sources, fingerprints
+
+def _catalog_version(fingerprints):
+    combined = "|".join(f"{day}:{sha}" for day, (_, sha, _) in sorted(fingerprints.items()))
+    return hashlib.sha256(combined.encode("utf-8")).hexdigest()[:16]
+
+def catalog_from_sources(sources, fingerprints):
+    headers = {day: {k: v for k, v in data.items() if k != "challenges"} for day, data in sources.items()}
+    challenges_by_day = {day: data.get("challenges", []) for day, data in sources.items()}
+    return ChallengeCatalog(headers, challenges_by_day, _catalog_version(fingerprints), fingerprints)
+
+def compile_challenge_catalog(challenges_dir: str, catalog_path=CHALLENGE_CATALOG_PATH):
+    """Writes the SQLite catalog for challenges_dir; returns the manifest it recorded."""
+    sources, fingerprints = read_day_sources(challenges_dir)
+    temp_path = f"{catalog_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    try:
+        conn.executescript("""
+            CREATE TABLE manifest (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE days (
+                day INTEGER PRIMARY KEY, challenge_count INTEGER NOT NULL, header_json TEXT NOT NULL,
+                source_file TEXT NOT NULL, source_sha256 TEXT NOT NULL, source_mtime REAL NOT NULL
+            );
+            CREATE TABLE challenges (
+                day INTEGER NOT NULL, challenge_index INTEGER NOT NULL, body_json TEXT NOT NULL,
+                PRIMARY KEY (day, challenge_index)
+            ) WITHOUT ROWID;
+        """)
+        for day, data in sources.items():
+            challenges = data.get("challenges", [])
+            header = {k: v for k, v in data.items() if k != "challenges"}
+            filepath, sha, mtime = fingerprints[day]
+            conn.execute("INSERT INTO days VALUES (?, ?, ?, ?, ?, ?)",
+                         (day, len(challenges), json.dumps(header), filepath, sha, mtime))
+            conn.executemany("INSERT INTO challenges VALUES (?, ?, ?)",
+                             [(day, index, json.dumps(challenge)) for index, challenge in enumerate(challenges)])
+        manifest = {
+            "format_version": CATALOG_FORMAT_VERSION,
+            "version": _catalog_version(fingerprints),
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_days": len(sources),
+            "total_challenges": sum(len(data.get("challenges", [])) for data in sources.values()),
+            "day_counts": {str(day): len(data.get("challenges", [])) for day, data in sources.items()},
+        }
+        conn.executemany("INSERT INTO manifest VALUES (?, ?)",
+                         [(key, json.dumps(value)) for key, value in manifest.items()])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(temp_path, catalog_path) # Readers never see a half-written catalog
+    return manifest
+
+def load_challenge_catalog(catalog_path=CHALLENGE_CATALOG_PATH):
+    conn = sqlite3.connect(f"file:{catalog_path}?mode=ro", uri=True)
+    try:
+        manifest = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM manifest")}
+        if manifest.get("format_version") != CATALOG_FORMAT_VERSION:
+            raise ValueError(f"catalog format {manifest.get('format_version')}, expected {CATALOG_FORMAT_VERSION}")
+        headers, sources = {}, {}
+        for day, header, filepath, sha, mtime in conn.execute(
+                "SELECT day, header_json, source_file, source_sha256, source_mtime FROM days"):
+            headers[day] = json.loads(header)
+            sources[day] = (filepath, sha, mtime)
+        challenges_by_day = {day: [] for day in headers}
+        for day, _, body in conn.execute("SELECT day, challenge_index, body_json FROM challenges ORDER BY day, challenge_index"):
+            challenges_by_day[day].append(json.loads(body))
+    finally:
+        conn.close()
+    return ChallengeCatalog(headers, challenges_by_day, manifest["version"], sources)
+
+def _mtime(filepath):
+    try:
+        return os.path.getmtime(filepath)
+    except OSError:
+        return None
+
+def _signature(challenges_dir, catalog_path):
+    day_files = find_day_files(challenges_dir)
+    return (_mtime(catalog_path), tuple((day, _mtime(filepath)) for day, filepath in day_files.items()))
+
+def _stale_days(catalog, challenges_dir):
+    """Days whose source file was added, removed or edited since the catalog was built."""
+    day_files = find_day_files(challenges_dir)
+    stale = set(day_files) ^ set(catalog.sources)
+    for day, filepath in day_files.items():
+        if day in stale:
+            continue
+        _, sha, mtime = catalog.sources[day]
+        # A checkout or copy changes mtimes without changing content, so confirm by hash
+        if _mtime(filepath) != mtime and _file_sha256(filepath) != sha:
+            stale.add(day)
+    return sorted(stale)
+
+def _load_current_catalog(challenges_dir, catalog_path):
+    try:
+        catalog = load_challenge_catalog(catalog_path)
+    except (sqlite3.Error, ValueError, KeyError) as e:
+        print(f"WARNING: Challenge catalog unavailable ({e}); compiling {challenges_dir} in memory. "
+              f"Run build_challenge_catalog.py.")
+        return catalog_from_sources(*read_day_sources(challenges_dir))
+    stale = _stale_days(catalog, challenges_dir)
+    if stale:
+        print(f"WARNING: Challenge catalog is out of date for day(s) {stale}; compiling {challenges_dir} "
+              f"in memory. Run build_challenge_catalog.py.")
+        return catalog_from_sources(*read_day_sources(challenges_dir))
+    print(f"INFO: Loaded challenge catalog {catalog_path} ({len(catalog.challenges)} challenges).")
+    return catalog
+
+def get_challenge_catalog(challenges_dir: str, catalog_path=CHALLENGE_CATALOG_PATH):
+    """
+    The process-wide catalog. At most every CATALOG_CHECK_INTERVAL_SECONDS, the catalog
+    file and day file mtimes are compared with the ones it was loaded against; any change
+    swaps in a freshly loaded catalog. Sessions holding the old one keep a consistent view.
+    """
+    global _catalog, _catalog_signature, _catalog_checked_at
+    if _catalog is not None and time.monotonic() - _catalog_checked_at < CATALOG_CHECK_INTERVAL_SECONDS:
+        return _catalog
+    with _catalog_lock:
+        if _catalog is None or time.monotonic() - _catalog_checked_at >= CATALOG_CHECK_INTERVAL_SECONDS:
+            signature = _signature(challenges_dir, catalog_path)
+            if _catalog is None or signature != _catalog_signature:
+                _catalog = _load_current_catalog(challenges_dir, catalog_path)
+                _catalog_signature = signature
+            _catalog_checked_at = time.monotonic()
+        return _catalog
@@ -1,46 +1,85 @@
 import streamlit as st
-import json
-import os
+import itertools
+import threading
+from collections import OrderedDict
+
+from core.challenge_catalog import get_challenge_catalog
+from core.query_validator import compile_expected_output
 
 CHALLENGES_DIR = "challenges"
+# Compiled expected outputs kept in memory (LRU). A few days' worth stays hot; older
+# entries are rebuilt on demand, so memory stays flat however large the catalog grows.
+EXPECTED_OUTPUT_CACHE_MAX_ENTRIES = 256
 
-@st.cache_data # Cache the loaded JSON data
-def load_challenge_file_data(day: int):
-    # Check session state cache first
-    if day in st.session_state.challenges_data_cache:
-        return st.session_state.challenges_data_cache[day]
-
-    filepath = os.path.join(CHALLENGES_DIR, f"day{day}.json")
-    try:
-        with open(filepath, encoding="utf-8") as f:
-            data = json.load(f)
-            st.session_state.challenges_data_cache[day] = data # Store in session state cache
-            return data
-    except FileNotFoundError:
-        st.error(f"Challenge file for Day {day} not found at {filepath}")
-        return None
-    except json.JSONDecodeError:
-        st.error(f"Error decoding JSON from {filepath}")
+# Process-wide: (day, challenge_index, catalog version) -> compile_expected_output(...) result
+_expected_output_cache = OrderedDict()
+_expected_output_cache_lock = threading.Lock()
+_precompiled_version = None # Catalog version the cache was last warmed for
+
+def _store_compiled_expected_output(key, compiled):
+    with _expected_output_cache_lock:
+        _expected_output_cache[key] = compiled
+        _expected_output_cache.move_to_end(key)
+        while len(_expected_output_cache) > EXPECTED_OUTPUT_CACHE_MAX_ENTRIES:
+            _expected_output_cache.popitem(last=False) # Evict least recently used
+
+def precompile_expected_outputs(catalog):
+    # Warm the cache when a catalog is loaded: the earliest days, where learners start, up to
+    # the LRU bound (compiling more would only be evicted again). The rest compile on first use.
+    warm = itertools.islice(catalog.challenges.items(), EXPECTED_OUTPUT_CACHE_MAX_ENTRIES)
+    for (day, challenge_index), challenge in warm:
+        compiled = compile_expected_output(challenge.get("expected_output", []))
+        _store_compiled_expected_output((day, challenge_index, catalog.version), compiled)
+
+def _get_catalog():
+    global _precompiled_version
+    catalog = get_challenge_catalog(CHALLENGES_DIR)
+    with _expected_output_cache_lock:
+        if catalog.version == _precompiled_version:
+            return catalog
+        # Claimed under the lock, so concurrent sessions warm a new version only once
+        _precompiled_version = catalog.version
+        # Entries compiled for an earlier catalog can never be requested again
+        for key in [key for key in _expected_output_cache if key[2] != catalog.version]:
+            del _expected_output_cache[key]
+    precompile_expected_outputs(catalog)
+    return catalog
+
+def get_compiled_expected_output(day: int, challenge_index: int):
+    # Normalized and fingerprinted on first use; the catalog version in the key means a
+    # rebuilt catalog never serves a stale compiled output
+    catalog = _get_catalog()
+    key = (day, challenge_index, catalog.version)
+    with _expected_output_cache_lock:
+        compiled = _expected_output_cache.get(key)
+        if compiled is not None:
+            _expected_output_cache.move_to_end(key)
+            return compiled
+
+    challenge = catalog.get(day, challenge_index)
+    if challenge is None:
         return None
+    compiled = compile_expected_output(challenge.get("expected_output", []))
+    _store_compiled_expected_output(key, compiled)
+    return compiled
+
+def load_challenge_file_data(day: int):
+    day_data = _get_catalog().day_data(day)
+    if day_data is None:
+        st.error(f"Challenge file for Day {day} not found in {CHALLENGES_DIR}")
+    return day_data
 
 def get_challenge(day: int, challenge_index: int):
-    day_data = load_challenge_file_data(day)
-    if day_data and "challenges" in day_data and 0 <= challenge_index < len(day_data["challenges"]):
-        # Store max challenges for this day if not already stored
-        if day not in st.session_state.max_challenges_per_day:
-             st.session_state.max_challenges_per_day[day] = len(day_data["challenges"])
-        return day_data["challenges"][challenge_index]
-    return None
+    # O(1) lookup in the process-wide catalog
+    return _get_catalog().get(day, challenge_index)
 
 def get_max_challenges_for_day(day: int):
-    if day in st.session_state.max_challenges_per_day:
-        return st.session_state.max_challenges_per_day[day]
-    # If not in session state, load it (get_challenge will populate it)
-    load_challenge_file_data(day)
-    return st.session_state.max_challenges_per_day.get(day, 0)
+    return _get_catalog().challenge_count(day)
+
+def get_catalog_version():
+    # Content hash of every day file; changes when any challenge is edited
+    return _get_catalog().version
 
 def get_total_days():
-    # Dynamically find total number of day files
-    # This could be slow if many files, consider hardcoding or a manifest file
-    day_files = [f for f in os.listdir(CHALLENGES_DIR) if f.startswith("day") and f.endswith(".json")]
-    return len(day_files) # A simple count, assumes day1.json, day2.json, etc.
\ No newline at end of file
+    # From the catalog manifest; no directory listing on each rerun
+    return _get_catalog().total_days()
@@ -1,9 +1,246 @@
 import streamlit as st
+import hashlib
 import sqlite3
+import queue
+import threading
+import time
+from contextlib import contextmanager
 
 DB_PATH = "data/challenges.db"
+# Read-only and immutable: the challenge DB never changes while the app runs, so SQLite can
+# skip file locking entirely and concurrent graders never contend on a lock.
+# Also the source the in-memory snapshot is loaded from.
+DB_URI = f"file:{DB_PATH}?mode=ro&immutable=1"
 
-@st.cache_resource # Caches the connection object itself
-def get_connection():
-    # check_same_thread=False is important for Streamlit with SQLite
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
\ No newline at end of file
+# "snapshot": load the DB once into memory and give every pooled connection a private
+# :memory: copy (no disk I/O while grading). "file": read-only connections on DB_URI.
+# Either way learner SQL can only read (see _read_only_authorizer), and a connection whose
+# state changed anyway is replaced with a fresh one when it is returned.
+DB_MODE = "snapshot"
+
+POOL_SIZE = 8 # Max connections open at once (= max queries graded in parallel)
+CHECKOUT_TIMEOUT_SECONDS = 10.0 # How long a grader waits for a free connection
+
+CONNECTION_PRAGMAS = [
+    "PRAGMA mmap_size = 268435456", # 256 MB: serve pages straight from the OS page cache
+    "PRAGMA cache_size = -16000", # 16 MB page cache per connection
+    "PRAGMA temp_store = MEMORY", # Sorts and temp b-trees for ORDER BY/GROUP BY stay in RAM
+    "PRAGMA query_only = ON", # Reject any write a learner's query attempts
+]
+
+SNAPSHOT_PRAGMAS = [
+    "PRAGMA temp_store = MEMORY",
+]
+
+# What a learner's SQL may do on a pooled connection: read. Everything else (writes, DDL,
+# ATTACH/DETACH, setting a pragma such as query_only) fails with "not authorized".
+READ_ONLY_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE, # WITH RECURSIVE
+    sqlite3.SQLITE_TRANSACTION, # BEGIN/COMMIT/ROLLBACK; nothing to commit
+    sqlite3.SQLITE_SAVEPOINT,
+}
+# Pragmas that only describe the schema, allowed with a table or index name as argument;
+# any other pragma may only be read (no "= value" or argument). The table-valued forms
+# (pragma_table_info(...)) stay denied: SQLite reports registering them as a write to sqlite_master.
+SCHEMA_PRAGMAS = {"table_info", "table_xinfo", "table_list", "index_list", "index_info", "index_xinfo",
+                  "foreign_key_list"}
+
+def _read_only_authorizer(action, arg1, arg2, db_name, trigger_name):
+    if action in READ_ONLY_ACTIONS:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and (arg2 is None or arg1.lower() in SCHEMA_PRAGMAS):
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+def _make_read_only(conn):
+    # Installed after the pool's own pragmas have run; from then on nothing can write
+    conn.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 0)
+    conn.set_authorizer(_read_only_authorizer)
+
+def _connection_state(conn):
+    # Anything a learner's statement could change on a connection: rows, schema, temp
+    # objects, the read-only guard. Compared on release against the state when opened.
+    return (
+        conn.total_changes,
+        conn.execute("PRAGMA main.schema_version").fetchone()[0],
+        conn.execute("SELECT count(*) FROM sqlite_temp_master").fetchone()[0],
+        conn.execute("PRAGMA query_only").fetchone()[0],
+        tuple(conn.execute("PRAGMA database_list").fetchall()), # Attached databases
+    )
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections. Each checked-out connection is used by a single
+    thread until it is returned; connections are opened lazily up to max_size.
+    In "snapshot" mode every connection is a private in-memory copy of the database.
+    """
+    def __init__(self, uri: str = DB_URI, max_size: int = POOL_SIZE, mode: str = DB_MODE):
+        self.uri = uri
+        self.max_size = max_size
+        self.mode = mode
+        self._idle = queue.LifoQueue() # LIFO keeps recently used (warm) connections in play
+        self._lock = threading.Lock()
+        self._snapshot = None # Master in-memory copy, loaded from disk once (snapshot mode)
+        self._snapshot_lock = threading.Lock()
+        self._clean_states = {} # id(conn) -> _connection_state right after it was opened
+        self._metrics = {
+            "created": 0,
+            "checkouts": 0,
+            "returns": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+            "timeouts": 0,
+            "resets": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+    def _open_file_connection(self):
+        # check_same_thread=False only lets the pool hand a connection to another thread
+        # after it was returned; it is never used by two threads at once.
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _open_pooled_file_connection(self):
+        conn = self._open_file_connection()
+        _make_read_only(conn)
+        self._clean_states[id(conn)] = _connection_state(conn)
+        return conn
+
+    def _open_snapshot_connection(self):
+        with self._snapshot_lock:
+            if self._snapshot is None:
+                source = self._open_file_connection()
+                try:
+                    self._snapshot = sqlite3.connect(":memory:", check_same_thread=False)
+                    source.backup(self._snapshot) # The only time grading touches the disk
+                finally:
+                    source.close()
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+            self._snapshot.backup(conn) # Memory-to-memory page copy
+        for pragma in SNAPSHOT_PRAGMAS:
+            conn.execute(pragma)
+        _make_read_only(conn) # A private copy, but ATTACH or VACUUM INTO would still reach the disk
+        self._clean_states[id(conn)] = _connection_state(conn)
+        return conn
+
+    def _open_connection(self):
+        if self.mode == "snapshot":
+            return self._open_snapshot_connection()
+        return self._open_pooled_file_connection()
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._metrics["created"] < self.max_size:
+                self._metrics["created"] += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._open_connection()
+            except Exception:
+                with self._lock:
+                    self._metrics["created"] -= 1
+                raise
+        return self._idle.get(timeout=timeout) # All connections busy: wait for a return
+
+    def checkout(self, timeout: float = CHECKOUT_TIMEOUT_SECONDS):
+        started = time.perf_counter()
+        try:
+            conn = self._acquire(timeout)
+        except queue.Empty:
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise TimeoutError(f"No database connection became free within {timeout:g}s")
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._metrics["checkouts"] += 1
+            self._metrics["in_use"] += 1
+            self._metrics["peak_in_use"] = max(self._metrics["peak_in_use"], self._metrics["in_use"])
+            self._metrics["total_wait_seconds"] += waited
+            self._metrics["max_wait_seconds"] = max(self._metrics["max_wait_seconds"], waited)
+        return conn
+
+    def release(self, conn):
+        reset = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            reset = _connection_state(conn) != self._clean_states.get(id(conn))
+        except sqlite3.Error:
+            reset = True # A connection we can't inspect isn't handed to anyone else
+        replacement = conn
+        try:
+            if reset:
+                # The learner changed this connection (committed DML, DDL, temp tables, pragmas,
+                # attached databases): the next learner gets a fresh one instead
+                self._clean_states.pop(id(conn), None)
+                replacement = None
+                conn.close()
+                replacement = self._open_connection()
+        finally:
+            with self._lock:
+                self._metrics["returns"] += 1
+                self._metrics["in_use"] -= 1
+                if reset:
+                    self._metrics["resets"] += 1
+                if replacement is None:
+                    self._metrics["created"] -= 1 # Reopening failed: free the slot for a later checkout
+            if replacement is not None:
+                self._idle.put(replacement)
+
+    def metrics(self):
+        with self._lock:
+            snapshot = dict(self._metrics)
+        snapshot["idle"] = self._idle.qsize()
+        snapshot["avg_wait_seconds"] = (
+            snapshot["total_wait_seconds"] / snapshot["checkouts"] if snapshot["checkouts"] else 0.0
+        )
+        return snapshot
+
+@st.cache_resource # One pool per process, shared by every session
+def get_connection_pool():
+    return ConnectionPool()
+
+@contextmanager
+def checkout_connection(timeout: float = CHECKOUT_TIMEOUT_SECONDS, pool=None):
+    # Usage: with checkout_connection() as conn: ...
+    # Background threads pass the pool in, resolved on the script thread beforehand.
+    pool = pool or get_connection_pool()
+    conn = pool.checkout(timeout)
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+def get_pool_metrics():
+    return get_connection_pool().metrics()
+
+_database_version = None
+_database_version_lock = threading.Lock()
+
+def get_database_version(path: str = DB_PATH):
+    """
+    Content hash of the challenge database, computed once per process (the file is opened
+    immutable, so it can't change under a running app). Identical on every node that has
+    the same file, so it can be part of keys shared between workers.
+    """
+    global _database_version
+    with _database_version_lock:
+        if _database_version is None:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            _database_version = digest.hexdigest()[:16]
+        return _database_version
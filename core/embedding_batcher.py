@@ -0,0 +1,91 @@
+# querypath_app/core/embedding_batcher.py
+# Micro-batching front end for the embedding model. Each Streamlit session encodes one
+# hint query at a time; when several learners ask for a hint together, encoding their
+# texts as a single batch costs little more than encoding one. Callers block on encode()
+# while a worker thread gathers whatever arrives within a short window and runs one
+# batched forward pass for all of it.
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# --- Configuration ---
+EMBEDDING_MAX_BATCH_SIZE = 32
+EMBEDDING_MAX_WAIT_SECONDS = 0.005 # How long the first request in a batch waits for company
+
+class EmbeddingBatcher:
+    """
+    Wraps a model with an encode(list_of_texts) method. encode(text) has the same
+    signature as the model's single-text call and is safe to call from any thread.
+    """
+    def __init__(self, embedding_model, max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+                 max_wait_seconds=EMBEDDING_MAX_WAIT_SECONDS):
+        self.embedding_model = embedding_model
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._requests = queue.Queue()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "requests": 0,
+            "batches": 0,
+            "largest_batch": 0,
+            "peak_queue_depth": 0,
+            "encode_seconds": 0.0,
+            "errors": 0,
+        }
+        self._batch_sizes = {} # batch size -> number of batches of that size
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, text: str):
+        future = Future()
+        self._requests.put((text, future))
+        with self._metrics_lock:
+            self._metrics["requests"] += 1
+            self._metrics["peak_queue_depth"] = max(self._metrics["peak_queue_depth"], self._requests.qsize())
+        return future.result()
+
+    def _collect_batch(self):
+        batch = [self._requests.get()] # Block until there is work
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            texts = [text for text, _ in batch]
+            started = time.perf_counter()
+            try:
+                vectors = self.embedding_model.encode(texts)
+            except Exception as e:
+                with self._metrics_lock:
+                    self._metrics["errors"] += 1
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._metrics_lock:
+                self._metrics["batches"] += 1
+                self._metrics["largest_batch"] = max(self._metrics["largest_batch"], len(batch))
+                self._metrics["encode_seconds"] += time.perf_counter() - started
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def metrics(self):
+        with self._metrics_lock:
+            snapshot = dict(self._metrics)
+            snapshot["batch_sizes"] = dict(sorted(self._batch_sizes.items()))
+        snapshot["queue_depth"] = self._requests.qsize()
+        batched = sum(size * count for size, count in snapshot["batch_sizes"].items())
+        snapshot["mean_batch_size"] = batched / snapshot["batches"] if snapshot["batches"] else 0.0
+        snapshot["max_batch_size"] = self.max_batch_size
+        snapshot["max_wait_seconds"] = self.max_wait_seconds
+        return snapshot
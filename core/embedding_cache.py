@@ -0,0 +1,128 @@
+# querypath_app/core/embedding_cache.py
+# Persistent cache of hint query embeddings. Most hint requests repeat the same few
+# failures ("no such table", "near ...: syntax error") on the same prompts, so the
+# embedding for a canonicalized (query, prompt, error) text is computed once and reused
+# across sessions and restarts instead of running the transformer again.
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from core.result_cache import canonicalize_sql
+
+# --- Configuration ---
+EMBEDDING_CACHE_PATH = "./hint_embedding_cache.db"
+EMBEDDING_CACHE_MAX_ENTRIES = 50_000 # ~1.5 KB per 384-dim float32 vector
+EMBEDDING_CACHE_EVICT_BATCH = 500 # Rows dropped per eviction pass, so it does not run on every insert
+EMBEDDING_CACHE_SIZE_CHECK_EVERY = 100 # Inserts between size checks; the cache may overshoot by this
+EMBEDDING_CACHE_TOUCH_SECONDS = 60.0 # A hit refreshes last_used at most this often, so most hits stay reads
+
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+_cache_conn = None
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_inserts_since_size_check = 0
+
+def _collapse_whitespace(text):
+    return _WHITESPACE_PATTERN.sub(" ", text or "").strip()
+
+def build_hint_embedding_text(user_query: str, challenge_prompt: str, sql_error: str = None):
+    """
+    The text that gets embedded for a hint request, built from canonical parts so that
+    queries differing only in formatting, keyword case or comments share one embedding.
+    """
+    text = f"User query: {canonicalize_sql(user_query)}\nProblem: {_collapse_whitespace(challenge_prompt)}"
+    if sql_error:
+        text += f"\nSQL Error: {_collapse_whitespace(sql_error)}"
+    return text
+
+def build_attempt_embedding_text(user_query: str, sql_error: str = None):
+    # The learner-specific half of a hint request, for challenges whose prompt side was
+    # embedded ahead of time (see build_hint_candidates.py)
+    text = f"User query: {canonicalize_sql(user_query)}"
+    if sql_error:
+        text += f"\nSQL Error: {_collapse_whitespace(sql_error)}"
+    return text
+
+def build_prompt_embedding_text(challenge_prompt: str):
+    return f"Problem: {_collapse_whitespace(challenge_prompt)}"
+
+def make_embedding_cache_key(model_name: str, text: str):
+    # The model name is part of the key: vectors from different models are not interchangeable
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+def _get_cache_connection():
+    global _cache_conn
+    if _cache_conn is None:
+        conn = sqlite3.connect(EMBEDDING_CACHE_PATH, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        conn.commit()
+        _cache_conn = conn
+    return _cache_conn
+
+def get_cached_embedding(key: str):
+    """Returns the cached vector as a list of floats, or None."""
+    try:
+        with _cache_lock:
+            conn = _get_cache_connection()
+            row = conn.execute("SELECT vector, last_used FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                _cache_stats["misses"] += 1
+                return None
+            if row[1] < time.time() - EMBEDDING_CACHE_TOUCH_SECONDS:
+                conn.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            _cache_stats["hits"] += 1
+    except sqlite3.Error as e:
+        print(f"WARNING: Embedding cache lookup failed: {e}")
+        return None
+    return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+def store_embedding(key: str, vector):
+    global _inserts_since_size_check
+    try:
+        with _cache_lock:
+            conn = _get_cache_connection()
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            conn.execute("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                         (key, blob, time.time()))
+            _inserts_since_size_check += 1
+            if _inserts_since_size_check >= EMBEDDING_CACHE_SIZE_CHECK_EVERY:
+                _inserts_since_size_check = 0
+                size = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                if size > EMBEDDING_CACHE_MAX_ENTRIES:
+                    # Evict least recently used, down to a little under the bound
+                    excess = size - EMBEDDING_CACHE_MAX_ENTRIES + min(EMBEDDING_CACHE_EVICT_BATCH,
+                                                                      EMBEDDING_CACHE_MAX_ENTRIES // 10)
+                    conn.execute("DELETE FROM embeddings WHERE key IN"
+                                 " (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,))
+                    _cache_stats["evictions"] += excess
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"WARNING: Embedding cache write failed: {e}")
+
+def get_or_compute_embedding(embedding_model, model_name: str, text: str):
+    key = make_embedding_cache_key(model_name, text)
+    vector = get_cached_embedding(key)
+    if vector is None:
+        vector = embedding_model.encode(text).tolist()
+        store_embedding(key, vector)
+    return vector
+
+def get_embedding_cache_stats():
+    with _cache_lock:
+        stats = dict(_cache_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["max_entries"] = EMBEDDING_CACHE_MAX_ENTRIES
+    return stats
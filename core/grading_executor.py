@@ -0,0 +1,87 @@
+# querypath_app/core/grading_executor.py
+# Grades submissions off the Streamlit script thread. A run submits a job and gets a
+# Future back; the page renders a pending state and polls until the result is in.
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.db_connector import POOL_SIZE, checkout_connection
+from core.query_sandbox import query_budget, QueryBudgetExceeded
+from core.result_streamer import stream_grade_query
+from core.result_cache import store_result
+from core.result_preview import compact_preview
+
+# --- Configuration ---
+GRADING_THREADS = POOL_SIZE # More threads than DB connections would only queue on checkout
+# Normalization stays on the grading thread: the streamer normalizes 256-row batches and
+# stops at MAX_RESULT_ROWS (10,000), too little work to be worth shipping to a process
+GRADING_POLL_SECONDS = 0.3 # How often a page waiting on a result reruns to check it
+
+_grading_executor = None
+_executor_lock = threading.Lock()
+
+def get_grading_executor():
+    global _grading_executor
+    with _executor_lock:
+        if _grading_executor is None:
+            _grading_executor = ThreadPoolExecutor(max_workers=GRADING_THREADS, thread_name_prefix="grader")
+        return _grading_executor
+
+def _explain_sql_error(error_msg: str, challenge_data: dict):
+    # Enhance error message for common "no such table" error
+    if "no such table" in error_msg.lower():
+        schema_info = challenge_data.get('schema', {})
+        table_name_msg = ""
+        if isinstance(schema_info, dict) and "table" in schema_info:
+            table_name_msg = f"The expected table for this challenge is `{schema_info['table']}`."
+        elif isinstance(schema_info, list): # For multiple tables in schema
+            tables = [item.get('table', '?') for item in schema_info if isinstance(item, dict)]
+            if tables:
+                table_name_msg = f"Expected table(s) for this challenge might include: `{', '.join(tables)}`."
+        error_msg += f"\n\n*Hint: Double-check your table and column names against the provided schema. {table_name_msg}*"
+    return error_msg
+
+def grade_submission(user_query: str, conn, challenge_data: dict, compiled_expected: dict):
+    """
+    Runs and grades one submission. Touches no Streamlit state, so it can run on any
+    thread. Returns the keyword arguments for set_last_run_output.
+    """
+    try:
+        # Rows are graded as they come off the cursor; a runaway result stops early, and the
+        # budget keeps a runaway query from holding the connection
+        with query_budget(conn):
+            graded = stream_grade_query(
+                conn, user_query, compiled_expected,
+                order_sensitive=challenge_data.get("order_sensitive", False)
+            )
+        return {
+            "preview": compact_preview(graded["preview_df"]), # Shared via the result cache; read-only
+            "is_correct": graded["is_correct"],
+            "row_count": graded["row_count"],
+            "row_count_is_exact": graded["row_count_is_exact"],
+        }
+    except QueryBudgetExceeded as e:
+        # Not a SQL error: the query was valid but too expensive to finish
+        return {"is_correct": False, "budget_message": str(e)}
+    except Exception as e:
+        return {"is_correct": False, "error_message": _explain_sql_error(str(e), challenge_data)}
+
+def is_cacheable_outcome(outcome: dict):
+    # Budget stops depend on load and timing, not only on the query; everything else is
+    # fully determined by the (static) database and the SQL text
+    return not outcome.get("budget_message")
+
+def _run_grading_job(user_query, challenge_data, compiled_expected, pool, cache_key=None):
+    try:
+        with checkout_connection(pool=pool) as conn:
+            outcome = grade_submission(user_query, conn, challenge_data, compiled_expected)
+    except TimeoutError as e:
+        return {"is_correct": False, "error_message": f"The grader is busy right now, please run your query again. ({e})"}
+    if cache_key is not None and is_cacheable_outcome(outcome):
+        store_result(cache_key, outcome)
+    return outcome
+
+def submit_grading_job(user_query: str, challenge_data: dict, compiled_expected: dict, pool, cache_key=None):
+    # pool: the ConnectionPool from get_connection_pool(), resolved on the script thread.
+    # cache_key: result_cache key the outcome is stored under once graded.
+    return get_grading_executor().submit(_run_grading_job, user_query, challenge_data, compiled_expected,
+                                         pool, cache_key)
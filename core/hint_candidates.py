@@ -0,0 +1,67 @@
+# querypath_app/core/hint_candidates.py
+# Per-challenge hint candidates, precomputed by build_hint_candidates.py. A challenge's
+# prompt, schema and expected query are known before any learner sees it, so the handful
+# of knowledge-base hints relevant to it and the prompt's embedding are worked out at
+# content-build time. At request time only the learner's query and error are embedded,
+# and only the candidates are scored.
+import json
+import threading
+
+import numpy as np
+
+# --- Configuration ---
+HINT_CANDIDATES_PATH = "./data/hint_candidates.json"
+HINT_CANDIDATES_PER_CHALLENGE = 6
+PROMPT_SIMILARITY_WEIGHT = 0.5 # Share of a candidate's score that comes from the prompt side
+
+_hint_candidates = None
+_hint_candidates_lock = threading.Lock()
+
+def load_hint_candidates(path=HINT_CANDIDATES_PATH):
+    """
+    Returns the build output, {"model", "challenges": {challenge_id: {"candidate_ids",
+    "prompt_scores", "prompt_embedding"}}}, or an empty one when the file has not been
+    built. Loaded once per process.
+    """
+    global _hint_candidates
+    with _hint_candidates_lock:
+        if _hint_candidates is None:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    _hint_candidates = json.load(f)
+                print(f"INFO: Loaded precomputed hint candidates for {len(_hint_candidates['challenges'])} challenges.")
+            except FileNotFoundError:
+                _hint_candidates = {"model": None, "challenges": {}}
+            except (OSError, ValueError, KeyError) as e:
+                print(f"WARNING: Could not load precomputed hint candidates from {path}: {e}")
+                _hint_candidates = {"model": None, "challenges": {}}
+        return _hint_candidates
+
+def get_challenge_hint_candidates(challenge_id: str, model_key: str):
+    # Prompt embeddings from another model (e.g. torch vs ONNX int8) are not comparable
+    hint_candidates = load_hint_candidates()
+    if not challenge_id or hint_candidates["model"] != model_key:
+        return None
+    return hint_candidates["challenges"].get(challenge_id)
+
+def rerank_hint_candidates(entry: dict, hint_index, attempt_vector):
+    """
+    Scores a challenge's candidates against the learner's attempt and returns their rows in
+    hint_index (a NumpyHintIndex), best first. Candidates no longer in the index (the
+    knowledge base changed since the build) are skipped.
+    """
+    row_of_id = {hint_id: row for row, hint_id in enumerate(hint_index.ids)}
+    rows, prompt_scores = [], []
+    for hint_id, prompt_score in zip(entry["candidate_ids"], entry["prompt_scores"]):
+        if hint_id in row_of_id:
+            rows.append(row_of_id[hint_id])
+            prompt_scores.append(prompt_score)
+    if not rows:
+        return []
+    attempt_score_of_row = dict(hint_index.top_k(attempt_vector, len(rows), rows=rows))
+    scores = [
+        PROMPT_SIMILARITY_WEIGHT * prompt_score + (1 - PROMPT_SIMILARITY_WEIGHT) * attempt_score_of_row[row]
+        for row, prompt_score in zip(rows, prompt_scores)
+    ]
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    return [rows[position] for position in order]
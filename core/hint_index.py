@@ -0,0 +1,82 @@
+# querypath_app/core/hint_index.py
+# Brute-force alternative to the Chroma HNSW index for the hint knowledge base.
+# The knowledge base holds a few dozen hints, so one matrix-vector product over all of
+# them is exact and faster than going through a persistent Chroma client per lookup.
+import json
+import os
+
+import numpy as np
+
+# Written by populate_chroma_kb.py next to the Chroma directory
+HINT_EMBEDDINGS_PATH = "./chroma_db_sql_hints_embeddings.npy" # float32, one unit-length row per hint
+HINT_DOCUMENTS_PATH = "./chroma_db_sql_hints_documents.json" # ids, texts and metadata, row-aligned
+
+def documents_signature(documents_path=HINT_DOCUMENTS_PATH):
+    # (mtime, size) of the exported documents, None while they are missing; loaders that
+    # failed retry only once this changes
+    try:
+        stat = os.stat(documents_path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _unit_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def save_numpy_index(ids, embeddings, documents, metadatas,
+                     embeddings_path=HINT_EMBEDDINGS_PATH, documents_path=HINT_DOCUMENTS_PATH):
+    np.save(embeddings_path, np.ascontiguousarray(_unit_rows(embeddings)))
+    with open(documents_path, "w", encoding="utf-8") as f:
+        json.dump({"ids": list(ids), "documents": list(documents), "metadatas": list(metadatas)}, f, indent=2)
+
+def export_numpy_index_from_collection(collection, embeddings_path=HINT_EMBEDDINGS_PATH,
+                                       documents_path=HINT_DOCUMENTS_PATH):
+    # Reuses the vectors already stored in Chroma, so both backends rank with the same embeddings
+    stored = collection.get(include=["embeddings", "documents", "metadatas"])
+    save_numpy_index(stored["ids"], stored["embeddings"], stored["documents"], stored["metadatas"],
+                     embeddings_path, documents_path)
+    return len(stored["ids"])
+
+class NumpyHintIndex:
+    """
+    Memory-mapped matrix of unit-length hint embeddings. query() scores every hint with a
+    single matrix-vector product (cosine similarity) and returns the top_k documents in
+    the same order Chroma's cosine-space collection would.
+    """
+    def __init__(self, embeddings_path=HINT_EMBEDDINGS_PATH, documents_path=HINT_DOCUMENTS_PATH):
+        self.embeddings = np.load(embeddings_path, mmap_mode="r")
+        with open(documents_path, encoding="utf-8") as f:
+            stored = json.load(f)
+        self.ids = stored["ids"]
+        self.documents = stored["documents"]
+        self.metadatas = stored["metadatas"]
+        if len(self.ids) != self.embeddings.shape[0]:
+            raise ValueError(f"{documents_path} and {embeddings_path} are out of sync; re-run populate_chroma_kb.py")
+
+    @staticmethod
+    def exists(embeddings_path=HINT_EMBEDDINGS_PATH, documents_path=HINT_DOCUMENTS_PATH):
+        return os.path.exists(embeddings_path) and os.path.exists(documents_path)
+
+    def count(self):
+        return len(self.ids)
+
+    def top_k(self, query_vector, top_k=2, rows=None):
+        """
+        Returns [(row, cosine_similarity), ...] best first. rows optionally restricts the
+        search to a subset of row numbers.
+        """
+        query = _unit_rows(query_vector).reshape(-1)
+        matrix = self.embeddings if rows is None else self.embeddings[rows]
+        scores = matrix @ query
+        k = min(top_k, scores.shape[0])
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k] if k < scores.shape[0] else np.arange(scores.shape[0])
+        best = best[np.argsort(-scores[best], kind="stable")]
+        row_numbers = best if rows is None else np.asarray(rows)[best]
+        return [(int(row), float(scores[pos])) for row, pos in zip(row_numbers, best)]
+
+    def query(self, query_vector, top_k=2):
+        return [self.documents[row] for row, _ in self.top_k(query_vector, top_k)]
@@ -0,0 +1,144 @@
+# querypath_app/core/hint_router.py
+# Rule-based first stage of hint retrieval. Every hint in the knowledge base carries
+# topic/type/error_type/keyword/symptom metadata; the sqlite error message and the SQL
+# in play usually say which of those apply. Requests that map onto metadata are answered
+# from an inverted index without loading or running the embedding model; the rest narrow
+# the embedding search to the matching subset.
+import json
+import re
+import threading
+from collections import defaultdict
+
+from core.hint_index import HINT_DOCUMENTS_PATH, documents_signature
+
+# Checked in order; the first match is the error class
+ERROR_CLASS_PATTERNS = [
+    ("no such table", re.compile(r"no such table", re.IGNORECASE)),
+    ("no such column", re.compile(r"no such column", re.IGNORECASE)),
+    ("ambiguous column", re.compile(r"ambiguous column name", re.IGNORECASE)),
+    ("misuse of aggregate", re.compile(r"misuse of aggregate|aggregate functions are not allowed", re.IGNORECASE)),
+    ("incomplete input", re.compile(r"incomplete input", re.IGNORECASE)),
+    ("syntax error", re.compile(r"syntax error", re.IGNORECASE)),
+]
+
+# Error class -> metadata (field, value) postings to serve, most specific first
+ERROR_CLASS_ROUTES = {
+    "no such table": [("error_type", "no such table")],
+    "no such column": [("error_type", "no such column")],
+    "ambiguous column": [("topic", "JOIN clause")], # Two joined tables share the column name
+    "misuse of aggregate": [("topic", "GROUP BY clause")],
+    "incomplete input": [("symptom", "incomplete_clause"), ("symptom", "incomplete_where")],
+    "syntax error": [("keyword", "syntax error")],
+}
+
+# Matched against the learner's SQL and the challenge prompt
+TOPIC_PATTERNS = [
+    ("JOIN clause", re.compile(r"\bjoin\b", re.IGNORECASE)),
+    ("GROUP BY clause", re.compile(r"\bgroup\s+by\b|\b(count|sum|avg|min|max)\s*\(", re.IGNORECASE)),
+    ("Date filtering", re.compile(r"'\d{4}-\d{2}-\d{2}'|\bdates?\b", re.IGNORECASE)),
+    ("Boolean filtering", re.compile(r"\b(true|false)\b|\bis_\w+", re.IGNORECASE)),
+    ("WHERE clause", re.compile(r"\bwhere\b|\bfilter", re.IGNORECASE)),
+]
+
+_PLACEHOLDER_PATTERN = re.compile(r"\.\.\.|\byour_\w+|<[a-z_ ]+>", re.IGNORECASE)
+_NEAR_PUNCTUATION_PATTERN = re.compile(r'near "[.;]"', re.IGNORECASE)
+_TRAILING_WHERE_PATTERN = re.compile(r"\bwhere\s*;?\s*$", re.IGNORECASE)
+
+_router = None
+_router_failed_signature = False # documents_signature() of the last failed load; False if none failed
+_router_lock = threading.Lock()
+_route_stats = {"metadata": 0, "lexical": 0, "candidates": 0, "filtered_embedding": 0, "full_embedding": 0}
+
+def classify_sql_error(sql_error: str):
+    for error_class, pattern in ERROR_CLASS_PATTERNS:
+        if sql_error and pattern.search(sql_error):
+            return error_class
+    return None
+
+def classify_sql_topics(user_query: str, challenge_prompt: str):
+    text = f"{user_query or ''}\n{challenge_prompt or ''}"
+    return [topic for topic, pattern in TOPIC_PATTERNS if pattern.search(text)]
+
+def _error_routes(error_class, sql_error, user_query):
+    routes = []
+    if _PLACEHOLDER_PATTERN.search(user_query or ""):
+        routes.append(("keyword", "placeholder"))
+    if error_class in ("syntax error", "incomplete input"):
+        # Narrow generic syntax errors by where they happened
+        if _TRAILING_WHERE_PATTERN.search((user_query or "").strip()):
+            routes.append(("symptom", "incomplete_where"))
+        if sql_error and _NEAR_PUNCTUATION_PATTERN.search(sql_error):
+            routes.append(("symptom", "error_near_semicolon"))
+    routes.extend(ERROR_CLASS_ROUTES.get(error_class, []))
+    return routes
+
+class HintRouter:
+    """
+    Inverted index from metadata (field, value) to hint rows. Rows are positions in the
+    exported hint documents, the same rows NumpyHintIndex uses.
+    """
+    def __init__(self, documents, metadatas):
+        self.documents = documents
+        self.postings = defaultdict(list)
+        for row, metadata in enumerate(metadatas):
+            for field, value in (metadata or {}).items():
+                self.postings[(field, value)].append(row)
+
+    def rows_for(self, keys):
+        rows = []
+        for key in keys:
+            for row in self.postings.get(key, []):
+                if row not in rows:
+                    rows.append(row)
+        return rows
+
+    def route(self, user_query: str, challenge_prompt: str, sql_error: str = None, top_k=2):
+        """
+        Returns {"error_class", "topics", "documents", "candidate_rows"}. documents is set
+        when the hints can be served from metadata alone; otherwise candidate_rows is the
+        subset to rank by embedding (None means search everything).
+        """
+        error_class = classify_sql_error(sql_error)
+        topics = classify_sql_topics(user_query, challenge_prompt)
+        topic_rows = self.rows_for([("topic", topic) for topic in topics])
+        routed_rows = self.rows_for(_error_routes(error_class, sql_error, user_query))
+
+        route = {"error_class": error_class, "topics": topics, "documents": None, "candidate_rows": None}
+        if routed_rows:
+            # The error-specific hints lead; related topic hints fill the remaining slots
+            rows = routed_rows + [row for row in topic_rows if row not in routed_rows]
+            route["documents"] = [self.documents[row] for row in rows[:top_k]]
+        elif topic_rows and len(topic_rows) <= top_k:
+            route["documents"] = [self.documents[row] for row in topic_rows]
+        elif topic_rows:
+            route["candidate_rows"] = topic_rows
+        return route
+
+def get_hint_router(documents_path=HINT_DOCUMENTS_PATH):
+    # Built once per process from the exported hint documents; None if they are missing.
+    # A failed load is remembered until the documents file changes, so it isn't retried
+    # (and warned about) on every hint request
+    global _router, _router_failed_signature
+    with _router_lock:
+        if _router is None:
+            signature = documents_signature(documents_path)
+            if signature == _router_failed_signature:
+                return None
+            try:
+                with open(documents_path, encoding="utf-8") as f:
+                    stored = json.load(f)
+                _router = HintRouter(stored["documents"], stored["metadatas"])
+            except (OSError, ValueError, KeyError) as e:
+                print(f"WARNING: Hint router unavailable, using embedding search only: {e}")
+                _router_failed_signature = signature
+                return None
+        return _router
+
+def record_route(kind: str):
+    # kind: "metadata", "lexical", "candidates", "filtered_embedding" or "full_embedding"
+    with _router_lock:
+        _route_stats[kind] += 1
+
+def get_hint_route_stats():
+    with _router_lock:
+        return dict(_route_stats)
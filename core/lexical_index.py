@@ -0,0 +1,105 @@
+# querypath_app/core/lexical_index.py
+# BM25 retriever over the hint knowledge base. Learner SQL and sqlite errors are mostly
+# keywords and identifiers (WHERE, GROUP BY, "no such column"), which exact term matching
+# ranks well and a sentence embedder does not. Scores are fused with the vector ranking
+# by reciprocal rank fusion, and carry hint retrieval alone while no model is loaded.
+import json
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from core.hint_index import HINT_DOCUMENTS_PATH, documents_signature
+
+# --- Configuration ---
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60 # Standard reciprocal rank fusion constant; damps the weight of the very top ranks
+
+_TERM_PATTERN = re.compile(r"[a-z_][a-z0-9_]*|\d+")
+# Words that appear in nearly every prompt or hint and carry no signal
+STOPWORDS = frozenset("""
+a an and are as at be by can for from has have if in into is it its of on or that the
+their them these this those to was were which with you your user query problem sql error
+""".split())
+
+_lexical_index = None
+_lexical_index_failed_signature = False # documents_signature() of the last failed load; False if none failed
+_lexical_index_lock = threading.Lock()
+
+def _fold_plural(term):
+    # "orders"/"order", "columns"/"column"; no full stemmer for a few dozen hints
+    return term[:-1] if len(term) > 3 and term.endswith("s") and not term.endswith("ss") else term
+
+def tokenize(text: str):
+    return [_fold_plural(term) for term in _TERM_PATTERN.findall((text or "").lower()) if term not in STOPWORDS]
+
+class BM25Index:
+    """
+    Inverted index of term -> [(row, term frequency)] over the hint documents, in the
+    row order of the exported hint index.
+    """
+    def __init__(self, documents):
+        self.documents = documents
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for row, text in enumerate(documents):
+            terms = Counter(tokenize(text))
+            self.doc_lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self.postings[term].append((row, frequency))
+        self.average_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        count = len(documents)
+        self.idf = {
+            term: math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            for term, rows in self.postings.items()
+        }
+
+    def top_k(self, query_text: str, top_k=2, rows=None):
+        """Returns [(row, bm25_score), ...] best first, only rows sharing a term with the query."""
+        allowed = set(rows) if rows is not None else None
+        scores = defaultdict(float)
+        for term in set(tokenize(query_text)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for row, frequency in self.postings[term]:
+                if allowed is not None and row not in allowed:
+                    continue
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[row] / self.average_length
+                scores[row] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:top_k]
+
+    def query(self, query_text: str, top_k=2, rows=None):
+        return [self.documents[row] for row, _ in self.top_k(query_text, top_k, rows)]
+
+def reciprocal_rank_fusion(rankings, top_k=2, k=RRF_K):
+    """
+    Fuses ranked lists of documents: each list contributes 1 / (k + rank) per document.
+    Ties keep the order documents were first seen in, so the first ranking breaks them.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            scores[document] = scores.get(document, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda document: -scores[document])[:top_k]
+
+def get_lexical_index(documents_path=HINT_DOCUMENTS_PATH):
+    # Built once per process from the exported hint documents; None if they are missing.
+    # A failed load is remembered until the documents file changes (as in get_hint_router)
+    global _lexical_index, _lexical_index_failed_signature
+    with _lexical_index_lock:
+        if _lexical_index is None:
+            signature = documents_signature(documents_path)
+            if signature == _lexical_index_failed_signature:
+                return None
+            try:
+                with open(documents_path, encoding="utf-8") as f:
+                    _lexical_index = BM25Index(json.load(f)["documents"])
+                print(f"INFO: BM25 hint index built over {len(_lexical_index.documents)} documents.")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"WARNING: BM25 hint index unavailable, using vector search only: {e}")
+                _lexical_index_failed_signature = signature
+                return None
+        return _lexical_index
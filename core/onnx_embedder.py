@@ -0,0 +1,67 @@
+# querypath_app/core/onnx_embedder.py
+# CPU inference for the hint embedding model without PyTorch: the transformer is run as an
+# int8-quantized ONNX graph through onnxruntime, tokenized with the `tokenizers` package,
+# then mean-pooled and L2-normalized the way SentenceTransformer('all-MiniLM-L6-v2') does.
+# The model directory is produced by export_onnx_embedding_model.py.
+import json
+import os
+
+import numpy as np
+
+# --- Configuration ---
+ONNX_MODEL_DIR = "./models/all-MiniLM-L6-v2-onnx-int8"
+ONNX_MODEL_FILE = "model_int8.onnx"
+ONNX_TOKENIZER_FILE = "tokenizer.json"
+ONNX_CONFIG_FILE = "embedding_config.json" # {"max_seq_length", "normalize", "source_model"}
+ONNX_INTRA_OP_THREADS = 1 # Hint requests are small; leave the cores to other sessions
+
+class OnnxEmbeddingModel:
+    """
+    Drop-in for the parts of SentenceTransformer the app uses: encode(str) returns a 1-D
+    float32 vector, encode(list_of_str) a 2-D array with one row per text.
+    """
+    def __init__(self, model_dir=ONNX_MODEL_DIR):
+        import onnxruntime # Imported here so the torch backend never needs it
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.max_seq_length = self.config.get("max_seq_length", 256)
+        self.normalize = self.config.get("normalize", True)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, ONNX_TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding() # Pad each batch to its longest text
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = ONNX_INTRA_OP_THREADS
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    @staticmethod
+    def exists(model_dir=ONNX_MODEL_DIR):
+        return all(os.path.exists(os.path.join(model_dir, name))
+                   for name in (ONNX_MODEL_FILE, ONNX_TOKENIZER_FILE, ONNX_CONFIG_FILE))
+
+    def encode(self, texts, **_ignored):
+        single = isinstance(texts, str)
+        encodings = self.tokenizer.encode_batch([texts] if single else list(texts))
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        # Mean over real tokens only, as sentence-transformers' Pooling(mode='mean') does
+        mask = attention_mask[:, :, None].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+        embeddings = embeddings.astype(np.float32)
+        return embeddings[0] if single else embeddings
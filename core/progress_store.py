@@ -0,0 +1,215 @@
+# querypath_app/core/progress_store.py
+# Durable learner progress: points, solved challenges and the last query typed for each
+# challenge. These used to live only in st.session_state, so a reconnect or a second
+# worker process started the learner from zero. ProgressStore is the write-behind layer;
+# subclasses say where the progress lives: SqliteProgressStore, a local SQLite file in WAL
+# mode that several processes on one node can share, or RedisProgressStore
+# (core/state_backend.py) for workers on several nodes.
+# Writes are write-behind: the script thread only records the latest value in memory and
+# returns; a flush thread writes everything pending in one batch at most every
+# PROGRESS_FLUSH_INTERVAL_SECONDS, so a rerun never waits on the disk or the network. Repeated writes to
+# the same key before a flush (e.g. a query saved on every run) collapse into one row.
+import itertools
+import sqlite3
+import threading
+import time
+import traceback
+
+# --- Configuration ---
+PROGRESS_STORE_PATH = "./learner_progress.db"
+PROGRESS_FLUSH_INTERVAL_SECONDS = 0.25 # Upper bound on how long a write stays in memory only
+PROGRESS_FLUSH_EARLY_AT = 2000 # Pending writes that wake the flush thread before the interval
+PROGRESS_FLUSH_MAX_BATCH = 5000 # Writes per batch, so no single commit runs long
+PROGRESS_BUSY_TIMEOUT_SECONDS = 5.0 # Wait for another process's write transaction
+
+class ProgressStore:
+    """
+    record_* methods are safe from any thread and never touch storage; load() reads a
+    learner's progress, including writes that have not been flushed yet. Subclasses
+    implement _read(learner_id) and _write(points, solved, queries), and list the
+    exceptions a storage failure raises in STORAGE_ERRORS.
+    """
+    STORAGE_ERRORS = ()
+
+    def __init__(self, flush_interval_seconds=PROGRESS_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval_seconds = flush_interval_seconds
+        # Pending writes, latest value wins: ("points", learner) -> (points, at),
+        # ("solved", learner, challenge) -> at, ("query", learner, challenge) -> (text, at)
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # Held by flush() and load(), which may share a connection; batches commit in order
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._metrics = {
+            "writes": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "rows_flushed": 0,
+            "flush_errors": 0,
+            "flush_thread_errors": 0,
+            "max_flush_seconds": 0.0,
+            "max_pending": 0,
+            "loads": 0,
+        }
+        self._flusher_dead_reported = False
+        self._flusher = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+        self._flusher.start()
+
+    def _record(self, key, value):
+        with self._pending_lock:
+            if key in self._pending:
+                self._metrics["coalesced"] += 1
+            self._pending[key] = value
+            self._metrics["writes"] += 1
+            pending = len(self._pending)
+            self._metrics["max_pending"] = max(self._metrics["max_pending"], pending)
+        if pending >= PROGRESS_FLUSH_EARLY_AT:
+            self._wake.set()
+        if not self._flusher.is_alive() and not self._flusher_dead_reported:
+            # _run survives errors, so this is a bug; writes now pile up until flush() is called
+            self._flusher_dead_reported = True
+            print(f"ERROR: Progress flush thread is not running; {pending} writes are waiting in memory")
+
+    def record_points(self, learner_id: str, points: int):
+        self._record(("points", learner_id), (points, time.time()))
+
+    def record_solved(self, learner_id: str, challenge_id: str):
+        self._record(("solved", learner_id, challenge_id), time.time())
+
+    def record_query(self, learner_id: str, challenge_id: str, query_text: str):
+        self._record(("query", learner_id, challenge_id), (query_text, time.time()))
+
+    def load(self, learner_id: str):
+        """Returns {"points", "solved_challenges": set, "user_queries": dict} for learner_id."""
+        # Once per session start; waits out a flush in progress so its batch isn't missed
+        with self._flush_lock:
+            try:
+                progress = self._read(learner_id)
+            except self.STORAGE_ERRORS as e:
+                print(f"WARNING: Could not load progress for learner {learner_id}, starting fresh: {e}")
+                progress = {"points": 0, "solved_challenges": set(), "user_queries": {}}
+            # Writes still waiting for the flush thread are newer than anything on disk
+            with self._pending_lock:
+                self._metrics["loads"] += 1
+                for key, value in self._pending.items():
+                    if key[1] != learner_id:
+                        continue
+                    if key[0] == "points":
+                        progress["points"] = value[0]
+                    elif key[0] == "solved":
+                        progress["solved_challenges"].add(key[2])
+                    else:
+                        progress["user_queries"][key[2]] = value[0]
+        return progress
+
+    def flush(self):
+        """Commits every pending write, PROGRESS_FLUSH_MAX_BATCH per transaction. Returns the number of writes."""
+        flushed = 0
+        while True:
+            with self._flush_lock:
+                written = self._flush_batch()
+            flushed += written
+            if written < PROGRESS_FLUSH_MAX_BATCH:
+                return flushed
+
+    def _flush_batch(self):
+        with self._pending_lock:
+            # Oldest keys first; a key rewritten since keeps its place but carries its latest value
+            keys = list(itertools.islice(self._pending, PROGRESS_FLUSH_MAX_BATCH))
+            batch = {key: self._pending.pop(key) for key in keys}
+        if not batch:
+            return 0
+        points, solved, queries = [], [], []
+        for key, value in batch.items():
+            if key[0] == "points":
+                points.append((key[1], value[0], value[1]))
+            elif key[0] == "solved":
+                solved.append((key[1], key[2], value))
+            else:
+                queries.append((key[1], key[2], value[0], value[1]))
+        started = time.perf_counter()
+        try:
+            self._write(points, solved, queries)
+        except Exception as e:
+            with self._pending_lock:
+                self._metrics["flush_errors"] += 1
+                # Put the batch back without overwriting anything recorded since
+                for key, value in batch.items():
+                    self._pending.setdefault(key, value)
+            if not isinstance(e, self.STORAGE_ERRORS):
+                raise
+            print(f"WARNING: Progress flush of {len(batch)} writes failed, will retry: {e}")
+            return 0
+        elapsed = time.perf_counter() - started
+        with self._pending_lock:
+            self._metrics["flushes"] += 1
+            self._metrics["rows_flushed"] += len(batch)
+            self._metrics["max_flush_seconds"] = max(self._metrics["max_flush_seconds"], elapsed)
+        return len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Not a storage failure (those are handled in _flush_batch) but still no reason
+                # to stop flushing: log it and try again next interval
+                print(f"ERROR: Progress flush thread hit an unexpected error, will retry:\n{traceback.format_exc()}")
+                with self._pending_lock:
+                    self._metrics["flush_thread_errors"] += 1
+
+    def metrics(self):
+        with self._pending_lock:
+            metrics = dict(self._metrics)
+            metrics["pending"] = len(self._pending)
+        metrics["flush_thread_alive"] = self._flusher.is_alive()
+        return metrics
+
+class SqliteProgressStore(ProgressStore):
+    STORAGE_ERRORS = (sqlite3.Error,)
+
+    def __init__(self, path=PROGRESS_STORE_PATH, flush_interval_seconds=PROGRESS_FLUSH_INTERVAL_SECONDS):
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=PROGRESS_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL") # WAL: durable at checkpoint, safe against corruption
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS learners (
+                learner_id TEXT PRIMARY KEY, points INTEGER NOT NULL, updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS solved_challenges (
+                learner_id TEXT NOT NULL, challenge_id TEXT NOT NULL, solved_at REAL NOT NULL,
+                PRIMARY KEY (learner_id, challenge_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS user_queries (
+                learner_id TEXT NOT NULL, challenge_id TEXT NOT NULL, query_text TEXT NOT NULL,
+                updated_at REAL NOT NULL, PRIMARY KEY (learner_id, challenge_id)
+            ) WITHOUT ROWID;
+        """)
+        self._conn.commit()
+        super().__init__(flush_interval_seconds)
+
+    def _read(self, learner_id):
+        row = self._conn.execute("SELECT points FROM learners WHERE learner_id = ?", (learner_id,)).fetchone()
+        solved = {challenge_id for (challenge_id,) in self._conn.execute(
+            "SELECT challenge_id FROM solved_challenges WHERE learner_id = ?", (learner_id,))}
+        queries = dict(self._conn.execute(
+            "SELECT challenge_id, query_text FROM user_queries WHERE learner_id = ?", (learner_id,)))
+        return {"points": row[0] if row else 0, "solved_challenges": solved, "user_queries": queries}
+
+    def _write(self, points, solved, queries):
+        with self._conn: # One transaction: commits, or rolls back on error
+            self._conn.executemany(
+                "INSERT INTO learners (learner_id, points, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(learner_id) DO UPDATE SET points = excluded.points, updated_at = excluded.updated_at",
+                points)
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO solved_challenges (learner_id, challenge_id, solved_at) VALUES (?, ?, ?)",
+                solved)
+            self._conn.executemany(
+                "INSERT INTO user_queries (learner_id, challenge_id, query_text, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(learner_id, challenge_id) DO UPDATE SET"
+                " query_text = excluded.query_text, updated_at = excluded.updated_at",
+                queries)
@@ -0,0 +1,365 @@
+# querypath_app/core/query_precheck.py
+# Static check of a learner's query before it is run. Most failing runs are typos against
+# the schema (a misspelled table or column, a comparison with no value) or a JOIN with no
+# condition; each used to cost a trip through the grading executor and the database, and
+# came back as SQLite's bare "no such column: nme". The query is tokenized with the result
+# cache's tokenizer and its table and column references are checked against the database
+# catalog (what will actually run) and the challenge's schema block (what the learner was
+# shown). Only clear mistakes are rejected: anything the checker can't resolve with
+# certainty (subqueries, CTEs, derived tables) is left for SQLite to judge.
+import difflib
+import sqlite3
+import threading
+
+from core.db_connector import DB_URI
+from core.result_cache import tokenize_sql
+
+SQLITE_KEYWORDS = frozenset("""
+    ABORT ACTION ADD AFTER ALL ALTER ALWAYS ANALYZE AND AS ASC ATTACH AUTOINCREMENT BEFORE BEGIN
+    BETWEEN BY CASCADE CASE CAST CHECK COLLATE COLUMN COMMIT CONFLICT CONSTRAINT CREATE CROSS
+    CURRENT CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP DATABASE DEFAULT DEFERRABLE DEFERRED
+    DELETE DESC DETACH DISTINCT DO DROP EACH ELSE END ESCAPE EXCEPT EXCLUDE EXCLUSIVE EXISTS
+    EXPLAIN FAIL FILTER FIRST FOLLOWING FOR FOREIGN FROM FULL GENERATED GLOB GROUP GROUPS HAVING
+    IF IGNORE IMMEDIATE IN INDEX INDEXED INITIALLY INNER INSERT INSTEAD INTERSECT INTO IS ISNULL
+    JOIN KEY LAST LEFT LIKE LIMIT MATCH MATERIALIZED NATURAL NO NOT NOTHING NOTNULL NULL NULLS OF
+    OFFSET ON OR ORDER OTHERS OUTER OVER PARTITION PLAN PRAGMA PRECEDING PRIMARY QUERY RAISE
+    RANGE RECURSIVE REFERENCES REGEXP REINDEX RELEASE RENAME REPLACE RESTRICT RETURNING RIGHT
+    ROLLBACK ROW ROWS SAVEPOINT SELECT SET TABLE TEMP TEMPORARY THEN TIES TO TRANSACTION TRIGGER
+    UNBOUNDED UNION UNIQUE UPDATE USING VACUUM VALUES VIEW VIRTUAL WHEN WHERE WINDOW WITH WITHOUT
+""".split())
+IMPLICIT_COLUMNS = frozenset({"rowid", "oid", "_rowid_", "true", "false"})
+INTERNAL_TABLES = frozenset({"sqlite_master", "sqlite_schema", "sqlite_temp_master", "sqlite_sequence"})
+COMPARISON_OPERATORS = frozenset({"=", "==", "<>", "!=", "<", ">", "<=", ">=", "LIKE", "GLOB"})
+CLAUSE_KEYWORDS = frozenset({"AND", "OR", "WHERE", "GROUP", "ORDER", "LIMIT", "HAVING", "UNION", "EXCEPT", "INTERSECT"})
+JOIN_MODIFIERS = frozenset({"LEFT", "RIGHT", "FULL", "INNER", "OUTER", "CROSS", "NATURAL"})
+# Tokens after which a bare word is an alias ("SELECT name n", "COUNT(*) total"), not a column
+_VALUE_END_KEYWORDS = frozenset({"END", "NULL", "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP"})
+
+_db_catalogs = {} # db_uri -> {table: [columns]}, or None if it could not be read
+_challenge_schemas = {} # challenge_id -> (schema block, {table: [columns]})
+_precheck_lock = threading.Lock()
+_precheck_stats = {"checked": 0, "rejected": 0}
+
+def get_db_catalog(db_uri=DB_URI):
+    """{table or view name (lowercase): [column names (lowercase)]}, read once per process; None if unreadable."""
+    with _precheck_lock:
+        if db_uri not in _db_catalogs:
+            try:
+                conn = sqlite3.connect(db_uri, uri=True)
+                try:
+                    names = [name for (name,) in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")]
+                    _db_catalogs[db_uri] = {
+                        name.lower(): [row[1].lower() for row in conn.execute(f'PRAGMA table_info("{name}")')]
+                        for name in names
+                    }
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"WARNING: Could not read the database catalog for query pre-checks: {e}")
+                _db_catalogs[db_uri] = None
+        return _db_catalogs[db_uri]
+
+def _parse_schema_block(schema):
+    tables = schema if isinstance(schema, list) else [schema]
+    parsed = {}
+    for table in tables:
+        if isinstance(table, dict) and table.get("table"):
+            parsed[str(table["table"]).lower()] = [str(column).lower() for column in table.get("columns", [])]
+    return parsed
+
+def get_challenge_schema(challenge_id, challenge_data):
+    """{table (lowercase): [columns]} from the challenge's schema block, parsed once per challenge."""
+    schema = challenge_data.get("schema", {})
+    with _precheck_lock:
+        cached = _challenge_schemas.get(challenge_id)
+        # The catalog hands out the same schema object until it is reloaded
+        if cached is None or cached[0] is not schema:
+            cached = (schema, _parse_schema_block(schema))
+            _challenge_schemas[challenge_id] = cached
+        return cached[1]
+
+def _upper(token):
+    return token[1].upper() if token[0] == "word" else None
+
+def _identifier(token):
+    # A table/column/alias name: a bare non-keyword word or a quoted identifier
+    kind, text = token
+    if kind == "word" and text.upper() not in SQLITE_KEYWORDS:
+        return text.lower()
+    if kind == "quoted":
+        return text[1:-1].lower()
+    return None
+
+def _skip_parens(tokens, i):
+    # tokens[i] is "("; returns the index just past its matching ")"
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j][1] == "(":
+            depth += 1
+        elif tokens[j][1] == ")":
+            depth -= 1
+            if depth == 0:
+                return j + 1
+    return len(tokens)
+
+def _cte_names(tokens):
+    names = set()
+    for start, token in enumerate(tokens):
+        if _upper(token) != "WITH":
+            continue
+        i = start + 1
+        if i < len(tokens) and _upper(tokens[i]) == "RECURSIVE":
+            i += 1
+        while i < len(tokens) and _identifier(tokens[i]):
+            names.add(_identifier(tokens[i]))
+            i += 1
+            if i < len(tokens) and tokens[i][1] == "(": # Column list
+                i = _skip_parens(tokens, i)
+            if i >= len(tokens) or _upper(tokens[i]) != "AS":
+                break
+            i += 1
+            while i < len(tokens) and _upper(tokens[i]) in ("NOT", "MATERIALIZED"):
+                i += 1
+            if i >= len(tokens) or tokens[i][1] != "(":
+                break
+            i = _skip_parens(tokens, i)
+            if i >= len(tokens) or tokens[i][1] != ",":
+                break
+            i += 1
+    return names
+
+def _parse_source(tokens, i, depth):
+    """One FROM/JOIN source starting at tokens[i]: returns (source dict or None, index after it)."""
+    if i >= len(tokens):
+        return None, i
+    if tokens[i][1] == "(":
+        # Subquery or parenthesized join: scanned as the rest of the query, so not skipped
+        return {"table": None, "alias": None, "derived": True, "depth": depth}, i
+    name = _identifier(tokens[i])
+    if name is None:
+        return None, i
+    j = i + 1
+    if j + 1 < len(tokens) and tokens[j][1] == "." and _identifier(tokens[j + 1]): # schema.table
+        name = _identifier(tokens[j + 1])
+        j += 2
+    source = {"table": name, "alias": None, "derived": False, "depth": depth}
+    if j < len(tokens) and tokens[j][1] == "(": # Table-valued function, e.g. json_each(...)
+        j = _skip_parens(tokens, j)
+        source.update(table=None, derived=True)
+    if j < len(tokens) and _upper(tokens[j]) == "AS":
+        j += 1
+    if j < len(tokens) and _identifier(tokens[j]):
+        source["alias"] = _identifier(tokens[j])
+        j += 1
+    return source, j
+
+def _has_where_in_scope(tokens, start, depth):
+    # A WHERE at this nesting level before the enclosing parenthesis closes
+    level = depth
+    for token in tokens[start:]:
+        if token[1] == "(":
+            level += 1
+        elif token[1] == ")":
+            level -= 1
+            if level < depth:
+                return False
+        elif level == depth and _upper(token) == "WHERE":
+            return True
+    return False
+
+def _collect_sources(tokens):
+    sources, joins = [], []
+    depth, i = 0, 0
+    while i < len(tokens):
+        token = tokens[i]
+        upper = _upper(token)
+        if token[1] == "(":
+            depth += 1
+        elif token[1] == ")":
+            depth -= 1
+        elif upper == "FROM" and not (i >= 2 and _upper(tokens[i - 1]) == "DISTINCT" and _upper(tokens[i - 2]) == "NOT"):
+            source, j = _parse_source(tokens, i + 1, depth) # Not "IS NOT DISTINCT FROM"
+            while source is not None:
+                sources.append(source)
+                if source["derived"] or j >= len(tokens) or tokens[j][1] != ",":
+                    break
+                source, j = _parse_source(tokens, j + 1, depth) # Comma join
+            i = max(j, i + 1)
+            continue
+        elif upper == "JOIN":
+            modifiers = set()
+            k = i - 1
+            while k >= 0 and _upper(tokens[k]) in JOIN_MODIFIERS:
+                modifiers.add(_upper(tokens[k]))
+                k -= 1
+            left = next((source for source in reversed(sources) if source["depth"] == depth), None)
+            source, j = _parse_source(tokens, i + 1, depth)
+            if source is not None:
+                sources.append(source)
+                has_condition = j < len(tokens) and _upper(tokens[j]) in ("ON", "USING")
+                if not source["derived"] and not has_condition and not modifiers & {"CROSS", "NATURAL"}:
+                    joins.append({"left": left, "right": source, "where": _has_where_in_scope(tokens, j, depth)})
+            i = max(j, i + 1)
+            continue
+        i += 1
+    return sources, joins
+
+def _suggest(name, candidates):
+    matches = difflib.get_close_matches(name, list(candidates), n=1, cutoff=0.6)
+    return f"Did you mean `{matches[0]}`? " if matches else ""
+
+def _describe_tables(tables, challenge_schema, db_catalog):
+    # Columns as the challenge shows them, falling back to the database's
+    return "; ".join(
+        f"`{table}` ({', '.join(challenge_schema.get(table) or db_catalog.get(table, []))})" for table in tables
+    )
+
+def _check_incomplete_comparison(tokens):
+    for i, token in enumerate(tokens):
+        operator = _upper(token) or token[1]
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        ends_here = following is None or following[1] in (";", ")") or _upper(following) in CLAUSE_KEYWORDS
+        if operator in COMPARISON_OPERATORS and ends_here and i > 0:
+            left = tokens[i - 1][1]
+            example = (f"`{left} {token[1]} 'A%'`" if operator in ("LIKE", "GLOB")
+                       else f"`{left} {token[1]} 'some value'` or `{left} {token[1]} 10`")
+            return (f"incomplete input: missing a value after `{left} {token[1]}`",
+                    f"Compare `{left}` with a value, e.g. {example}.")
+        if operator == "WHERE" and (ends_here or _upper(following) in CLAUSE_KEYWORDS):
+            return ("incomplete input: WHERE has no condition",
+                    "Add a condition after WHERE, e.g. `WHERE country = 'Germany'`, or remove the WHERE.")
+    return None
+
+def _check_tables(sources, cte_names, challenge_schema, db_catalog):
+    for source in sources:
+        table = source["table"]
+        if source["derived"] or table in db_catalog or table in cte_names or table in INTERNAL_TABLES:
+            continue
+        known = list(challenge_schema) + [name for name in db_catalog if name not in challenge_schema]
+        return (f"no such table: {table}",
+                f"{_suggest(table, known)}Tables for this challenge: "
+                f"{_describe_tables(challenge_schema or db_catalog, challenge_schema, db_catalog)}.")
+    return None
+
+def _check_joins(joins, db_catalog):
+    for join in joins:
+        if join["where"]:
+            continue # Condition given in WHERE instead of ON
+        left, right = join["left"], join["right"]
+        left_name = (left["alias"] or left["table"]) if left and not left["derived"] else None
+        right_name = right["alias"] or right["table"]
+        shared = [column for column in db_catalog.get(right["table"], [])
+                  if left_name and column in db_catalog.get(left["table"], [])]
+        example = (f"`ON {left_name}.{shared[0]} = {right_name}.{shared[0]}`" if shared
+                   else f"`ON {left_name or 'first_table'}.some_column = {right_name}.some_column`")
+        return (f"JOIN without ON: every row of `{left_name or 'the left side'}` would be paired with every row of "
+                f"`{right_name}` (a Cartesian product)",
+                f"Add a join condition, e.g. {example}. If you really want every combination, write CROSS JOIN.")
+    return None
+
+def _is_alias(tokens, i):
+    # A name being defined: after AS, or right after a complete value ("name n", "COUNT(*) total")
+    if i == 0 or _identifier(tokens[i]) is None or tokens[i][0] != "word":
+        return False
+    previous = tokens[i - 1]
+    previous_upper = _upper(previous)
+    if i + 1 < len(tokens) and tokens[i + 1][1] in ("(", "."):
+        return False
+    return (previous_upper == "AS" or previous[0] in ("number", "string", "quoted") or previous[1] == ")"
+            or previous_upper in _VALUE_END_KEYWORDS
+            # "name n" and "c.name n": a word right after a complete column reference is its alias
+            # ("name" in "c.name" follows ".", not a word, so it is never taken for one)
+            or (previous[0] == "word" and previous_upper not in SQLITE_KEYWORDS))
+
+def _check_columns(tokens, sources, challenge_schema, db_catalog):
+    tables_by_name = {}
+    for source in sources:
+        tables_by_name[source["table"]] = source["table"]
+        if source["alias"]:
+            tables_by_name[source["alias"]] = source["table"]
+    in_scope = [source["table"] for source in sources]
+    available = {column for table in in_scope for column in db_catalog[table]}
+    # Aliases may be used before or after they are defined (e.g. ORDER BY total)
+    select_aliases = {token[1].lower() for i, token in enumerate(tokens) if _is_alias(tokens, i)}
+
+    def unknown_column(reference, table_columns, tables):
+        # The challenge may show a column the database lacks: say so rather than blame the learner
+        column = reference.split(".")[-1]
+        if any(column in challenge_schema.get(table, []) for table in tables):
+            return (f"no such column: {reference}",
+                    f"The challenge schema lists `{column}`, but the database table doesn't have it. "
+                    "This challenge's data is out of date; please report it.")
+        return (f"no such column: {reference}",
+                f"{_suggest(column, table_columns)}Columns available: {_describe_tables(tables, challenge_schema, db_catalog)}.")
+
+    skip_next = False
+    for i, token in enumerate(tokens):
+        if skip_next:
+            skip_next = False
+            continue
+        if token[0] != "word" or token[1].upper() in SQLITE_KEYWORDS:
+            continue
+        name = token[1].lower()
+        previous = tokens[i - 1] if i > 0 else None
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if following is not None and following[1] == "(":
+            continue # Function call
+        if following is not None and following[1] == "." and i + 2 < len(tokens):
+            column = _identifier(tokens[i + 2])
+            skip_next = True
+            if column is None or name in ("main", "temp"): # main.customers is a table, not a column
+                continue # table.* or something SQLite will report itself
+            if name not in tables_by_name:
+                return (f"no such column: {name}.{column}",
+                        f"`{name}` is not a table or alias in this query. Tables in this query: "
+                        f"{_describe_tables(in_scope, challenge_schema, db_catalog)}.")
+            table = tables_by_name[name]
+            if column not in db_catalog[table] and column not in IMPLICIT_COLUMNS:
+                return unknown_column(f"{name}.{column}", db_catalog[table], [table])
+            continue
+        if previous is not None and (previous[1] in (".", ":", "@", "$") or _upper(previous) == "COLLATE"):
+            continue
+        if _is_alias(tokens, i) or name in tables_by_name or name in select_aliases or name in IMPLICIT_COLUMNS or name in available:
+            continue
+        return unknown_column(name, available, in_scope)
+    return None
+
+def precheck_query(user_query: str, challenge_data: dict, challenge_id: str = None, db_uri=DB_URI):
+    """
+    Returns an error message (worded like SQLite's, followed by a hint) if user_query
+    clearly can't run or would be a Cartesian product, or None to run it as usual.
+    """
+    db_catalog = get_db_catalog(db_uri)
+    tokens = tokenize_sql(user_query)
+    if not db_catalog or not tokens:
+        return None
+    challenge_schema = get_challenge_schema(challenge_id, challenge_data)
+    cte_names = _cte_names(tokens)
+    sources, joins = _collect_sources(tokens)
+    problem = (_check_incomplete_comparison(tokens)
+               or _check_tables(sources, cte_names, challenge_schema, db_catalog)
+               or _check_joins(joins, db_catalog))
+    # Unqualified names are only resolvable in a single SELECT over real tables
+    simple_query = (
+        sources and not cte_names
+        and sum(1 for token in tokens if _upper(token) == "SELECT") == 1
+        and not any(_upper(token) == "WINDOW" for token in tokens)
+        and all(not source["derived"] and source["table"] in db_catalog for source in sources)
+    )
+    if problem is None and simple_query:
+        problem = _check_columns(tokens, sources, challenge_schema, db_catalog)
+    with _precheck_lock:
+        _precheck_stats["checked"] += 1
+        if problem is not None:
+            _precheck_stats["rejected"] += 1
+    if problem is None:
+        return None
+    message, hint = problem
+    return f"{message}\n\n*Hint: {hint}*"
+
+def get_query_precheck_stats():
+    with _precheck_lock:
+        stats = dict(_precheck_stats)
+    stats["rejection_rate"] = stats["rejected"] / stats["checked"] if stats["checked"] else 0.0
+    return stats
@@ -0,0 +1,69 @@
+# querypath_app/core/query_sandbox.py
+# Execution budget for learner queries. A runaway query (huge cross join, recursive CTE
+# without a stop condition, ...) must not hold a connection indefinitely, so every graded
+# query runs under limits on SQLite VM steps, wall-clock time and returned rows.
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Budget configuration ---
+MAX_VM_STEPS = 20_000_000 # SQLite virtual machine instructions per query
+MAX_QUERY_SECONDS = 3.0 # Wall-clock time per query, including fetching the rows
+MAX_RESULT_ROWS = 10_000 # Rows a query may return before it is stopped
+PROGRESS_HANDLER_INTERVAL = 1_000 # The progress handler runs every N VM instructions
+
+LIMIT_DESCRIPTIONS = {
+    "vm_steps": "it did too much work in the database",
+    "time": "it ran for too long",
+    "rows": "it returned too many rows",
+}
+
+class QueryBudgetExceeded(Exception):
+    def __init__(self, limit: str, detail: str = ""):
+        self.limit = limit # One of LIMIT_DESCRIPTIONS' keys
+        message = f"Query exceeded budget: {LIMIT_DESCRIPTIONS.get(limit, limit)}"
+        if detail:
+            message += f" ({detail})"
+        super().__init__(message)
+
+@contextmanager
+def query_budget(conn, max_vm_steps: int = MAX_VM_STEPS, max_seconds: float = MAX_QUERY_SECONDS):
+    """
+    Runs the enclosed statements on conn under a VM-step and wall-clock budget.
+    The progress handler aborts the statement once either limit is passed; a timer calling
+    conn.interrupt() backs up the time limit for long single steps (e.g. a big sort).
+    Raises QueryBudgetExceeded instead of sqlite3's generic "interrupted" error.
+    """
+    state = {"steps": 0, "tripped": None}
+    deadline = time.monotonic() + max_seconds
+
+    def progress_handler():
+        state["steps"] += PROGRESS_HANDLER_INTERVAL
+        if state["steps"] > max_vm_steps:
+            state["tripped"] = "vm_steps"
+            return 1 # Non-zero aborts the running statement
+        if time.monotonic() > deadline:
+            state["tripped"] = "time"
+            return 1
+        return 0
+
+    def on_deadline():
+        state["tripped"] = state["tripped"] or "time"
+        conn.interrupt()
+
+    timer = threading.Timer(max_seconds, on_deadline)
+    timer.daemon = True
+    conn.set_progress_handler(progress_handler, PROGRESS_HANDLER_INTERVAL)
+    timer.start()
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if state["tripped"] and "interrupt" in str(e).lower():
+            if state["tripped"] == "vm_steps":
+                raise QueryBudgetExceeded("vm_steps", f"more than {max_vm_steps:,} steps") from e
+            raise QueryBudgetExceeded("time", f"more than {max_seconds:g}s") from e
+        raise
+    finally:
+        timer.cancel()
+        conn.set_progress_handler(None, PROGRESS_HANDLER_INTERVAL)
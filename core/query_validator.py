@@ -1,51 +1,240 @@
+import streamlit as st
 import pandas as pd
+import numpy as np
 import unicodedata
 
-def normalize_df(df):
+# Plain ASCII numeric literals, matched after strip/lower. Anything Python's int()/float()
+# would accept beyond these (underscores, non-ASCII digits) goes through _clean_value.
+_INT_PATTERN = r"[+-]?[0-9]+"
+_FLOAT_PATTERN = r"[+-]?(?:[0-9]+\.[0-9]*|\.[0-9]+)(?:e[+-]?[0-9]+)?"
+_MAX_VECTOR_INT_DIGITS = 18 # Longer literals may not fit in int64, let Python handle them
+
+def _clean_value(val):
+    # Per-cell canonical form. normalize_df reproduces this column-wise; this stays the
+    # reference and handles the rare cells the vectorized path can't decide on its own.
+    if pd.isnull(val): return val
+    val_str = str(val).strip().lower()
+    # Attempt to convert to numeric if possible, helps with type mismatches from SQL
+    try:
+        if '.' in val_str: # Potentially float
+            num_val = float(val_str)
+            if num_val == int(num_val): # if it's like 5.0, treat as int 5
+                return int(num_val)
+            return num_val
+        else: # Potentially int
+            return int(val_str)
+    except ValueError:
+        # Not numeric, proceed with string normalization
+        return unicodedata.normalize("NFC", val_str)
+
+
+def _finish_column(out, series):
+    # Same dtype inference Series.apply performs on its results
+    return pd.Series(out, index=series.index, name=series.name, dtype=object).infer_objects()
+
+
+def _normalize_float_column(series):
+    values = series.to_numpy(dtype=np.float64)
+    out = series.to_numpy(dtype=object).copy() # NaN stays as-is, like _clean_value
+    magnitude = np.abs(values)
+    # str(float) switches to exponent notation outside [1e-4, 1e16), which changes how
+    # _clean_value parses it, so only the plain-notation values are handled here.
+    plain = np.isfinite(values) & (magnitude < 1e16) & ((magnitude >= 1e-4) | (values == 0))
+    whole = plain & (values == np.floor(values))
+    out[whole] = values[whole].astype(np.int64).astype(object)
+    out[plain & ~whole] = values[plain & ~whole].astype(object)
+    fallback = ~np.isnan(values) & ~plain
+    for pos in np.flatnonzero(fallback):
+        out[pos] = _clean_value(out[pos])
+    return _finish_column(out, series)
+
+
+def _canonical_text_values(raw_values):
+    # raw_values: non-null object ndarray. Returns the _clean_value result for each entry.
+    raw = pd.Series(raw_values, dtype=object)
+    if pd.api.types.infer_dtype(raw, skipna=False) != "string":
+        raw = raw.map(str).astype(object)
+    # Object dtype keeps .str on Python's own strip()/lower(), matching _clean_value exactly
+    text = raw.str.strip().str.lower()
+    result = text.to_numpy(dtype=object).copy()
+
+    # Non-ASCII text needs NFC (and may hold Unicode digits int() accepts); underscores are
+    # valid digit separators for int()/float(). Both are rare, so they go cell by cell.
+    per_cell = np.array(text.str.contains(r"[^\x00-\x7f]", regex=True) | text.str.contains("_", regex=False), dtype=bool)
+
+    int_literal = np.array(text.str.fullmatch(_INT_PATTERN), dtype=bool) & ~per_cell
+    short_int = int_literal & np.array(text.str.len() <= _MAX_VECTOR_INT_DIGITS, dtype=bool)
+    per_cell |= int_literal & ~short_int
+    if short_int.any():
+        ints = pd.to_numeric(text[short_int], errors="coerce").to_numpy(dtype=np.int64)
+        result[short_int] = ints.astype(object)
+
+    is_float = np.array(text.str.fullmatch(_FLOAT_PATTERN), dtype=bool) & ~per_cell
+    if is_float.any():
+        # astype(float64) on str objects goes through Python's float(), so the parsed
+        # values are bit-identical to _clean_value's
+        floats = text[is_float].to_numpy(dtype=object).astype(np.float64)
+        finite = np.isfinite(floats)
+        whole = finite & (floats == np.floor(floats))
+        fits = whole & (np.abs(floats) < 2.0 ** 63)
+        converted = floats.astype(object)
+        converted[fits] = floats[fits].astype(np.int64).astype(object)
+        float_positions = np.flatnonzero(is_float)
+        result[float_positions] = converted
+        # inf (overflowing exponents) and huge whole values keep _clean_value's semantics
+        per_cell[float_positions[~finite | (whole & ~fits)]] = True
+
+    for pos in np.flatnonzero(per_cell):
+        result[pos] = _clean_value(raw_values[pos])
+    return result
+
+
+def _normalize_object_column(series):
+    values = series.to_numpy(dtype=object)
+    out = values.copy()
+    not_null = ~pd.isna(values)
+    if not not_null.any():
+        return _finish_column(out, series)
+
+    present = values[not_null]
+    if pd.api.types.infer_dtype(present, skipna=False) == "string":
+        # SQL text columns repeat heavily (countries, dates, categories): canonicalize each
+        # distinct string once and broadcast back through the factorize codes.
+        codes, uniques = pd.factorize(present)
+        out[not_null] = _canonical_text_values(np.asarray(uniques, dtype=object)).take(codes)
+    else:
+        # Mixed Python objects: 1, 1.0 and True hash alike but normalize differently
+        out[not_null] = _canonical_text_values(present)
+    return _finish_column(out, series)
+
+
+def _normalize_column(series):
+    if series.empty:
+        return series.apply(_clean_value) # Keeps apply's dtype rules for empty results
+    # NumPy dtypes only: nullable extension types (Int64, Float64, boolean) share the dtype
+    # kind but can hold <NA>, which these fast paths can't convert
+    is_numpy_dtype = isinstance(series.dtype, np.dtype)
+    if is_numpy_dtype and series.dtype == np.bool_:
+        return _finish_column(np.where(series.to_numpy(), "true", "false").astype(object), series)
+    if is_numpy_dtype and series.dtype.kind == "i":
+        return series.astype(np.int64)
+    if is_numpy_dtype and series.dtype.kind == "f":
+        return _normalize_float_column(series)
+    if series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+        return _normalize_object_column(series)
+    # Datetimes, categoricals, nullable extension types, ...: rare in SQL results
+    return series.apply(_clean_value)
+
+
+def _normalize_df_per_cell(df):
+    # Original cell-by-cell implementation, kept as the reference for benchmark_normalize.py
+    df_copy = df.copy()
+    df_copy.columns = [str(col).strip().lower() for col in df_copy.columns]
+    for col in df_copy.columns:
+        df_copy[col] = df_copy[col].apply(_clean_value)
+    df_copy = df_copy.reindex(sorted(df_copy.columns), axis=1)
+    if not df_copy.empty:
+        df_copy = df_copy.sort_values(by=df_copy.columns.tolist()).reset_index(drop=True)
+    return df_copy
+
+
+def normalize_df(df, sort_rows=True):
     if df is None:
         return None
     if not isinstance(df, pd.DataFrame):
         st.error(f"Expected a DataFrame for normalization, got {type(df)}")
         return pd.DataFrame() # Return empty DF to prevent further errors
 
-    def clean(val):
-        if pd.isnull(val): return val
-        val_str = str(val).strip().lower()
-        # Attempt to convert to numeric if possible, helps with type mismatches from SQL
-        try:
-            if '.' in val_str: # Potentially float
-                num_val = float(val_str)
-                if num_val == int(num_val): # if it's like 5.0, treat as int 5
-                    return int(num_val)
-                return num_val
-            else: # Potentially int
-                return int(val_str)
-        except ValueError:
-            # Not numeric, proceed with string normalization
-            return unicodedata.normalize("NFC", val_str)
-
     df_copy = df.copy()
     df_copy.columns = [str(col).strip().lower() for col in df_copy.columns]
 
-    # Apply cleaning to all cells
+    # Normalize column by column (same canonical values as _clean_value on every cell)
     for col in df_copy.columns:
-        df_copy[col] = df_copy[col].apply(clean)
+        df_copy[col] = _normalize_column(df_copy[col])
 
     # Sort columns and then rows for consistent comparison
     df_copy = df_copy.reindex(sorted(df_copy.columns), axis=1)
-    if not df_copy.empty:
+    if sort_rows and not df_copy.empty:
         df_copy = df_copy.sort_values(by=df_copy.columns.tolist()).reset_index(drop=True)
     return df_copy
 
 
-def validate_output(user_df: pd.DataFrame, expected_output_data: list):
+def row_hashes(norm_df):
+    # One uint64 per row over the normalized values (row position is not part of the hash)
+    return pd.util.hash_pandas_object(norm_df, index=False).to_numpy()
+
+
+def _hash_collision_suspected(df_a, df_b):
+    # Cheap O(n) cross-checks that must hold whenever the row multisets really are equal.
+    # Failing one after the row hashes matched means two different rows hashed alike.
+    for col in df_a.columns:
+        col_a = pd.util.hash_pandas_object(df_a[col], index=False).to_numpy()
+        col_b = pd.util.hash_pandas_object(df_b[col], index=False).to_numpy()
+        if col_a.sum(dtype=np.uint64) != col_b.sum(dtype=np.uint64): # Wraps mod 2**64, order-free
+            return True
+    # Inside one frame, identical hashes must belong to identical rows
+    for df in (df_a, df_b):
+        if pd.Series(row_hashes(df)).duplicated().sum() != df.duplicated().sum():
+            return True
+    return False
+
+
+def _row_hash_counts(norm_df):
+    # Multiset of row hashes: hash -> number of rows with that hash
+    return pd.Series(row_hashes(norm_df)).value_counts()
+
+
+def row_keys(norm_df):
+    # Dtype-independent row identity (5 == 5.0, NULL == NaN) for comparing rows batch by
+    # batch, where each batch's inferred dtypes may differ from the whole result's.
+    return [
+        tuple(None if pd.isnull(val) else val for val in row)
+        for row in norm_df.itertuples(index=False, name=None)
+    ]
+
+
+def compile_expected_output(expected_output_data: list):
+    # Canonical form of a challenge's expected_output, built once and reused for every
+    # grade: the normalized frame plus its row-hash fingerprint. Treat it as read-only.
+    norm_expected_df = normalize_df(pd.DataFrame(expected_output_data), sort_rows=False)
+    return {
+        "frame": norm_expected_df,
+        "row_hash_counts": _row_hash_counts(norm_expected_df),
+        "row_keys": row_keys(norm_expected_df),
+    }
+
+
+def _frames_match_unordered(norm_user_df, norm_expected_df, expected_counts=None):
+    # Compare the two frames as multisets of row hashes: hash tables, no sorted copies
+    user_counts = _row_hash_counts(norm_user_df)
+    if expected_counts is None:
+        expected_counts = _row_hash_counts(norm_expected_df)
+    if len(user_counts) != len(expected_counts):
+        return False
+    if not (user_counts.reindex(expected_counts.index) == expected_counts).all():
+        return False
+
+    if _hash_collision_suspected(norm_user_df, norm_expected_df):
+        # Exact fallback: the original sort-then-equals comparison
+        columns = norm_user_df.columns.tolist()
+        sorted_user = norm_user_df.sort_values(by=columns).reset_index(drop=True)
+        sorted_expected = norm_expected_df.sort_values(by=columns).reset_index(drop=True)
+        return sorted_user.equals(sorted_expected)
+    return True
+
+
+def validate_output(user_df: pd.DataFrame, expected_output_data: list, order_sensitive: bool = False,
+                    compiled_expected: dict = None):
+    # order_sensitive comes from the challenge JSON ("order_sensitive": true) for prompts
+    # where ORDER BY is part of the answer; otherwise row order is ignored.
+    # compiled_expected (from compile_expected_output) skips re-normalizing expected_output_data.
     if user_df is None:
         return False, None, None # Not correct, no normalized user_df, no normalized_expected_df
 
-    expected_df = pd.DataFrame(expected_output_data)
-    
-    norm_user_df = normalize_df(user_df)
-    norm_expected_df = normalize_df(expected_df)
+    if compiled_expected is None:
+        compiled_expected = compile_expected_output(expected_output_data)
+    norm_expected_df = compiled_expected["frame"]
+    norm_user_df = normalize_df(user_df, sort_rows=False)
 
     # Debug:
     # st.write("Normalized User DF:")
@@ -57,12 +246,19 @@ def validate_output(user_df: pd.DataFrame, expected_output_data: list):
     if list(norm_user_df.columns) != list(norm_expected_df.columns):
         # st.warning(f"Column mismatch. User: {list(norm_user_df.columns)}, Expected: {list(norm_expected_df.columns)}")
         return False, norm_user_df, norm_expected_df
-    
+
     # Check number of rows
     if len(norm_user_df) != len(norm_expected_df):
         # st.warning(f"Row count mismatch. User: {len(norm_user_df)}, Expected: {len(norm_expected_df)}")
         return False, norm_user_df, norm_expected_df
 
-    # Final check with .equals after sorting
-    is_correct = norm_user_df.equals(norm_expected_df)
-    return is_correct, norm_user_df, norm_expected_df
\ No newline at end of file
+    # Same dtype per column, as DataFrame.equals requires
+    if list(norm_user_df.dtypes) != list(norm_expected_df.dtypes):
+        return False, norm_user_df, norm_expected_df
+
+    if order_sensitive:
+        # Row order is part of the answer: positional, exact comparison
+        is_correct = norm_user_df.reset_index(drop=True).equals(norm_expected_df.reset_index(drop=True))
+    else:
+        is_correct = _frames_match_unordered(norm_user_df, norm_expected_df, compiled_expected["row_hash_counts"])
+    return is_correct, norm_user_df, norm_expected_df
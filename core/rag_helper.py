@@ -1,75 +1,259 @@
 # querypath_app/core/rag_helper.py
+import threading
+import time
 import streamlit as st
-from sentence_transformers import SentenceTransformer
-import chromadb
+
+from core.hint_index import NumpyHintIndex
+from core.hint_router import get_hint_router, record_route
+from core.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from core.onnx_embedder import OnnxEmbeddingModel, ONNX_MODEL_DIR
+from core.embedding_batcher import EmbeddingBatcher
+from core.embedding_cache import build_hint_embedding_text, build_attempt_embedding_text, get_or_compute_embedding
+from core.hint_candidates import get_challenge_hint_candidates, rerank_hint_candidates
 
 # --- Configuration (same as before) ---
 CHROMA_DB_PATH = "./chroma_db_sql_hints"
 COLLECTION_NAME = "sql_hints_knowledge_base"
 EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+# "numpy": brute-force search over the memory-mapped embeddings populate_chroma_kb.py
+# exports next to CHROMA_DB_PATH (same ranking, no Chroma client on the hint path).
+# "chroma": query the persistent Chroma collection. numpy falls back to chroma if the
+# exported files are missing.
+HINT_RETRIEVER_BACKEND = "numpy"
+FUSION_CANDIDATES = 8 # Hints taken from each of the vector and BM25 rankings before fusing them
+# "torch": SentenceTransformer in full precision. "onnx": the int8 ONNX export of the same
+# model (export_onnx_embedding_model.py) run by onnxruntime, with no torch import.
+# onnx falls back to torch if the exported model is missing.
+EMBEDDING_BACKEND = "torch"
+
+# --- Lazy Embedding Model and Vector DB Client ---
+# Loading SentenceTransformer (torch) and opening Chroma takes seconds, so nothing is
+# loaded at import time: the hint system is built on the first hint request, or by
+# start_hint_system_warmup() in a background thread once the first page has rendered.
+_hint_system = None # {"embedding_model", "embedding_service", "hints_collection", "errors", "load_seconds"}
+_hint_system_lock = threading.Lock()
+_warmup_thread = None
 
-# --- Initialize Embedding Model and Vector DB Client (same as before) ---
-@st.cache_resource(show_spinner="Loading hint system...") # Combined spinner
 def load_embedding_model_and_collection():
     embedding_model = None
     hints_collection = None
-    try:
-        embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-        print("INFO: RAG Embedding model loaded.")
-    except Exception as e:
-        print(f"ERROR: Failed to load RAG embedding model: {e}")
-        st.error(f"Hint system (embedding model) error: {e}")
+    errors = []
+    if EMBEDDING_BACKEND == "onnx":
+        if OnnxEmbeddingModel.exists():
+            try:
+                embedding_model = OnnxEmbeddingModel()
+                print(f"INFO: RAG Embedding model loaded (ONNX int8 from {ONNX_MODEL_DIR}).")
+            except Exception as e:
+                print(f"WARNING: Failed to load ONNX embedding model, falling back to torch: {e}")
+        else:
+            print(f"WARNING: No ONNX embedding model in {ONNX_MODEL_DIR}, falling back to torch. Run export_onnx_embedding_model.py.")
+    if embedding_model is None:
+        try:
+            from sentence_transformers import SentenceTransformer # Heavy import, deferred on purpose
+            embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+            print("INFO: RAG Embedding model loaded.")
+        except Exception as e:
+            print(f"ERROR: Failed to load RAG embedding model: {e}")
+            errors.append(f"Hint system (embedding model) error: {e}")
+
+    if HINT_RETRIEVER_BACKEND == "numpy" and NumpyHintIndex.exists():
+        try:
+            hints_collection = NumpyHintIndex()
+            print(f"INFO: Loaded NumPy hint index with {hints_collection.count()} items.")
+            return embedding_model, hints_collection, errors
+        except Exception as e:
+            print(f"WARNING: Failed to load NumPy hint index, falling back to ChromaDB: {e}")
 
     try:
+        import chromadb
         client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
         # Try to get collection, if it fails, it means it likely wasn't created by populate_chroma_kb.py
         hints_collection = client.get_collection(name=COLLECTION_NAME)
         print(f"INFO: Connected to ChromaDB collection '{COLLECTION_NAME}' with {hints_collection.count()} items.")
     except Exception as e:
         print(f"ERROR: Failed to connect/get ChromaDB collection '{COLLECTION_NAME}': {e}")
-        st.error(f"Hint Knowledge Base error: {e}. Please ensure 'populate_chroma_kb.py' has been run successfully.")
-    
-    return embedding_model, hints_collection
+        errors.append(f"Hint Knowledge Base error: {e}. Please ensure 'populate_chroma_kb.py' has been run successfully.")
+
+    return embedding_model, hints_collection, errors
+
+def get_hint_system():
+    # Loads once per process; concurrent callers (warm-up thread, first hint click) wait
+    # for the same load instead of starting a second one.
+    global _hint_system
+    with _hint_system_lock:
+        if _hint_system is None:
+            get_lexical_index() # Milliseconds; built first so lexical hints work during the model load
+            started = time.perf_counter()
+            embedding_model, hints_collection, errors = load_embedding_model_and_collection()
+            _hint_system = {
+                "embedding_model": embedding_model,
+                # Concurrent hint requests from different sessions are encoded as one batch
+                "embedding_service": EmbeddingBatcher(embedding_model) if embedding_model else None,
+                "hints_collection": hints_collection,
+                "errors": errors,
+                "load_seconds": time.perf_counter() - started,
+            }
+            print(f"INFO: Hint system initialized in {_hint_system['load_seconds']:.2f}s.")
+        return _hint_system
+
+def embedding_model_key(embedding_model):
+    # Quantized vectors differ slightly from full-precision ones, so they are cached apart
+    if isinstance(embedding_model, OnnxEmbeddingModel):
+        return f"{EMBEDDING_MODEL_NAME}:onnx-int8"
+    return EMBEDDING_MODEL_NAME
+
+def get_embedding_service_metrics():
+    # Queue depth and batch sizes of the shared embedding service; None until it has loaded
+    if _hint_system is None or _hint_system["embedding_service"] is None:
+        return None
+    return _hint_system["embedding_service"].metrics()
+
+def is_hint_system_ready():
+    return _hint_system is not None
+
+def start_hint_system_warmup():
+    # Called after the first page render; a no-op once warm-up has started
+    global _warmup_thread
+    with _hint_system_lock:
+        if _warmup_thread is not None or _hint_system is not None:
+            return False
+        _warmup_thread = threading.Thread(target=get_hint_system, name="hint-system-warmup", daemon=True)
+    _warmup_thread.start()
+    return True
+
+
+def search_hint_documents(hints_collection, query_vector, top_k=2, rows=None, topics=None):
+    # hints_collection is a NumpyHintIndex or a Chroma collection, depending on the backend.
+    # rows (NumPy) / topics (Chroma) restrict the search to the hint router's subset.
+    if isinstance(hints_collection, NumpyHintIndex):
+        return [hints_collection.documents[row] for row, _ in hints_collection.top_k(query_vector, top_k, rows=rows)]
+    query_kwargs = {"where": {"topic": {"$in": list(topics)}}} if topics else {}
+    results = hints_collection.query(
+        query_embeddings=[query_vector],
+        n_results=top_k,
+        include=['documents'], # We only need the document text
+        **query_kwargs
+    )
+    if results and results.get('documents') and results['documents'][0]:
+        return results['documents'][0]
+    return []
 
-embedding_model, hints_collection = load_embedding_model_and_collection()
 
+class _UncachedHints(Exception):
+    # Raised out of _search_hints with a degraded answer (lexical only, or an error
+    # message), so st.cache_data doesn't keep serving it once the full path would work
+    def __init__(self, hints, route=None, error=None):
+        super().__init__(error or route)
+        self.hints = hints
+        self.route = route
+        self.error = error
+
+def _route_hint_request(user_query: str, challenge_prompt: str, sql_error: str, top_k):
+    hint_router = get_hint_router()
+    return hint_router.route(user_query, challenge_prompt, sql_error, top_k) if hint_router is not None else None
+
+def _lexical_query(user_query: str, challenge_prompt: str, sql_error: str):
+    return f"{user_query}\n{challenge_prompt}\n{sql_error or ''}"
+
+def _lexical_hints(user_query: str, challenge_prompt: str, sql_error: str, route):
+    # BM25 ranking within the router's subset; needs no model
+    lexical_index = get_lexical_index()
+    if lexical_index is None:
+        return []
+    return lexical_index.query(_lexical_query(user_query, challenge_prompt, sql_error), FUSION_CANDIDATES,
+                               rows=route["candidate_rows"] if route else None)
+
+def get_vector_db_hints(user_query: str, challenge_prompt: str, sql_error: str = None, top_k=2, # Can retrieve more than 1
+                        challenge_id: str = None):
+    # Route stats are recorded here, outside the cached search, so cache hits count too
+
+    # 0. Route on the error class and SQL topic; most requests are answered from metadata
+    # here, without the embedding model
+    route = _route_hint_request(user_query, challenge_prompt, sql_error, top_k)
+    if route and route["documents"]:
+        record_route("metadata")
+        return route["documents"]
+
+    # 1. Lexical (BM25) ranking answers while the model loads; not cached, so the same
+    # request gets vector fusion as soon as the model is ready
+    if not is_hint_system_ready():
+        lexical_hits = _lexical_hints(user_query, challenge_prompt, sql_error, route)
+        if lexical_hits:
+            record_route("lexical")
+            return lexical_hits[:top_k]
+
+    try:
+        hints, route_kind = _search_hints(user_query, challenge_prompt, sql_error, top_k, challenge_id)
+    except _UncachedHints as degraded:
+        if degraded.error:
+            st.error(degraded.error)
+        hints, route_kind = degraded.hints, degraded.route
+    if route_kind:
+        record_route(route_kind)
+    return hints
 
 @st.cache_data(show_spinner="🧠 Searching for relevant hints...", ttl=300)
-def get_vector_db_hints(user_query: str, challenge_prompt: str, sql_error: str = None, top_k=2): # Can retrieve more than 1
+def _search_hints(user_query: str, challenge_prompt: str, sql_error: str, top_k, challenge_id: str):
+    # Hybrid vector + lexical search with the loaded model. Returns (hints, route kind);
+    # anything short of that raises _UncachedHints instead of being cached.
+    route = _route_hint_request(user_query, challenge_prompt, sql_error, top_k)
+    candidate_rows = route["candidate_rows"] if route else None
+    topics = route["topics"] if route and candidate_rows else None
+    lexical_hits = _lexical_hints(user_query, challenge_prompt, sql_error, route)
+
+    hint_system = get_hint_system() # Waits for the warm-up if it is still running
+    embedding_model = hint_system["embedding_model"]
+    embedding_service = hint_system["embedding_service"]
+    hints_collection = hint_system["hints_collection"]
     if not embedding_model or not hints_collection:
-        return ["Hint system not initialized. Cannot provide hints."] # Return a list
-
-    # 1. Construct a query string for embedding
-    query_for_embedding = f"User query: {user_query}\nProblem: {challenge_prompt}"
-    if sql_error:
-        query_for_embedding += f"\nSQL Error: {sql_error}"
-    
-    # 2. Embed the query
+        if lexical_hits:
+            raise _UncachedHints(lexical_hits[:top_k], "lexical")
+        raise _UncachedHints(["Hint system not initialized. Cannot provide hints."],
+                             error="\n\n".join(hint_system["errors"]) or None)
+
+    # 2. Challenges with build-time candidates (build_hint_candidates.py): embed only the
+    # learner's query/error and re-rank that short list
+    model_key = embedding_model_key(embedding_model)
+    candidates = get_challenge_hint_candidates(challenge_id, model_key)
+    if candidates and isinstance(hints_collection, NumpyHintIndex):
+        try:
+            attempt_vector = get_or_compute_embedding(embedding_service, model_key,
+                                                      build_attempt_embedding_text(user_query, sql_error))
+            ranked_rows = rerank_hint_candidates(candidates, hints_collection, attempt_vector)
+        except Exception as e:
+            print(f"WARNING: Re-ranking precomputed hint candidates failed, searching all hints: {e}")
+            ranked_rows = []
+        if ranked_rows:
+            lexical_index = get_lexical_index()
+            lexical_hits = lexical_index.query(_lexical_query(user_query, challenge_prompt, sql_error),
+                                               FUSION_CANDIDATES, rows=ranked_rows) if lexical_index else []
+            vector_hits = [hints_collection.documents[row] for row in ranked_rows]
+            return reciprocal_rank_fusion([vector_hits, lexical_hits], top_k=top_k), "candidates"
+
+    # 3. Construct a query string for embedding (canonicalized, so reformatted queries share a vector)
+    query_for_embedding = build_hint_embedding_text(user_query, challenge_prompt, sql_error)
+
+    # 4. Embed the query; repeats are served from the on-disk embedding cache
     try:
-        query_vector = embedding_model.encode(query_for_embedding).tolist()
+        query_vector = get_or_compute_embedding(embedding_service, model_key, query_for_embedding)
     except Exception as e:
-        st.error(f"Error embedding user query: {e}")
-        return ["Could not process your query for hinting."]
+        if lexical_hits:
+            print(f"WARNING: Embedding failed, serving lexical hints only: {e}")
+            raise _UncachedHints(lexical_hits[:top_k], "lexical")
+        raise _UncachedHints(["Could not process your query for hinting."], error=f"Error embedding user query: {e}")
 
-    # 3. Query Vector DB
-    retrieved_hints_texts = []
+    # 5. Query Vector DB and fuse with the lexical ranking
+    route_kind = "filtered_embedding" if candidate_rows else "full_embedding"
     try:
-        results = hints_collection.query(
-            query_embeddings=[query_vector],
-            n_results=top_k,
-            include=['documents'] # We only need the document text
-        )
-        if results and results.get('documents') and results['documents'][0]:
-            retrieved_hints_texts.extend(results['documents'][0])
-        
-        if not retrieved_hints_texts:
-            return ["No specific pre-written hint found for this issue. Try rephrasing your query or focusing on the SQL error message if one was provided."]
-        
-        return retrieved_hints_texts
-
+        vector_hits = search_hint_documents(hints_collection, query_vector, FUSION_CANDIDATES,
+                                            rows=candidate_rows, topics=topics)
     except Exception as e:
-        st.error(f"Error querying vector database: {e}")
-        return ["Error retrieving hints from the knowledge base."]
+        raise _UncachedHints(["Error retrieving hints from the knowledge base."], route_kind,
+                             error=f"Error querying vector database: {e}")
+    retrieved_hints_texts = reciprocal_rank_fusion([vector_hits, lexical_hits], top_k=top_k)
+    if not retrieved_hints_texts:
+        return ["No specific pre-written hint found for this issue. Try rephrasing your query or focusing on the SQL error message if one was provided."], route_kind
+    return retrieved_hints_texts, route_kind
 
 # The `index_knowledge_base_into_chroma` and `populate_chroma_kb.py` script remain essential.
-# The `format_schema_for_llm` is no longer needed in this helper if no LLM is called.
\ No newline at end of file
+# The `format_schema_for_llm` is no longer needed in this helper if no LLM is called.
@@ -0,0 +1,116 @@
+# querypath_app/core/result_cache.py
+# Process-wide cache of grading outcomes, keyed on (challenge id, catalog version,
+# database version, canonical SQL).
+# Learners often re-run the same query, or one that differs only in whitespace, keyword
+# case, comments or a trailing semicolon. The challenge database is static, so the verdict
+# and preview from the first run can be reused instead of running the SQL again. The two
+# versions are content hashes, so an edited challenge or a rebuilt database never gets a
+# verdict graded against the old one, here or in the shared store across restarts.
+# Misses fall through to the state backend's result store (core/state_backend.py), which
+# every worker process shares, so a query graded by one worker is a hit for all of them.
+import re
+import threading
+from collections import OrderedDict
+
+from core.db_connector import get_database_version
+from core.state_backend import get_state_backend
+
+RESULT_CACHE_MAX_ENTRIES = 2048 # Outcomes hold at most a RESULT_PREVIEW_ROWS preview each
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+      (?P<string>'(?:[^']|'')*')              # String literal, '' escapes a quote
+    | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\])  # Quoted identifier (kept verbatim)
+    | (?P<comment>--[^\n]*|/\*.*?(?:\*/|$))   # Line and block comments
+    | (?P<space>\s+)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)       # Keyword or bare identifier
+    | (?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<operator><>|!=|<=|>=|==|\|\|)
+    | (?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+_result_cache_stats = {"hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "shared_errors": 0}
+
+def tokenize_sql(sql: str):
+    """(kind, text) for every token of sql except whitespace and comments; kind is a _TOKEN_PATTERN group name."""
+    return [(match.lastgroup, match.group()) for match in _TOKEN_PATTERN.finditer(sql or "")
+            if match.lastgroup not in ("space", "comment")]
+
+def canonicalize_sql(sql: str):
+    """
+    Token-level canonical form: comments and redundant whitespace dropped, keywords and
+    bare identifiers lowercased (SQLite treats them case-insensitively), trailing
+    semicolons removed. String literals and quoted identifiers are kept exactly, since
+    'Germany' and 'germany' are different values.
+    """
+    tokens = [text.lower() if kind == "word" else text for kind, text in tokenize_sql(sql)]
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return " ".join(tokens)
+
+def make_result_cache_key(challenge_id: str, sql: str, catalog_version: str):
+    # catalog_version: ChallengeCatalog.version of the catalog challenge_id was read from
+    return (challenge_id, catalog_version, get_database_version(), canonicalize_sql(sql))
+
+def _remember(key, outcome):
+    # Caller holds _result_cache_lock
+    _result_cache[key] = outcome
+    _result_cache.move_to_end(key)
+    while len(_result_cache) > RESULT_CACHE_MAX_ENTRIES:
+        _result_cache.popitem(last=False) # Evict least recently used
+        _result_cache_stats["evictions"] += 1
+
+def _shared_result_store():
+    state_backend = get_state_backend()
+    return state_backend.results if state_backend is not None else None
+
+def get_cached_result(key):
+    with _result_cache_lock:
+        outcome = _result_cache.get(key)
+        if outcome is not None:
+            _result_cache.move_to_end(key)
+            _result_cache_stats["hits"] += 1
+            return outcome
+    shared_store = _shared_result_store()
+    if shared_store is not None:
+        try:
+            outcome = shared_store.get(key)
+        except shared_store.STORAGE_ERRORS as e:
+            print(f"WARNING: Shared result store lookup failed: {e}")
+            outcome = None
+            with _result_cache_lock:
+                _result_cache_stats["shared_errors"] += 1
+    with _result_cache_lock:
+        if outcome is None:
+            _result_cache_stats["misses"] += 1
+            return None
+        # Kept locally too, so this process's sessions share one copy of it
+        _result_cache_stats["shared_hits"] += 1
+        _remember(key, outcome)
+        return outcome
+
+def store_result(key, outcome: dict):
+    # Shared by every session: callers must treat the stored outcome as read-only
+    with _result_cache_lock:
+        _remember(key, outcome)
+    shared_store = _shared_result_store()
+    if shared_store is not None:
+        try:
+            shared_store.put(key, outcome)
+        except shared_store.STORAGE_ERRORS as e:
+            print(f"WARNING: Shared result store write failed: {e}")
+            with _result_cache_lock:
+                _result_cache_stats["shared_errors"] += 1
+
+def get_result_cache_stats():
+    with _result_cache_lock:
+        stats = dict(_result_cache_stats)
+        stats["size"] = len(_result_cache)
+    stats["max_entries"] = RESULT_CACHE_MAX_ENTRIES
+    lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+    return stats
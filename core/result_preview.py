@@ -0,0 +1,48 @@
+# querypath_app/core/result_preview.py
+# Compact, shared form of a learner's result preview. Session state used to keep
+# output_df.to_dict('records') per challenge (one dict per row, keys repeated in every
+# row) and rebuild a DataFrame from it on every rerun. A ResultPreview holds one read-only
+# NumPy array per column instead. It is built once per grading outcome, and sessions that
+# get the same outcome from the result cache all point at the same object.
+import sys
+
+import pandas as pd
+
+from core.result_streamer import RESULT_PREVIEW_ROWS
+
+class ResultPreview:
+    __slots__ = ("columns", "arrays")
+
+    def __init__(self, columns, arrays):
+        self.columns = tuple(columns)
+        self.arrays = tuple(arrays)
+        for array in self.arrays:
+            array.flags.writeable = False # Shared between sessions
+
+    def __reduce__(self):
+        # Through __init__, so a preview read back from a shared store is read-only too
+        return (ResultPreview, (self.columns, self.arrays))
+
+    def __len__(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def to_frame(self):
+        # Positional keys, then the real names: SQL results may repeat a column name
+        frame = pd.DataFrame({position: array for position, array in enumerate(self.arrays)})
+        frame.columns = list(self.columns)
+        return frame
+
+    def nbytes(self):
+        # Array buffers plus the Python objects (e.g. strings) object columns point to
+        total = sum(array.nbytes for array in self.arrays)
+        for array in self.arrays:
+            if array.dtype == object:
+                total += sum(sys.getsizeof(value) for value in array)
+        return total
+
+def compact_preview(df, max_rows=RESULT_PREVIEW_ROWS):
+    """ResultPreview of the first max_rows rows of df (None stays None)."""
+    if df is None:
+        return None
+    head = df.iloc[:max_rows]
+    return ResultPreview(head.columns, [head.iloc[:, position].to_numpy(copy=True) for position in range(head.shape[1])])
@@ -0,0 +1,103 @@
+# querypath_app/core/result_streamer.py
+# Grades a learner's query while pulling rows from the sqlite3 cursor, instead of
+# materializing the whole result with pd.read_sql_query first. A correct answer can never
+# have more rows than expected_output, so an accidental cross join stops after
+# (expected rows + 1) rows rather than loading the full Cartesian product.
+from collections import Counter
+
+import pandas as pd
+
+from core.query_validator import normalize_df, row_keys, validate_output
+from core.query_sandbox import MAX_RESULT_ROWS, QueryBudgetExceeded
+
+STREAM_BATCH_SIZE = 256 # Rows per cursor.fetchmany call
+RESULT_PREVIEW_ROWS = 200 # Rows kept for display in display_feedback
+
+def _normalized_columns(columns):
+    # Same column canonicalization normalize_df applies (strip, lower, sorted)
+    return sorted(str(col).strip().lower() for col in columns)
+
+def stream_grade_query(conn, user_query: str, compiled_expected: dict, order_sensitive: bool = False,
+                       batch_size: int = STREAM_BATCH_SIZE, preview_rows: int = RESULT_PREVIEW_ROWS,
+                       max_rows: int = MAX_RESULT_ROWS, validator=validate_output):
+    """
+    Runs user_query on conn and grades it against compiled_expected
+    (from compile_expected_output) as batches arrive.
+
+    Returns a dict with:
+      - "is_correct": the verdict
+      - "preview_df": DataFrame of at most preview_rows rows, for display
+      - "row_count": rows fetched before grading finished
+      - "row_count_is_exact": False when fetching stopped early (the result has at least row_count rows)
+    SQL errors propagate as sqlite3 exceptions, like pd.read_sql_query's did; more than
+    max_rows rows raises QueryBudgetExceeded. validator (same signature as validate_output)
+    makes the final exact comparison.
+    """
+    expected_df = compiled_expected["frame"]
+    expected_keys = compiled_expected["row_keys"]
+    expected_row_count = len(expected_df)
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(user_query)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        columns_match = _normalized_columns(columns) == list(expected_df.columns)
+
+        preview = []
+        kept_rows = [] # Only ever up to expected_row_count rows, for the exact final check
+        remaining_keys = Counter(expected_keys) if not order_sensitive else None
+        row_count = 0
+        is_correct = None # Undecided until a mismatch or the end of the result
+
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            if len(preview) < preview_rows:
+                preview.extend(batch[:preview_rows - len(preview)])
+            row_count += len(batch)
+            if row_count > max_rows:
+                raise QueryBudgetExceeded("rows", f"more than {max_rows:,} rows")
+
+            if not columns_match:
+                # Already wrong; keep reading only until the preview is full
+                if len(preview) >= preview_rows:
+                    is_correct = False
+                    break
+                continue
+            if row_count > expected_row_count:
+                is_correct = False
+                break
+
+            batch_keys = row_keys(normalize_df(pd.DataFrame(batch, columns=columns), sort_rows=False))
+            if order_sensitive:
+                offset = row_count - len(batch)
+                if batch_keys != expected_keys[offset:row_count]:
+                    is_correct = False
+                    break
+            else:
+                remaining_keys.subtract(batch_keys)
+                if any(count < 0 for count in remaining_keys.values()):
+                    is_correct = False # A row that isn't (or isn't that often) in the expected output
+                    break
+            kept_rows.extend(batch)
+
+        row_count_is_exact = is_correct is None
+        if is_correct is None:
+            if not columns_match:
+                is_correct = False
+            else:
+                # Whole result is in hand and no larger than expected: exact comparison
+                is_correct, _, _ = validator(
+                    pd.DataFrame(kept_rows, columns=columns), None,
+                    order_sensitive=order_sensitive, compiled_expected=compiled_expected
+                )
+    finally:
+        cursor.close() # Finalizes the statement, so an abandoned query stops running
+
+    return {
+        "is_correct": is_correct,
+        "preview_df": pd.DataFrame(preview, columns=columns),
+        "row_count": row_count,
+        "row_count_is_exact": row_count_is_exact,
+    }
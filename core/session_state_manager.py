@@ -1,12 +1,43 @@
+import sys
+import uuid
+
 import streamlit as st
 
+from core.state_backend import get_state_backend
+
 DEFAULT_DAY = 1
 DEFAULT_CHALLENGE_INDEX = 0
+LEARNER_QUERY_PARAM = "learner" # Carries the learner id in the URL, so a reconnect finds its progress
 
 def get_challenge_id(day, challenge_index):
     return f"day{day}_chal{challenge_index}"
 
+def get_learner_id():
+    learner_id = st.query_params.get(LEARNER_QUERY_PARAM)
+    if not learner_id:
+        learner_id = uuid.uuid4().hex
+        st.query_params[LEARNER_QUERY_PARAM] = learner_id
+    return learner_id
+
+def _get_progress_store():
+    # None when no state backend could be opened: progress then lives in this session only
+    state_backend = get_state_backend()
+    return state_backend.progress if state_backend is not None else None
+
+def _rehydrate_progress():
+    # Once per session: points, solved challenges and saved queries from the progress store
+    st.session_state.learner_id = get_learner_id()
+    progress_store = _get_progress_store()
+    if progress_store is None:
+        return
+    progress = progress_store.load(st.session_state.learner_id)
+    st.session_state.points = progress["points"]
+    st.session_state.solved_challenges_in_session = progress["solved_challenges"]
+    st.session_state.user_queries = progress["user_queries"]
+
 def initialize_session_state():
+    if "learner_id" not in st.session_state:
+        _rehydrate_progress()
     if "current_day" not in st.session_state:
         st.session_state.current_day = DEFAULT_DAY
     if "current_challenge_index" not in st.session_state:
@@ -17,13 +48,13 @@ def initialize_session_state():
         st.session_state.user_queries = {}
     if "last_run_outputs" not in st.session_state:
         st.session_state.last_run_outputs = {}
-    if "challenges_data_cache" not in st.session_state:
-        st.session_state.challenges_data_cache = {}
-    if "max_challenges_per_day" not in st.session_state:
-        st.session_state.max_challenges_per_day = {}
     # NEW: Track challenges solved in the current session to prevent re-rewarding
     if "solved_challenges_in_session" not in st.session_state:
         st.session_state.solved_challenges_in_session = set()
+    # Submissions being graded in the background: {challenge_id: future}. One per challenge,
+    # so moving on and submitting another challenge doesn't drop the first one's result
+    if "pending_gradings" not in st.session_state:
+        st.session_state.pending_gradings = {}
 
 
 def get_current_challenge_identifier():
@@ -36,18 +67,56 @@ def get_current_user_query(starter_code=""):
 def set_current_user_query(query_text):
     challenge_id = get_current_challenge_identifier()
     st.session_state.user_queries[challenge_id] = query_text
+    progress_store = _get_progress_store()
+    if progress_store is not None:
+        progress_store.record_query(st.session_state.learner_id, challenge_id, query_text)
 
 def get_last_run_output():
     challenge_id = get_current_challenge_identifier()
     return st.session_state.last_run_outputs.get(challenge_id)
 
-def set_last_run_output(output_df=None, is_correct=None, error_message=None):
-    challenge_id = get_current_challenge_identifier()
-    st.session_state.last_run_outputs[challenge_id] = {
-        "output_df": output_df.to_dict('records') if output_df is not None else None,
-        "is_correct": is_correct,
-        "error_message": error_message
-    }
+class LastRunOutput:
+    # One per challenge a learner has run; slots keep the per-session footprint small
+    __slots__ = ("preview", "is_correct", "error_message", "row_count", "row_count_is_exact", "budget_message")
+
+    def __init__(self, preview, is_correct, error_message, row_count, row_count_is_exact, budget_message):
+        self.preview = preview
+        self.is_correct = is_correct
+        self.error_message = error_message
+        self.row_count = row_count
+        self.row_count_is_exact = row_count_is_exact
+        self.budget_message = budget_message
+
+def set_last_run_output(preview=None, is_correct=None, error_message=None, row_count=None, row_count_is_exact=True,
+                        budget_message=None, challenge_id=None):
+    # preview: a ResultPreview (core/result_preview.py), usually the same object the result
+    # cache holds, so it is referenced rather than copied. row_count is how many rows the
+    # query produced (or had produced when grading stopped early, if row_count_is_exact is
+    # False). budget_message is set when the query was stopped by the execution budget.
+    challenge_id = challenge_id or get_current_challenge_identifier()
+    st.session_state.last_run_outputs[challenge_id] = LastRunOutput(
+        preview, is_correct, error_message, row_count, row_count_is_exact, budget_message
+    )
+
+def get_session_result_memory(last_run_outputs=None):
+    """
+    Bytes this session's stored run results take: its own records, and the previews they
+    point to (shared with other sessions when they came from the result cache).
+    """
+    if last_run_outputs is None:
+        last_run_outputs = st.session_state.last_run_outputs
+    record_bytes = sys.getsizeof(last_run_outputs)
+    preview_bytes = 0
+    seen_previews = set()
+    for challenge_id, last_run in last_run_outputs.items():
+        record_bytes += sys.getsizeof(challenge_id) + sys.getsizeof(last_run)
+        for text in (last_run.error_message, last_run.budget_message):
+            if text:
+                record_bytes += sys.getsizeof(text)
+        if last_run.preview is not None and id(last_run.preview) not in seen_previews:
+            seen_previews.add(id(last_run.preview))
+            preview_bytes += last_run.preview.nbytes()
+    return {"results": len(last_run_outputs), "record_bytes": record_bytes, "preview_bytes": preview_bytes}
 
 def clear_last_run_output_for_current_challenge(): # Not currently used, but could be
     challenge_id = get_current_challenge_identifier()
@@ -56,15 +125,34 @@ def clear_last_run_output_for_current_challenge(): # Not currently used, but cou
 
 def update_points(earned_points): # This function seems fine
     st.session_state.points += earned_points
+    progress_store = _get_progress_store()
+    if progress_store is not None:
+        progress_store.record_points(st.session_state.learner_id, st.session_state.points)
 
-def mark_challenge_as_solved_in_session():
-    challenge_id = get_current_challenge_identifier()
+def mark_challenge_as_solved_in_session(challenge_id=None):
+    challenge_id = challenge_id or get_current_challenge_identifier()
     st.session_state.solved_challenges_in_session.add(challenge_id)
+    progress_store = _get_progress_store()
+    if progress_store is not None:
+        progress_store.record_solved(st.session_state.learner_id, challenge_id)
 
-def is_challenge_already_solved_in_session():
-    challenge_id = get_current_challenge_identifier()
+def is_challenge_already_solved_in_session(challenge_id=None):
+    challenge_id = challenge_id or get_current_challenge_identifier()
     return challenge_id in st.session_state.solved_challenges_in_session
 
+def set_pending_grading(future, challenge_id=None):
+    # A resubmission of the same challenge replaces its earlier job: the latest query wins
+    st.session_state.pending_gradings[challenge_id or get_current_challenge_identifier()] = future
+
+def get_pending_gradings():
+    return st.session_state.get("pending_gradings", {})
+
+def has_pending_grading():
+    return bool(get_pending_gradings())
+
+def clear_pending_grading(challenge_id):
+    st.session_state.pending_gradings.pop(challenge_id, None)
+
 def navigate_to_challenge(day, challenge_index):
     st.session_state.current_day = day
     st.session_state.current_challenge_index = challenge_index
@@ -0,0 +1,231 @@
+# querypath_app/core/state_backend.py
+# Where learner progress and graded results live, so that app workers hold no state of
+# their own and any worker behind a load balancer can serve any learner.
+# A StateBackend pairs a ProgressStore (points, solved challenges, saved queries; see
+# core/progress_store.py) with a result store shared by every worker (graded outcomes,
+# keyed like core/result_cache.py, which stays in front of it as a per-process cache).
+# Outcomes are stored as JSON, never pickled: a result store may be a networked server.
+#   "sqlite": local files; every worker process on one node shares them.
+#   "redis":  a Redis server (or anything speaking its protocol); workers on any node.
+# Per-process caches of read-only artifacts (challenge catalog, hint index, connection
+# pool to the read-only challenge database) stay per process: every worker builds the
+# same thing from the same files.
+import atexit
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from core.progress_store import (
+    PROGRESS_BUSY_TIMEOUT_SECONDS, PROGRESS_FLUSH_INTERVAL_SECONDS, PROGRESS_STORE_PATH,
+    ProgressStore, SqliteProgressStore,
+)
+from core.result_preview import ResultPreview
+
+# --- Configuration ---
+STATE_BACKEND = "sqlite" # "sqlite" or "redis"
+RESULT_STORE_PATH = "./shared_result_cache.db"
+RESULT_STORE_MAX_ENTRIES = 20_000
+RESULT_STORE_EVICT_BATCH = 500 # Rows dropped per eviction pass, so it does not run on every insert
+RESULT_STORE_SIZE_CHECK_EVERY = 100 # Puts between size checks; the store may overshoot by this per worker
+RESULT_STORE_TOUCH_SECONDS = 60.0 # A read refreshes last_used at most this often, so most reads stay reads
+REDIS_URL = "redis://localhost:6379/0"
+REDIS_KEY_PREFIX = "querypath:"
+REDIS_RESULT_TTL_SECONDS = 7 * 24 * 3600 # Results expire unless read again; the server's maxmemory policy bounds the rest
+
+_state_backend = None
+_state_backend_failed = False
+_state_backend_lock = threading.Lock()
+
+# Raised by serialize_outcome for a value JSON can't hold (e.g. a BLOB column), and by
+# deserialize_outcome for a malformed record
+SERIALIZATION_ERRORS = (ValueError, TypeError, KeyError)
+
+def shared_result_key(key):
+    # key: a result_cache key, (challenge_id, catalog version, database version, canonical SQL)
+    return hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+
+def serialize_outcome(outcome: dict):
+    record = dict(outcome)
+    preview = record.pop("preview", None)
+    if preview is not None:
+        record["preview"] = {
+            "columns": list(preview.columns),
+            "dtypes": [array.dtype.str for array in preview.arrays],
+            "values": [array.tolist() for array in preview.arrays],
+        }
+    return json.dumps(record).encode("utf-8") # NaN round-trips as a JSON extension
+
+def deserialize_outcome(blob: bytes):
+    record = json.loads(blob)
+    preview = record.get("preview")
+    if preview is not None:
+        record["preview"] = ResultPreview(preview["columns"], [
+            np.array(values, dtype=dtype) for values, dtype in zip(preview["values"], preview["dtypes"])
+        ])
+    return record
+
+class StateBackend:
+    """
+    progress: a ProgressStore. results: an object with get(key) -> outcome dict or None
+    and put(key, outcome), both safe from any thread, where key is a result_cache key.
+    """
+    def __init__(self, name, progress, results):
+        self.name = name
+        self.progress = progress
+        self.results = results
+
+    def flush(self):
+        self.progress.flush()
+
+class SqliteResultStore:
+    """Least recently used results are evicted in batches once the store passes max_entries."""
+    STORAGE_ERRORS = (sqlite3.Error,) + SERIALIZATION_ERRORS
+
+    def __init__(self, path=RESULT_STORE_PATH, max_entries=RESULT_STORE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts_since_size_check = 0
+        self._conn = sqlite3.connect(path, timeout=PROGRESS_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, outcome BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results(last_used)")
+        self._conn.commit()
+
+    def get(self, key):
+        store_key = shared_result_key(key)
+        with self._lock:
+            row = self._conn.execute("SELECT outcome, last_used FROM results WHERE key = ?", (store_key,)).fetchone()
+            if row and row[1] < time.time() - RESULT_STORE_TOUCH_SECONDS:
+                with self._conn:
+                    self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), store_key))
+        return deserialize_outcome(row[0]) if row else None
+
+    def put(self, key, outcome: dict):
+        blob = serialize_outcome(outcome)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO results (key, outcome, last_used) VALUES (?, ?, ?)",
+                               (shared_result_key(key), blob, time.time()))
+            self._puts_since_size_check += 1
+            if self._puts_since_size_check < RESULT_STORE_SIZE_CHECK_EVERY:
+                return
+            self._puts_since_size_check = 0
+            size = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if size > self.max_entries:
+                excess = size - self.max_entries + min(RESULT_STORE_EVICT_BATCH, self.max_entries // 10)
+                self._conn.execute("DELETE FROM results WHERE key IN"
+                                   " (SELECT key FROM results ORDER BY last_used LIMIT ?)", (excess,))
+
+def _redis_errors():
+    import redis
+    return (redis.RedisError,) + SERIALIZATION_ERRORS
+
+class RedisProgressStore(ProgressStore):
+    """
+    Per learner: a hash of points, a set of solved challenge ids and a hash of saved
+    queries. Each flush is one pipelined round trip.
+    """
+    def __init__(self, client, prefix=REDIS_KEY_PREFIX, flush_interval_seconds=PROGRESS_FLUSH_INTERVAL_SECONDS):
+        self.STORAGE_ERRORS = _redis_errors()
+        self.client = client
+        self.prefix = prefix
+        super().__init__(flush_interval_seconds)
+
+    def _key(self, kind, learner_id):
+        return f"{self.prefix}{kind}:{learner_id}"
+
+    def _read(self, learner_id):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hget(self._key("learner", learner_id), "points")
+        pipe.smembers(self._key("solved", learner_id))
+        pipe.hgetall(self._key("queries", learner_id))
+        points, solved, queries = pipe.execute()
+        return {
+            "points": int(points) if points is not None else 0,
+            "solved_challenges": {_text(challenge_id) for challenge_id in solved},
+            "user_queries": {_text(challenge_id): _text(query_text) for challenge_id, query_text in queries.items()},
+        }
+
+    def _write(self, points, solved, queries):
+        pipe = self.client.pipeline(transaction=False)
+        for learner_id, learner_points, updated_at in points:
+            pipe.hset(self._key("learner", learner_id), mapping={"points": learner_points, "updated_at": updated_at})
+        for learner_id, challenge_id, _ in solved:
+            pipe.sadd(self._key("solved", learner_id), challenge_id)
+        for learner_id, challenge_id, query_text, _ in queries:
+            pipe.hset(self._key("queries", learner_id), challenge_id, query_text)
+        pipe.execute()
+
+class RedisResultStore:
+    def __init__(self, client, prefix=REDIS_KEY_PREFIX, ttl_seconds=REDIS_RESULT_TTL_SECONDS):
+        self.STORAGE_ERRORS = _redis_errors()
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+
+    def _key(self, key):
+        return f"{self.prefix}result:{shared_result_key(key)}"
+
+    def get(self, key):
+        blob = self.client.getex(self._key(key), ex=self.ttl_seconds) # Reading a result keeps it alive
+        return deserialize_outcome(blob) if blob is not None else None
+
+    def put(self, key, outcome: dict):
+        self.client.set(self._key(key), serialize_outcome(outcome), ex=self.ttl_seconds)
+
+def _text(value):
+    # Clients created without decode_responses return bytes
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+def create_sqlite_backend(progress_path=PROGRESS_STORE_PATH, result_path=RESULT_STORE_PATH):
+    return StateBackend("sqlite", SqliteProgressStore(progress_path), SqliteResultStore(result_path))
+
+def create_redis_backend(client=None, url=REDIS_URL, prefix=REDIS_KEY_PREFIX):
+    """
+    client: any redis-py compatible client (e.g. fakeredis.FakeRedis() in tests); one is
+    created from url when omitted.
+    """
+    if client is None:
+        import redis # Optional dependency, only needed for this backend
+        client = redis.Redis.from_url(url)
+        client.ping() # Fail here, not on the first flush
+    return StateBackend("redis", RedisProgressStore(client, prefix), RedisResultStore(client, prefix))
+
+def get_state_backend():
+    """
+    The process-wide backend chosen by STATE_BACKEND, created on first use. Falls back to
+    "sqlite" if Redis is unavailable, and to None (state in st.session_state only, not
+    shared) if that fails too.
+    """
+    global _state_backend, _state_backend_failed
+    with _state_backend_lock:
+        if _state_backend is None and not _state_backend_failed:
+            if STATE_BACKEND == "redis":
+                try:
+                    _state_backend = create_redis_backend()
+                except Exception as e: # ImportError, connection errors, bad URL
+                    print(f"ERROR: Redis state backend at {REDIS_URL} unavailable, using local SQLite: {e}")
+            if _state_backend is None:
+                try:
+                    _state_backend = create_sqlite_backend()
+                except sqlite3.Error as e:
+                    print(f"WARNING: State backend unavailable, progress will not persist or be shared: {e}")
+                    _state_backend_failed = True
+            if _state_backend is not None:
+                atexit.register(_state_backend.flush)
+                print(f"INFO: Using the {_state_backend.name} state backend.")
+        return _state_backend
+
+def configure_state_backend(state_backend):
+    """Installs state_backend as the process-wide one (e.g. a load test's worker processes)."""
+    global _state_backend
+    with _state_backend_lock:
+        _state_backend = state_backend
@@ -0,0 +1,102 @@
+# evaluate_hint_retrieval.py
+# Offline evaluation of hint retrieval against a labeled set of failing queries. Each case
+# lists the hint types (metadata "type" in populate_chroma_kb.py) that would actually help;
+# a case is a hit when one of the top-k retrieved hints has one of those types.
+# Scores every retrieval mode that can run here:
+#   lexical  - BM25 over the hint texts
+#   vector   - embedding search only (needs the embedding model)
+#   hybrid   - vector and BM25 fused by reciprocal rank fusion (needs the model)
+#   pipeline - get_vector_db_hints as the app runs it: metadata routing, then hybrid/lexical
+# Run from the project root: python evaluate_hint_retrieval.py
+import json
+import time
+
+import numpy as np
+
+from core.embedding_cache import build_hint_embedding_text
+from core.hint_index import HINT_DOCUMENTS_PATH
+from core.lexical_index import get_lexical_index, reciprocal_rank_fusion
+from core.rag_helper import (
+    FUSION_CANDIDATES, get_hint_system, get_vector_db_hints, search_hint_documents
+)
+
+TOP_K = 2
+
+# (user_query, challenge_prompt, sql_error, helpful hint types)
+LABELED_FAILING_QUERIES = [
+    ("SELECT * FROM custmers", "List all customers.", "no such table: custmers",
+     {"troubleshooting"}),
+    ("SELECT nme FROM customers", "List the names of all customers.", "no such column: nme",
+     {"troubleshooting"}),
+    ("SELECT * FROM customers WHERE country = Germany", "Find customers from Germany.", "no such column: Germany",
+     {"syntax_strings", "troubleshooting"}),
+    ("SELECT * FROM customers WHERE", "Find customers from Germany.", "incomplete input",
+     {"syntax_error_where", "syntax_error_general"}),
+    ("SELECT * FROM customers WHERE ...;", "Find customers from Germany.", 'near ".": syntax error',
+     {"common_mistake_placeholders", "syntax_error_punctuation"}),
+    ("SELECT * FROM customers WHERE your_condition_here", "Find premium customers.", None,
+     {"common_mistake_placeholders"}),
+    ("SELECT name FORM customers", "List the names of all customers.", 'near "FORM": syntax error',
+     {"syntax_error_general", "troubleshooting_general_syntax"}),
+    ("SELECT * FROM customers WHERE signup_date > 2023-01-01", "Find customers who signed up after 2023-01-01.", None,
+     {"syntax_dates"}),
+    ("SELECT * FROM customers WHERE is_premium = 'yes'", "Find all premium customers.", None,
+     {"syntax_boolean"}),
+    ("SELECT country, COUNT(*) FROM customers", "Count customers per country.", None,
+     {"concept_aggregation", "syntax_rule_aggregation"}),
+    ("SELECT country, city, COUNT(*) FROM customers GROUP BY country", "Count customers per country and city.", None,
+     {"syntax_rule_aggregation"}),
+    ("SELECT * FROM customers, orders", "Show each order with the customer who placed it.", None,
+     {"common_mistake_joins_on", "concept_joins"}),
+    ("SELECT name, id FROM customers JOIN orders ON customers.id = orders.customer_id",
+     "Show each order with the customer who placed it.", "ambiguous column name: id",
+     {"concept_joins", "common_mistake_joins_on"}),
+    ("SELECT * FROM customers WHERE country = 'Germany' country = 'France'",
+     "Find customers from Germany or France.", 'near "country": syntax error',
+     {"logic_and_or", "syntax_error_general", "troubleshooting_general_syntax"}),
+    ("SELECT * FROM orders WHERE amount > 100 AND amount < 50", "Find orders over 100 or under 50.", None,
+     {"logic_and_or"}),
+    ("SELECT * FROM orders WHERE order_date = 2023", "Find orders placed in 2023.", None,
+     {"syntax_dates"}),
+]
+
+def lexical_text(user_query, challenge_prompt, sql_error):
+    return f"{user_query}\n{challenge_prompt}\n{sql_error or ''}"
+
+def evaluate(name, retrieve, type_of):
+    hits, timings = 0, []
+    for user_query, challenge_prompt, sql_error, helpful_types in LABELED_FAILING_QUERIES:
+        started = time.perf_counter()
+        documents = retrieve(user_query, challenge_prompt, sql_error)[:TOP_K]
+        timings.append(time.perf_counter() - started)
+        if any(type_of.get(document) in helpful_types for document in documents):
+            hits += 1
+    timings_us = np.array(timings) * 1e6
+    print(f"{name:9} hit@{TOP_K}: {hits:2}/{len(LABELED_FAILING_QUERIES)} "
+          f"({hits / len(LABELED_FAILING_QUERIES):5.1%})   "
+          f"latency mean {timings_us.mean():9.1f} us   p95 {np.percentile(timings_us, 95):9.1f} us")
+
+if __name__ == "__main__":
+    with open(HINT_DOCUMENTS_PATH, encoding="utf-8") as f:
+        stored = json.load(f)
+    type_of = {document: metadata.get("type") for document, metadata in zip(stored["documents"], stored["metadatas"])}
+
+    print(f"--- Hint retrieval evaluation: {len(LABELED_FAILING_QUERIES)} labeled failing queries ---")
+    lexical_index = get_lexical_index()
+    evaluate("lexical", lambda q, p, e: lexical_index.query(lexical_text(q, p, e), TOP_K), type_of)
+
+    hint_system = get_hint_system()
+    embedding_model, hints_collection = hint_system["embedding_model"], hint_system["hints_collection"]
+    if embedding_model is None or hints_collection is None:
+        print("Embedding model not available: skipping the vector and hybrid modes.")
+    else:
+        def vector_hits(q, p, e, count):
+            query_vector = embedding_model.encode(build_hint_embedding_text(q, p, e)).tolist()
+            return search_hint_documents(hints_collection, query_vector, count)
+        evaluate("vector", lambda q, p, e: vector_hits(q, p, e, TOP_K), type_of)
+        evaluate("hybrid", lambda q, p, e: reciprocal_rank_fusion(
+            [vector_hits(q, p, e, FUSION_CANDIDATES),
+             lexical_index.query(lexical_text(q, p, e), FUSION_CANDIDATES)], top_k=TOP_K), type_of)
+
+    # __wrapped__ skips st.cache_data, so every case is timed end to end
+    evaluate("pipeline", lambda q, p, e: get_vector_db_hints(q, p, e, top_k=TOP_K), type_of)
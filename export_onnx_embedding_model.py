@@ -0,0 +1,69 @@
+# export_onnx_embedding_model.py
+# Exports the hint embedding model (all-MiniLM-L6-v2) to ONNX and quantizes its weights to
+# int8, for EMBEDDING_BACKEND = "onnx" in core/rag_helper.py. Needs torch and
+# sentence-transformers once, at build time; the app then serves hints with onnxruntime only.
+# Run from the project root: python export_onnx_embedding_model.py
+# Then check the export against the hint index: python parity_onnx_embeddings.py
+import json
+import os
+
+from core.onnx_embedder import ONNX_MODEL_DIR, ONNX_MODEL_FILE, ONNX_CONFIG_FILE
+from core.rag_helper import EMBEDDING_MODEL_NAME
+
+FLOAT_MODEL_FILE = "model_fp32.onnx" # Intermediate, kept so the quantization can be redone
+ONNX_OPSET = 14
+
+def export_float_model(sentence_model, output_path):
+    import torch
+
+    transformer = sentence_model[0].auto_model # The BERT encoder under the pooling layers
+    transformer.eval()
+    dummy = sentence_model.tokenizer(["SELECT name FROM customers"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (dummy["input_ids"], dummy["attention_mask"], dummy["token_type_ids"]),
+            output_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+        )
+
+def quantize_model(float_path, int8_path):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    # Dynamic quantization: int8 weights, activations quantized per batch at run time
+    quantize_dynamic(float_path, int8_path, weight_type=QuantType.QInt8)
+
+def export_onnx_embedding_model(model_dir=ONNX_MODEL_DIR):
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(model_dir, exist_ok=True)
+    sentence_model = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+    float_path = os.path.join(model_dir, FLOAT_MODEL_FILE)
+    int8_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+
+    print(f"Exporting {EMBEDDING_MODEL_NAME} to {float_path}...")
+    export_float_model(sentence_model, float_path)
+    print(f"Quantizing to int8: {int8_path}...")
+    quantize_model(float_path, int8_path)
+
+    sentence_model.tokenizer.save_pretrained(model_dir) # Writes tokenizer.json for the `tokenizers` package
+    normalize = any(type(module).__name__ == "Normalize" for module in sentence_model)
+    with open(os.path.join(model_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "source_model": EMBEDDING_MODEL_NAME,
+            "max_seq_length": sentence_model.max_seq_length,
+            "normalize": normalize,
+        }, f, indent=2)
+
+    for path in (float_path, int8_path):
+        print(f"  {os.path.basename(path)}: {os.path.getsize(path) / 1e6:.1f} MB")
+
+if __name__ == "__main__":
+    print("--- Exporting the hint embedding model to ONNX (int8) ---")
+    export_onnx_embedding_model()
+    print("--- Export finished ---")
@@ -0,0 +1,125 @@
+# parity_onnx_embeddings.py
+# Checks the int8 ONNX embedding backend against the full-precision model the hint index
+# was built with, and reports latency and memory for both.
+#  1. Each hint document embedded with ONNX vs its stored (torch) vector: cosine similarity.
+#  2. Hint requests built from every challenge (correct query, syntax error, missing table):
+#     top-k hints with ONNX query vectors vs torch query vectors must be identical.
+#  3. Per-request encode latency, and resident memory after loading each backend in a
+#     fresh interpreter (also confirms the ONNX backend never imports torch).
+# Steps 2 and 3 skip the torch side when sentence-transformers is not installed.
+# Run from the project root after export_onnx_embedding_model.py: python parity_onnx_embeddings.py
+# tests/test_onnx_embeddings.py runs checks 1 and 2 under pytest.
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from core.data_loader import CHALLENGES_DIR
+from core.embedding_cache import build_hint_embedding_text
+from core.hint_index import NumpyHintIndex
+from core.onnx_embedder import OnnxEmbeddingModel
+from core.rag_helper import EMBEDDING_MODEL_NAME
+
+TOP_K = 2
+MIN_DOCUMENT_COSINE = 0.98 # int8 weights move vectors a little, not their ranking
+LATENCY_REPEATS = 20
+
+LOAD_SNIPPETS = {
+    "torch": f"""
+from sentence_transformers import SentenceTransformer
+model = SentenceTransformer({EMBEDDING_MODEL_NAME!r})
+""",
+    "onnx": """
+from core.onnx_embedder import OnnxEmbeddingModel
+model = OnnxEmbeddingModel()
+""",
+}
+MEMORY_SNIPPET = """
+import os, sys
+{load}
+model.encode("SELECT name FROM customers WHERE country = 'Germany'")
+with open("/proc/self/statm") as f:
+    print(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6, "torch" in sys.modules)
+"""
+
+def hint_requests():
+    requests = []
+    for path in sorted(glob.glob(os.path.join(CHALLENGES_DIR, "day*.json"))):
+        with open(path, encoding="utf-8") as f:
+            challenges = json.load(f).get("challenges", [])
+        for challenge in challenges:
+            prompt, query = challenge.get("prompt", ""), challenge.get("expected_query", "")
+            requests.append(build_hint_embedding_text(query, prompt))
+            requests.append(build_hint_embedding_text(query.replace("FROM", "FORM", 1), prompt,
+                                                      'near "FORM": syntax error'))
+            requests.append(build_hint_embedding_text(query, prompt, "no such table: customer"))
+    return requests
+
+def document_cosines(onnx_model, index):
+    # Each hint document embedded with ONNX vs its stored (torch) vector
+    return np.sum(onnx_model.encode(index.documents) * np.asarray(index.embeddings), axis=1)
+
+def ranked_rows(model, index, requests, top_k=TOP_K):
+    return [[row for row, _ in index.top_k(vector, top_k)] for vector in model.encode(requests)]
+
+def median_encode_seconds(model, texts):
+    timings = []
+    for text in texts[:LATENCY_REPEATS]:
+        started = time.perf_counter()
+        model.encode(text)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+def resident_mb_after_load(backend):
+    snippet = MEMORY_SNIPPET.format(load=LOAD_SNIPPETS[backend])
+    completed = subprocess.run([sys.executable, "-c", snippet], capture_output=True, text=True, check=True)
+    mb, torch_loaded = completed.stdout.split()[-2:]
+    return float(mb), torch_loaded == "True"
+
+def load_torch_model():
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+if __name__ == "__main__":
+    print("--- ONNX int8 vs torch embedding parity ---")
+    index = NumpyHintIndex()
+    onnx_model = OnnxEmbeddingModel()
+    failures = []
+
+    cosines = document_cosines(onnx_model, index)
+    print(f"Hint documents: {index.count()}, cosine(onnx, stored) min {cosines.min():.4f} mean {cosines.mean():.4f}")
+    if cosines.min() < MIN_DOCUMENT_COSINE:
+        failures.append(f"document cosine {cosines.min():.4f} below {MIN_DOCUMENT_COSINE}")
+
+    requests = hint_requests()
+    onnx_ranked = ranked_rows(onnx_model, index, requests)
+    torch_model = load_torch_model()
+    if torch_model is None:
+        print("sentence-transformers not installed: skipping the torch side of the top-k comparison.")
+    else:
+        torch_ranked = ranked_rows(torch_model, index, requests)
+        matches = sum(1 for a, b in zip(onnx_ranked, torch_ranked) if a == b)
+        print(f"Hint requests: {len(requests)}, identical top-{TOP_K}: {matches}/{len(requests)}")
+        if matches != len(requests):
+            failures.append(f"{len(requests) - matches} hint requests ranked differently")
+
+    print(f"ONNX  encode per request: {median_encode_seconds(onnx_model, requests) * 1e3:7.2f} ms")
+    if torch_model is not None:
+        print(f"Torch encode per request: {median_encode_seconds(torch_model, requests) * 1e3:7.2f} ms")
+
+    for backend in ("onnx", "torch") if torch_model is not None else ("onnx",):
+        mb, torch_loaded = resident_mb_after_load(backend)
+        print(f"{backend:5} RSS after load + one encode: {mb:7.1f} MB (torch imported: {torch_loaded})")
+        if backend == "onnx" and torch_loaded:
+            failures.append("the ONNX backend imported torch")
+
+    if failures:
+        raise SystemExit("ERROR: " + "; ".join(failures))
+    print("SUCCESS: ONNX backend matches the hint index.")
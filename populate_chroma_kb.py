@@ -1,106 +1,97 @@
 # populate_chroma_kb.py
 import chromadb
-from sentence_transformers import SentenceTransformer
+import hashlib
+import json
 import os
-import uuid # To generate unique IDs for documents
+import time
+
+from core.hint_index import export_numpy_index_from_collection, NumpyHintIndex, HINT_EMBEDDINGS_PATH
 
 # --- Configuration ---
 CHROMA_DB_PATH = "./chroma_db_sql_hints" # Directory where ChromaDB will store its data
 COLLECTION_NAME = "sql_hints_knowledge_base"
 EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2' # A good, relatively small model
+ENCODE_BATCH_SIZE = 64 # Documents per encode() call and per upsert
 
 # --- Sample Knowledge Base Documents ---
 KNOWLEDGE_BASE_DOCUMENTS = [
     # Existing Good Hints
     {
-        "id": str(uuid.uuid4()),
         "text": "When using a WHERE clause to filter on string values, make sure the string is enclosed in single quotes. For example: WHERE country = 'Germany'.",
         "metadata": {"topic": "WHERE clause", "type": "syntax_strings"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "To filter records based on a date, you can use comparison operators like > (greater than) or < (less than) with date strings in 'YYYY-MM-DD' format. Example: WHERE signup_date > '2023-01-01'.",
         "metadata": {"topic": "Date filtering", "type": "syntax_dates"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "The JOIN clause is used to combine rows from two or more tables, based on a related column between them. Ensure your ON condition correctly specifies how the tables are related.",
         "metadata": {"topic": "JOIN clause", "type": "concept_joins"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "A common mistake with JOINs is forgetting the ON condition, which can lead to a Cartesian product (all possible combinations of rows), usually not what's intended. Always include an ON clause specifying the join criteria.",
         "metadata": {"topic": "JOIN clause", "type": "common_mistake_joins_on"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "When using aggregate functions like COUNT(), SUM(), AVG(), you often need a GROUP BY clause to group rows that have the same values in specified columns into summary rows.",
         "metadata": {"topic": "GROUP BY clause", "type": "concept_aggregation"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "If you select non-aggregated columns along with an aggregate function (like COUNT() or SUM()), those non-aggregated columns must typically appear in the GROUP BY clause.",
         "metadata": {"topic": "GROUP BY clause", "type": "syntax_rule_aggregation"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "The error 'no such column' often means you have misspelled a column name or are referring to a column that does not exist in the tables specified in your FROM clause (or accessible in the current scope of the query). Double-check your table schemas and spelling carefully.",
         "metadata": {"topic": "SQL errors", "type": "troubleshooting", "error_type": "no such column"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "The error 'no such table' indicates that the table name you used in your FROM or JOIN clause is either misspelled or does not exist in the database. Verify the table names against the provided schema.",
         "metadata": {"topic": "SQL errors", "type": "troubleshooting", "error_type": "no such table"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "To combine multiple conditions in a WHERE clause, use the AND operator (if all conditions must be true) or the OR operator (if at least one condition must be true).",
         "metadata": {"topic": "WHERE clause", "type": "logic_and_or"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "For filtering on boolean (TRUE/FALSE) values, you can use conditions like 'is_premium = TRUE', 'is_premium = FALSE'. Some databases also allow '= 1' for true and '= 0' for false.",
         "metadata": {"topic": "Boolean filtering", "type": "syntax_boolean"}
     },
 
     # ----- NEW HINTS ADDED TO ADDRESS INCOMPLETE WHERE / SYNTAX ERRORS -----
     {
-        "id": str(uuid.uuid4()),
         "text": "A 'syntax error' often means a part of your SQL query is incomplete or incorrectly structured. Review the area mentioned in the error message. For example, a WHERE clause needs a complete condition after it (e.g., `WHERE column_name = 'value`).",
         "metadata": {"topic": "SQL errors", "type": "syntax_error_general", "keyword": "syntax error", "symptom": "incomplete_clause"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "If your query includes placeholders like '...' or instructions like 'your_condition_here', these must be replaced with actual SQL logic or values before the query can run successfully. Placeholders are not valid SQL.",
         "metadata": {"topic": "SQL syntax", "type": "common_mistake_placeholders", "keyword": "placeholder"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "It looks like your WHERE clause might be incomplete or missing its condition. A WHERE clause must be followed by a valid condition to filter rows, such as `column_name = 'some_value'` or `column_name > 100`.",
         "metadata": {"topic": "WHERE clause", "type": "syntax_error_where", "symptom": "incomplete_where"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "A 'syntax error near \".\" or \";\"' can indicate that the statement immediately before that punctuation is not a complete or valid SQL construct. Check for missing keywords, values, or an incorrect structure in the preceding part of your query.",
         "metadata": {"topic": "SQL errors", "type": "syntax_error_punctuation", "symptom": "error_near_semicolon"}
     },
     {
-        "id": str(uuid.uuid4()),
         "text": "The SQL error message often points to the part of the query where the problem lies ('near \"...\"'). Carefully examine that section for typos, missing elements, or incorrect SQL grammar.",
         "metadata": {"topic": "SQL errors", "type": "troubleshooting_general_syntax", "keyword": "syntax error"}
     }
     # ------------------------------------------------------------------------
 ]
 
-def initialize_and_populate_vectordb():
-    print(f"Initializing embedding model: {EMBEDDING_MODEL_NAME}...")
-    try:
-        embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-        print("Embedding model loaded.")
-    except Exception as e:
-        print(f"ERROR: Could not load embedding model '{EMBEDDING_MODEL_NAME}': {e}")
-        return
+def document_id(doc):
+    # Content hash of text + metadata: an unchanged hint keeps its id (and its stored
+    # embedding) across runs, an edited hint gets a new one
+    payload = json.dumps({"text": doc["text"], "metadata": doc["metadata"]}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
+def initialize_and_populate_vectordb():
     print(f"Initializing ChromaDB client at path: {CHROMA_DB_PATH}...")
     if not os.path.exists(CHROMA_DB_PATH):
         print(f"ChromaDB path {CHROMA_DB_PATH} does not exist. It will be created.")
@@ -114,61 +105,91 @@ def initialize_and_populate_vectordb():
 
     print(f"Getting or creating collection: {COLLECTION_NAME}...")
     try:
-        # --- MODIFIED DELETION HANDLING from previous response ---
-        existing_collections_names = [c.name for c in client.list_collections()] # Get names
-        collection_exists = COLLECTION_NAME in existing_collections_names
-
-        if collection_exists:
-            try:
-                print(f"INFO: Collection '{COLLECTION_NAME}' exists. Attempting to delete for a fresh start.")
-                client.delete_collection(name=COLLECTION_NAME)
-                print(f"INFO: Existing collection '{COLLECTION_NAME}' deleted successfully.")
-            except Exception as delete_e:
-                print(f"WARNING: Could not delete existing collection '{COLLECTION_NAME}': {delete_e}. Attempting to get/create anyway.")
-        else:
-            print(f"INFO: Collection '{COLLECTION_NAME}' does not exist. Will be created.")
-        # --- END MODIFIED DELETION HANDLING ---
-
         collection = client.get_or_create_collection(
             name=COLLECTION_NAME,
             metadata={"hnsw:space": "cosine"} # Using cosine similarity
         )
-        print(f"Collection '{COLLECTION_NAME}' ready. Current count before adding: {collection.count()}")
+        stored = collection.get(include=["documents", "metadatas", "embeddings"])
+        print(f"Collection '{COLLECTION_NAME}' ready. Current count: {collection.count()}")
     except Exception as e:
         print(f"ERROR: Could not get or create ChromaDB collection '{COLLECTION_NAME}': {e}")
         return
 
-    if not KNOWLEDGE_BASE_DOCUMENTS:
-        print("No documents found in KNOWLEDGE_BASE_DOCUMENTS. Nothing to index.")
-        return
+    # Stored entries by the hash of what they contain, so embeddings written under older
+    # ids (e.g. the uuid4 ids earlier versions of this script used) are reused, not recomputed
+    stored_ids = set(stored["ids"])
+    stored_embedding_by_hash = {
+        document_id({"text": text, "metadata": metadata}): embedding
+        for text, metadata, embedding in zip(stored["documents"], stored["metadatas"], stored["embeddings"])
+    }
+
+    desired = {document_id(doc): doc for doc in KNOWLEDGE_BASE_DOCUMENTS}
+    unchanged_ids = [doc_id for doc_id in desired if doc_id in stored_ids]
+    reused_ids = [doc_id for doc_id in desired if doc_id not in stored_ids and doc_id in stored_embedding_by_hash]
+    new_ids = [doc_id for doc_id in desired if doc_id not in stored_ids and doc_id not in stored_embedding_by_hash]
+    removed_ids = [doc_id for doc_id in stored["ids"] if doc_id not in desired]
+    print(f"Documents: {len(unchanged_ids)} unchanged, {len(reused_ids)} re-keyed, "
+          f"{len(new_ids)} new or changed, {len(removed_ids)} to delete.")
 
-    print(f"\nEmbedding {len(KNOWLEDGE_BASE_DOCUMENTS)} documents...")
     try:
-        texts_to_embed = [doc['text'] for doc in KNOWLEDGE_BASE_DOCUMENTS]
-        embeddings = embedding_model.encode(texts_to_embed, show_progress_bar=True).tolist()
-        print("Documents embedded successfully.")
+        for batch in _batches(reused_ids, ENCODE_BATCH_SIZE):
+            collection.upsert(
+                ids=batch,
+                embeddings=[stored_embedding_by_hash[doc_id] for doc_id in batch],
+                documents=[desired[doc_id]["text"] for doc_id in batch],
+                metadatas=[desired[doc_id]["metadata"] for doc_id in batch]
+            )
     except Exception as e:
-        print(f"ERROR: Failed to embed documents: {e}")
+        print(f"ERROR: Failed to update existing documents in ChromaDB: {e}")
         return
 
-    doc_ids = [doc['id'] for doc in KNOWLEDGE_BASE_DOCUMENTS]
-    doc_metadatas = [doc['metadata'] for doc in KNOWLEDGE_BASE_DOCUMENTS]
-    doc_contents = [doc['text'] for doc in KNOWLEDGE_BASE_DOCUMENTS]
+    if new_ids:
+        print(f"Initializing embedding model: {EMBEDDING_MODEL_NAME}...")
+        try:
+            from sentence_transformers import SentenceTransformer # Only needed when something changed
+            embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+            print("Embedding model loaded.")
+        except Exception as e:
+            print(f"ERROR: Could not load embedding model '{EMBEDDING_MODEL_NAME}': {e}")
+            return
 
-    print(f"\nAdding {len(doc_ids)} documents to collection '{COLLECTION_NAME}'...")
-    try:
-        collection.add(
-            embeddings=embeddings,
-            documents=doc_contents,
-            metadatas=doc_metadatas,
-            ids=doc_ids
-        )
-        print("SUCCESS: Documents added to ChromaDB successfully!")
-        print(f"New collection count: {collection.count()}")
-    except Exception as e:
-        print(f"ERROR: Failed to add documents to ChromaDB: {e}")
+        print(f"\nEmbedding and upserting {len(new_ids)} documents...")
+        started = time.perf_counter()
+        try:
+            for batch in _batches(new_ids, ENCODE_BATCH_SIZE):
+                texts = [desired[doc_id]["text"] for doc_id in batch]
+                collection.upsert(
+                    ids=batch,
+                    embeddings=embedding_model.encode(texts, batch_size=ENCODE_BATCH_SIZE).tolist(),
+                    documents=texts,
+                    metadatas=[desired[doc_id]["metadata"] for doc_id in batch]
+                )
+            print(f"SUCCESS: {len(new_ids)} documents embedded in {time.perf_counter() - started:.2f}s.")
+        except Exception as e:
+            print(f"ERROR: Failed to embed or upsert documents: {e}")
+            return
+
+    # Deleted last, so a failed run never leaves the collection missing hints
+    if removed_ids:
+        try:
+            collection.delete(ids=removed_ids)
+            print(f"Deleted {len(removed_ids)} removed or outdated documents.")
+        except Exception as e:
+            print(f"ERROR: Failed to delete removed documents from ChromaDB: {e}")
+            return
+    print(f"Collection count: {collection.count()}")
+
+    # The app's default hint retriever searches this export instead of the Chroma index
+    if new_ids or reused_ids or removed_ids or not NumpyHintIndex.exists():
+        try:
+            exported = export_numpy_index_from_collection(collection)
+            print(f"SUCCESS: Exported {exported} embeddings for the NumPy hint index to {HINT_EMBEDDINGS_PATH}")
+        except Exception as e:
+            print(f"ERROR: Failed to export the NumPy hint index: {e}")
+    else:
+        print("Knowledge base is up to date; nothing to embed.")
 
 if __name__ == "__main__":
     print("--- Starting Knowledge Base Population Script ---")
     initialize_and_populate_vectordb()
-    print("\n--- Knowledge Base Population Script Finished ---")
\ No newline at end of file
+    print("\n--- Knowledge Base Population Script Finished ---")
@@ -0,0 +1,85 @@
+# tests/test_onnx_embeddings.py
+# The int8 ONNX embedding backend (core/onnx_embedder.py).
+#  - Pooling and normalization, on a tiny ONNX graph built here: runs wherever onnx,
+#    onnxruntime and tokenizers are installed, no exported model needed.
+#  - Parity with the hint index (parity_onnx_embeddings.py checks 1 and 2): skipped until
+#    export_onnx_embedding_model.py has written the model to ONNX_MODEL_DIR.
+# Run from the project root: python -m pytest tests
+import json
+import sys
+
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+tokenizers = pytest.importorskip("tokenizers")
+
+from core.onnx_embedder import ONNX_CONFIG_FILE, ONNX_MODEL_FILE, ONNX_TOKENIZER_FILE, OnnxEmbeddingModel
+
+VOCAB = ["[PAD]", "[UNK]", "select", "name", "from", "customers", "where", "country"]
+DIMENSIONS = 4
+
+@pytest.fixture
+def tiny_model_dir(tmp_path):
+    # "Transformer" = embedding lookup, so the expected sentence vector is a plain mean of rows
+    from onnx import TensorProto, helper, numpy_helper
+    from tokenizers import Tokenizer
+    from tokenizers.models import WordLevel
+    from tokenizers.pre_tokenizers import Whitespace
+
+    table = np.random.default_rng(0).normal(size=(len(VOCAB), DIMENSIONS)).astype(np.float32)
+    graph = helper.make_graph(
+        [helper.make_node("Gather", ["table", "input_ids"], ["last_hidden_state"])],
+        "tiny_embedder",
+        [helper.make_tensor_value_info("input_ids", TensorProto.INT64, ["batch", "sequence"]),
+         helper.make_tensor_value_info("attention_mask", TensorProto.INT64, ["batch", "sequence"])],
+        [helper.make_tensor_value_info("last_hidden_state", TensorProto.FLOAT, ["batch", "sequence", DIMENSIONS])],
+        initializer=[numpy_helper.from_array(table, "table")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 14)])
+    model.ir_version = 8 # Readable by older onnxruntime releases too
+    onnx.save(model, str(tmp_path / ONNX_MODEL_FILE))
+
+    tokenizer = Tokenizer(WordLevel({token: index for index, token in enumerate(VOCAB)}, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = Whitespace()
+    tokenizer.save(str(tmp_path / ONNX_TOKENIZER_FILE))
+    (tmp_path / ONNX_CONFIG_FILE).write_text(json.dumps({"max_seq_length": 16, "normalize": True}))
+    return tmp_path, table
+
+def test_encode_mean_pools_real_tokens_and_normalizes(tiny_model_dir):
+    model_dir, table = tiny_model_dir
+    model = OnnxEmbeddingModel(str(model_dir))
+
+    vector = model.encode("select name from customers")
+    expected = table[[2, 3, 4, 5]].mean(axis=0)
+    assert vector.shape == (DIMENSIONS,) and vector.dtype == np.float32
+    np.testing.assert_allclose(vector, expected / np.linalg.norm(expected), rtol=1e-5)
+
+def test_batch_padding_does_not_change_vectors(tiny_model_dir):
+    model = OnnxEmbeddingModel(str(tiny_model_dir[0]))
+    texts = ["customers", "select name from customers where country"]
+
+    batch = model.encode(texts)
+    assert batch.shape == (2, DIMENSIONS)
+    for row, text in zip(batch, texts):
+        np.testing.assert_allclose(row, model.encode(text), rtol=1e-5, atol=1e-6)
+
+def test_onnx_backend_does_not_import_torch(tiny_model_dir):
+    OnnxEmbeddingModel(str(tiny_model_dir[0])).encode("select name")
+    assert "torch" not in sys.modules
+
+@pytest.mark.skipif(not OnnxEmbeddingModel.exists(), reason="no exported model; run export_onnx_embedding_model.py")
+def test_exported_model_matches_hint_index():
+    from core.hint_index import NumpyHintIndex
+    from parity_onnx_embeddings import MIN_DOCUMENT_COSINE, document_cosines, hint_requests, ranked_rows
+
+    index = NumpyHintIndex()
+    onnx_model = OnnxEmbeddingModel()
+    assert document_cosines(onnx_model, index).min() >= MIN_DOCUMENT_COSINE
+
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    from core.rag_helper import EMBEDDING_MODEL_NAME
+    requests = hint_requests()
+    torch_model = sentence_transformers.SentenceTransformer(EMBEDDING_MODEL_NAME)
+    assert ranked_rows(onnx_model, index, requests) == ranked_rows(torch_model, index, requests)
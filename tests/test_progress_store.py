@@ -0,0 +1,41 @@
+# tests/test_progress_store.py
+# The write-behind flush thread (core/progress_store.py): an unexpected error in a write
+# must not stop it, and the writes it was carrying must not be lost.
+# Run from the project root: python -m pytest tests
+import time
+
+from core.progress_store import SqliteProgressStore
+
+class FlakyProgressStore(SqliteProgressStore):
+    """Raises a non-storage error on the first write, then behaves."""
+    def __init__(self, path):
+        self.failures_left = 1
+        super().__init__(path, flush_interval_seconds=0.01)
+
+    def _write(self, points, solved, queries):
+        if self.failures_left:
+            self.failures_left -= 1
+            raise RuntimeError("bug in _write")
+        super()._write(points, solved, queries)
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_flush_thread_survives_unexpected_error_and_keeps_the_batch(tmp_path):
+    path = str(tmp_path / "progress.db")
+    store = FlakyProgressStore(path)
+    store.record_points("learner", 7)
+    store.record_solved("learner", "day1_challenge1")
+
+    wait_for(lambda: store.metrics()["rows_flushed"] == 2)
+    metrics = store.metrics()
+    assert metrics["flush_thread_errors"] == 1
+    assert metrics["flush_thread_alive"]
+    assert metrics["pending"] == 0
+
+    progress = SqliteProgressStore(path).load("learner")
+    assert progress["points"] == 7
+    assert progress["solved_challenges"] == {"day1_challenge1"}
@@ -0,0 +1,96 @@
+# tests/test_query_precheck.py
+# The static pre-check (core/query_precheck.py) against the challenge database. Anything
+# it lets through runs as usual, so a missed error is fine; rejecting SQL that SQLite
+# would run is not. Every accepted query here is also run through SQLite.
+# Run from the project root (needs data/challenges.db): python -m pytest tests
+import sqlite3
+
+import pytest
+
+from core.db_connector import DB_URI
+from core.query_precheck import precheck_query
+
+CHALLENGE = {
+    "schema": [
+        {"table": "customers", "columns": ["customer_id", "name", "country", "signup_date"]},
+        {"table": "orders", "columns": ["order_id", "customer_id", "total_amount"]},
+    ],
+}
+
+ACCEPTED = [
+    # Aliases after qualified columns and aggregates, with and without AS
+    "SELECT c.name n FROM customers c",
+    "SELECT customers.name customer_name FROM customers",
+    "SELECT o.customer_id, o.total_amount total FROM orders o ORDER BY total DESC LIMIT 3",
+    "SELECT c.name AS customer_name, o.total_amount amt FROM customers c "
+    "INNER JOIN orders o ON c.customer_id = o.customer_id",
+    "SELECT count(*) total FROM customers",
+    "SELECT max(total_amount) AS max_amount FROM orders",
+    "SELECT country, count(*) AS cnt FROM customers GROUP BY country HAVING cnt > 1",
+    # ORDER BY an alias
+    "SELECT name n FROM customers ORDER BY n",
+    "SELECT total_amount * 2 AS doubled FROM orders ORDER BY doubled DESC",
+    # Joins
+    "SELECT c.name FROM customers c JOIN orders o ON c.customer_id = o.customer_id",
+    "SELECT name FROM customers JOIN orders USING (customer_id)",
+    "SELECT name FROM customers NATURAL JOIN orders",
+    "SELECT name FROM customers CROSS JOIN orders",
+    "SELECT name FROM customers, orders WHERE customers.customer_id = orders.customer_id",
+    "SELECT name FROM customers JOIN orders WHERE customers.customer_id = orders.customer_id",
+    "SELECT name FROM customers c LEFT JOIN orders o ON o.customer_id = c.customer_id WHERE o.order_id IS NULL",
+    # Subqueries and CTEs
+    "SELECT name FROM customers WHERE customer_id IN (SELECT customer_id FROM orders)",
+    "SELECT name, (SELECT count(*) FROM orders o WHERE o.customer_id = c.customer_id) FROM customers c",
+    "SELECT x FROM (SELECT name AS x FROM customers)",
+    "WITH g AS (SELECT * FROM customers) SELECT name FROM g",
+    # Odds and ends
+    "select name from Customers where Country = 'Germany'",
+    "SELECT name FROM main.customers",
+    "SELECT name FROM customers WHERE rowid = 1",
+    "SELECT name FROM customers WHERE country IS NOT DISTINCT FROM 'USA'",
+]
+
+REJECTED = [
+    ("SELECT nme FROM customers", "no such column: nme"),
+    ("SELECT c.nme FROM customers c", "no such column: c.nme"),
+    ("SELECT c.name n, nmx FROM customers c", "no such column: nmx"),
+    ("SELECT x.name FROM customers c", "no such column: x.name"),
+    ("SELECT name FROM customers WHERE total > 5", "no such column: total"),
+    ("SELECT * FROM custmers", "no such table: custmers"),
+    ("SELECT name FROM customers c JOIN ordrs o ON c.customer_id = o.customer_id", "no such table: ordrs"),
+    ("SELECT name FROM customers WHERE country =", "incomplete input"),
+    ("SELECT name FROM customers WHERE", "incomplete input"),
+]
+
+@pytest.fixture(scope="module")
+def conn():
+    connection = sqlite3.connect(DB_URI, uri=True)
+    yield connection
+    connection.close()
+
+@pytest.mark.parametrize("query", ACCEPTED)
+def test_valid_sql_is_not_rejected(conn, query):
+    conn.execute(query).fetchall() # Valid in SQLite itself
+    assert precheck_query(query, CHALLENGE) is None
+
+@pytest.mark.parametrize("query, message", REJECTED)
+def test_broken_sql_is_rejected(conn, query, message):
+    with pytest.raises(sqlite3.Error):
+        conn.execute(query).fetchall()
+    result = precheck_query(query, CHALLENGE)
+    assert result is not None and result.startswith(message)
+    assert "*Hint:" in result
+
+def test_join_without_condition_is_rejected_with_key_hint():
+    result = precheck_query("SELECT name FROM customers c JOIN orders o", CHALLENGE)
+    assert result.startswith("JOIN without ON")
+    assert "c.customer_id = o.customer_id" in result
+
+def test_suggests_closest_column():
+    assert "Did you mean `name`?" in precheck_query("SELECT nme FROM customers", CHALLENGE)
+
+def test_column_missing_from_database_but_in_schema_is_reported_as_stale_data():
+    stale = {"schema": [{"table": "customers", "columns": ["customer_id", "name", "region"]}]}
+    result = precheck_query("SELECT region FROM customers", stale)
+    assert result.startswith("no such column: region")
+    assert "out of date" in result
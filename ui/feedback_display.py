@@ -10,60 +10,126 @@ from core.session_state_manager import (
     mark_challenge_as_solved_in_session,
     is_challenge_already_solved_in_session,
     get_current_challenge_identifier,
+    set_pending_grading,
+    get_pending_gradings,
+    clear_pending_grading,
     # user_queries is accessed via st.session_state directly if needed
 )
-from core.query_validator import validate_output
+from core.query_validator import compile_expected_output
+from core.data_loader import get_compiled_expected_output, get_catalog_version
+from core.db_connector import get_connection_pool
+from core.grading_executor import grade_submission, submit_grading_job, is_cacheable_outcome
+from core.result_cache import make_result_cache_key, get_cached_result, store_result
+from core.query_precheck import precheck_query
 from core.rag_helper import get_vector_db_hints # For Vector DB only hints
 
+def _compiled_expected_for_current_challenge(current_challenge_data: dict):
+    # Expected side was normalized when the day file was loaded; only the user's side is new work
+    return get_compiled_expected_output(
+        st.session_state.current_day, st.session_state.current_challenge_index
+    ) or compile_expected_output(current_challenge_data.get("expected_output", []))
+
+def _apply_grading_outcome(outcome: dict, challenge_id: str):
+    # Store a bounded preview of the user's output for display, and correctness status
+    set_last_run_output(**outcome, challenge_id=challenge_id)
+    if outcome.get("is_correct"):
+        # Check if this challenge was already solved and rewarded in this session
+        if not is_challenge_already_solved_in_session(challenge_id):
+            update_points(10)  # Award points
+            mark_challenge_as_solved_in_session(challenge_id) # Mark as solved for this session
+            st.session_state.show_balloons_once = True # Flag to show balloons in display_feedback
+
+def _precheck_outcome(user_query: str, current_challenge_data: dict, challenge_id: str):
+    # A query that can't run as written (unknown table/column, missing value, JOIN without
+    # ON) is answered without touching the grader or the database. The pre-check is a
+    # heuristic, so its verdict is never cached: a false positive fails one run, not every
+    # learner's run of that query. When it has nothing to say, the query runs as usual.
+    try:
+        precheck_error = precheck_query(user_query, current_challenge_data, challenge_id)
+    except Exception as e:
+        print(f"WARNING: SQL pre-check failed, running the query as usual: {e}")
+        return None
+    if precheck_error is None:
+        return None
+    return {"is_correct": False, "error_message": precheck_error}
+
 # --- Definition of handle_query_execution ---
 # This function processes the query execution and updates the state.
 def handle_query_execution(user_query: str, conn, current_challenge_data: dict): # <<<< FUNCTION 1
     """
     Executes the user's SQL query, validates the output, updates points,
     and sets flags for feedback display (like balloons).
+    Synchronous: the caller waits for the result (see submit_query_for_grading).
     """
     current_challenge_id = get_current_challenge_identifier()
-    try:
-        user_df = pd.read_sql_query(user_query, conn) # conn is the sqlite3 connection object
-        
-        is_correct, normalized_user_df, normalized_expected_df = validate_output(
-            user_df, current_challenge_data.get("expected_output", [])
-        )
-        # Store the original user_df for display, and correctness status
-        set_last_run_output(output_df=user_df, is_correct=is_correct)
-
-        if is_correct:
-            # Check if this challenge was already solved and rewarded in this session
-            if not is_challenge_already_solved_in_session():
-                update_points(10)  # Award points
-                mark_challenge_as_solved_in_session() # Mark as solved for this session
-                st.session_state.show_balloons_once = True # Flag to show balloons in display_feedback
-    except Exception as e:
-        error_msg = str(e)
-        # Enhance error message for common "no such table" error
-        if "no such table" in error_msg.lower():
-            schema_info = current_challenge_data.get('schema', {})
-            table_name_msg = ""
-            if isinstance(schema_info, dict) and "table" in schema_info:
-                table_name_msg = f"The expected table for this challenge is `{schema_info['table']}`."
-            elif isinstance(schema_info, list): # For multiple tables in schema
-                tables = [item.get('table', '?') for item in schema_info if isinstance(item, dict)]
-                if tables:
-                    table_name_msg = f"Expected table(s) for this challenge might include: `{', '.join(tables)}`."
-            error_msg += f"\n\n*Hint: Double-check your table and column names against the provided schema. {table_name_msg}*"
-        
-        # Set last run output with error information
-        set_last_run_output(error_message=error_msg, is_correct=False)
+    cache_key = make_result_cache_key(current_challenge_id, user_query, get_catalog_version())
+    outcome = get_cached_result(cache_key)
+    if outcome is None:
+        outcome = _precheck_outcome(user_query, current_challenge_data, current_challenge_id)
+    if outcome is None:
+        outcome = grade_submission(user_query, conn, current_challenge_data,
+                                   _compiled_expected_for_current_challenge(current_challenge_data))
+        if is_cacheable_outcome(outcome):
+            store_result(cache_key, outcome)
+    _apply_grading_outcome(outcome, current_challenge_id)
+
+def submit_query_for_grading(user_query: str, current_challenge_data: dict):
+    """
+    Queues the user's SQL query on the grading executor and returns immediately.
+    The result is picked up by collect_grading_result on a later rerun.
+    A query already graded for this challenge (up to whitespace, keyword case, comments
+    and trailing semicolons) is answered from the result cache instead, and one the
+    pre-check rejects is answered with its error straight away.
+    Returns True if grading is now pending, False if the result was applied right away.
+    """
+    current_challenge_id = get_current_challenge_identifier()
+    cache_key = make_result_cache_key(current_challenge_id, user_query, get_catalog_version())
+    cached_outcome = get_cached_result(cache_key) or _precheck_outcome(
+        user_query, current_challenge_data, current_challenge_id
+    )
+    if cached_outcome is not None:
+        _apply_grading_outcome(cached_outcome, current_challenge_id)
+        return False
+
+    future = submit_grading_job(
+        user_query, current_challenge_data,
+        _compiled_expected_for_current_challenge(current_challenge_data),
+        get_connection_pool(), cache_key=cache_key
+    )
+    set_pending_grading(future)
+    return True
+
+def collect_grading_result():
+    """
+    Applies every finished background grading result to the session state, whichever
+    challenge it belongs to. Returns True while the current challenge still has a
+    submission being graded (has_pending_grading() says whether any challenge does).
+    """
+    for challenge_id, future in list(get_pending_gradings().items()):
+        if not future.done():
+            continue
+        clear_pending_grading(challenge_id)
+        try:
+            outcome = future.result()
+        except Exception as e: # grade_submission reports SQL errors itself; this is a grader failure
+            outcome = {"is_correct": False, "error_message": f"Grading failed unexpectedly: {e}"}
+        _apply_grading_outcome(outcome, challenge_id)
+    return get_current_challenge_identifier() in get_pending_gradings()
 
 
 # --- Definition of display_feedback ---
 # This function shows the results of the query execution to the user.
-def display_feedback(expected_output_data_for_comparison: list, current_challenge_data: dict): # <<<< FUNCTION 2
+def display_feedback(expected_output_data_for_comparison: list, current_challenge_data: dict,
+                     grading_pending: bool = False): # <<<< FUNCTION 2
     """
     Displays feedback to the user based on the last query execution result
     stored in session state. Shows user output, correctness, expected output,
     and hints if applicable.
     """
+    if grading_pending: # A submission for this challenge is still being graded
+        st.info("⏳ Checking your query... results will appear here in a moment.")
+        return
+
     last_run = get_last_run_output() # Fetches output for the CURRENT challenge
     challenge_was_already_solved = is_challenge_already_solved_in_session()
 
@@ -72,31 +138,41 @@ def display_feedback(expected_output_data_for_comparison: list, current_challeng
             st.info("📝 Enter your query and click 'Run Query' to see the results and get feedback.")
         return
 
-    sql_error_message = last_run.get("error_message")
+    sql_error_message = last_run.error_message
     current_challenge_id = get_current_challenge_identifier()
     # Get the query that was actually run for this feedback from session_state
     user_query_that_was_run = st.session_state.user_queries.get(current_challenge_id, "")
 
 
+    budget_message = last_run.budget_message
+
     # 1. Display SQL Error if any
     if sql_error_message:
         st.error(f"❌ **SQL Error:**\n```\n{sql_error_message}\n```")
+    elif budget_message:
+        st.warning(f"⏱️ **{budget_message}.** Check your JOIN conditions and filters, "
+                   "then try again with a query that does less work.")
 
     # 2. Display User's Output DataFrame
-    user_output_df_dict = last_run.get("output_df")
-    if user_output_df_dict is not None:
+    if last_run.preview is not None:
         st.subheader("📤 Your Output")
-        user_df_from_state = pd.DataFrame(user_output_df_dict)
+        user_df_from_state = last_run.preview.to_frame() # Column arrays, no per-row dicts to rebuild
         if user_df_from_state.empty and not sql_error_message:
              st.write("Your query ran successfully but returned no results.")
         elif not user_df_from_state.empty:
             st.dataframe(user_df_from_state, use_container_width=True)
-    elif not sql_error_message: # Query ran, no SQL error, but output_df is None
+            row_count = last_run.row_count
+            if row_count is not None and not last_run.row_count_is_exact:
+                st.caption(f"Showing the first {len(user_df_from_state)} rows. Checking stopped after {row_count} rows, "
+                           "once the result could no longer match the expected output.")
+            elif row_count is not None and row_count > len(user_df_from_state):
+                st.caption(f"Showing the first {len(user_df_from_state)} of {row_count} rows.")
+    elif not sql_error_message and not budget_message: # Query ran, no SQL error, but there is no preview
         st.subheader("📤 Your Output")
         st.write("Your query ran successfully but returned no results (or an unexpected empty output type).")
 
     # 3. Display Correctness Feedback
-    is_correct_status = last_run.get("is_correct")
+    is_correct_status = last_run.is_correct
 
     if is_correct_status is True:
         st.success("✅ Correct! Your output matches the expected result.")
@@ -106,7 +182,7 @@ def display_feedback(expected_output_data_for_comparison: list, current_challeng
     
     elif is_correct_status is False:
         # This implies the query ran (no fatal SQL error), but the output was incorrect.
-        if not sql_error_message: # Only show this warning if a SQL error wasn't the primary message
+        if not sql_error_message and not budget_message: # Only show this warning if a SQL error or budget stop wasn't the primary message
             st.warning("⚠️ Your output doesn't match the expected result.")
         
         if challenge_was_already_solved: # If they try an incorrect query on an already solved challenge
@@ -130,7 +206,8 @@ def display_feedback(expected_output_data_for_comparison: list, current_challeng
                     user_query=user_query_that_was_run,
                     challenge_prompt=challenge_prompt_for_embedding,
                     sql_error=sql_error_message,
-                    top_k=2 # Get top 2 hints, for example
+                    top_k=2, # Get top 2 hints, for example
+                    challenge_id=current_challenge_id # Selects the build-time hint candidates
                 )
                 
                 if retrieved_hints and any(h.strip() for h in retrieved_hints if "No specific pre-written hint found" not in h and "Error retrieving hints" not in h):
@@ -1,6 +1,7 @@
 # querypath_app/ui/sidebar.py
 import streamlit as st
 from core.data_loader import get_max_challenges_for_day # Import this
+from core.session_state_manager import get_session_result_memory
 
 def display_sidebar():
     st.sidebar.header("🗓️ Your Progress")
@@ -25,6 +26,15 @@ def display_sidebar():
         "Use the navigation buttons below your query to move between solved challenges."
     )
     st.sidebar.markdown("---")
+    # How much this session keeps for its stored run results (benchmark_session_memory.py
+    # measures the same figure across many sessions)
+    result_memory = get_session_result_memory()
+    with st.sidebar.expander("Session diagnostics", expanded=False):
+        st.caption(
+            f"Stored results: {result_memory['results']} | "
+            f"records: {result_memory['record_bytes'] / 1024:.1f} KiB | "
+            f"previews: {result_memory['preview_bytes'] / 1024:.1f} KiB"
+        )
     # Optional: Add a reset progress button or other global controls here
     # if st.sidebar.button("Reset All Progress (Debug)"):
     #     # This would require a function in session_state_manager to clear relevant states
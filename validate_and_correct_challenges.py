@@ -1,7 +1,23 @@
 # validate_and_correct_challenges.py
+# Re-runs every challenge's expected_query against the database and checks it still
+# produces expected_output (optionally writing the query result back).
+#   python validate_and_correct_challenges.py                     (asks before correcting)
+#   python validate_and_correct_challenges.py --validate-only --incremental --jobs 4
+#   python validate_and_correct_challenges.py --auto-correct --yes
+# --incremental skips challenges whose expected_query, expected_output and database file
+# are unchanged since they last validated (see VALIDATION_MANIFEST_PATH). --jobs validates
+# day files in parallel worker processes, each with its own read-only connection.
+import argparse
+import contextlib
+import functools
+import hashlib
+import inspect
+import io
 import json
 import os
 import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from jsonschema import validate, exceptions as jsonschema_exceptions
 import copy # To deepcopy data structures for comparison
@@ -10,6 +26,8 @@ import copy # To deepcopy data structures for comparison
 CHALLENGES_DIR = "challenges"
 DB_PATH = "data/challenges.db"
 BACKUP_DIR = "challenges_backup" # Optional: create a backup directory
+VALIDATION_MANIFEST_PATH = "data/validation_manifest.json"
+VALIDATION_MANIFEST_VERSION = 2 # Bump when what counts as "validated" changes (e.g. normalize_df rules)
 
 # --- Import or Define normalize_df ---
 # Ensure this is your robust normalization function from core/query_validator.py
@@ -21,7 +39,7 @@ try:
 except ImportError:
     print("WARNING: Could not import normalize_df from core.query_validator.")
     print("         Using a placeholder normalize_df. Ensure this is correct for accurate validation!")
-    def normalize_df(df):
+    def normalize_df(df, sort_rows=True):
         if df is None: return pd.DataFrame()
         if not isinstance(df, pd.DataFrame): return pd.DataFrame()
         if df.empty: return df
@@ -47,7 +65,7 @@ except ImportError:
         
         # Sort columns alphabetically, then sort rows by all columns
         df_copy = df_copy.reindex(sorted(df_copy.columns), axis=1)
-        if not df_copy.empty:
+        if sort_rows and not df_copy.empty:
             df_copy = df_copy.sort_values(by=df_copy.columns.tolist()).reset_index(drop=True)
         return df_copy
 
@@ -62,6 +80,7 @@ challenge_schema_def = {
         "starter_code": {"type": "string"},
         "expected_query": {"type": "string"},
         "expected_output": {"type": "array", "items": {"type": "object"}},
+        "order_sensitive": {"type": "boolean"}, # Row order of expected_output is part of the answer
         "reflection": {"type": "array", "items": {"type": "string"}},
         "hints": {"type": "array", "items": {"type": "string"}},
     },
@@ -76,10 +95,67 @@ day_file_schema = {
     "required": ["day", "challenges"]
 }
 
-def process_challenge_file(filepath, db_conn, auto_correct=False):
+def file_sha256(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+@functools.lru_cache(maxsize=None)
+def normalizer_sha256():
+    # The normalize_df in use: editing its rules revalidates everything, bump or no bump
+    try:
+        return file_sha256(inspect.getsourcefile(normalize_df))
+    except (TypeError, OSError):
+        return "unknown"
+
+def challenge_content_hash(challenge_data, db_sha256):
+    # Everything the verdict depends on: the query, the stored output, whether row order
+    # counts, the database and the normalization rules
+    content = json.dumps({
+        "expected_query": challenge_data.get("expected_query"),
+        "expected_output": challenge_data.get("expected_output"),
+        "order_sensitive": bool(challenge_data.get("order_sensitive", False)),
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(
+        f"{VALIDATION_MANIFEST_VERSION}\0{db_sha256}\0{normalizer_sha256()}\0{content}".encode("utf-8")
+    ).hexdigest()
+
+def challenge_key(filepath, index):
+    return f"{os.path.basename(filepath)}#{index}"
+
+def load_validation_manifest(path=VALIDATION_MANIFEST_PATH):
+    """{challenge_key: content hash} of challenges that validated (or were corrected) last time."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == VALIDATION_MANIFEST_VERSION:
+            return manifest.get("challenges", {})
+        print(f"INFO: Validation manifest {path} is from another version; validating everything.")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not read validation manifest {path}, validating everything: {e}")
+    return {}
+
+def save_validation_manifest(challenge_hashes, path=VALIDATION_MANIFEST_PATH):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": VALIDATION_MANIFEST_VERSION, "challenges": dict(sorted(challenge_hashes.items()))}, f, indent=2)
+    os.replace(temp_path, path)
+
+def process_challenge_file(filepath, db_conn, auto_correct=False, db_sha256=None, known_hashes=None):
+    """
+    Returns (errors, corrections, validated) where validated maps challenge_key to the
+    content hash of every challenge that is now known good. With db_sha256 and
+    known_hashes (a loaded manifest), challenges whose hash is unchanged are skipped.
+    """
     print(f"\n--- Processing {filepath} ---")
     file_errors = 0
     file_corrections = 0
+    validated = {}
+    skipped = 0
     original_data = None
     modified_data = None
 
@@ -89,7 +165,7 @@ def process_challenge_file(filepath, db_conn, auto_correct=False):
             modified_data = copy.deepcopy(original_data) # Work on a copy
     except Exception as e:
         print(f"  ERROR: Could not load or parse JSON: {e}")
-        return 1, 0 # 1 error, 0 corrections
+        return 1, 0, validated # 1 error, 0 corrections
 
     # 1. Validate overall file schema
     try:
@@ -99,11 +175,16 @@ def process_challenge_file(filepath, db_conn, auto_correct=False):
         print(f"  ERROR: File schema validation failed: {e.message} (Path: {list(e.path)})")
         file_errors += 1
         # If basic schema is wrong, probably not safe to auto-correct outputs
-        return file_errors, file_corrections
+        return file_errors, file_corrections, validated
 
     # 2. Process individual challenges
     for i, challenge_data in enumerate(modified_data.get("challenges", [])):
         challenge_title = challenge_data.get('title', f'Challenge {i+1}')
+        content_hash = challenge_content_hash(challenge_data, db_sha256) if db_sha256 else None
+        if known_hashes and content_hash and known_hashes.get(challenge_key(filepath, i)) == content_hash:
+            validated[challenge_key(filepath, i)] = content_hash
+            skipped += 1
+            continue
         print(f"  - Processing: '{challenge_title}'")
 
         expected_query_str = challenge_data.get("expected_query")
@@ -130,8 +211,10 @@ def process_challenge_file(filepath, db_conn, auto_correct=False):
 
             correct_expected_df_generated = pd.DataFrame(correct_expected_output_records)
 
-            norm_current_json_df = normalize_df(current_expected_df_from_json)
-            norm_correct_generated_df = normalize_df(correct_expected_df_generated)
+            # Grading compares order-sensitive results row by row, so their stored order must match too
+            sort_rows = not challenge_data.get("order_sensitive", False)
+            norm_current_json_df = normalize_df(current_expected_df_from_json, sort_rows=sort_rows)
+            norm_correct_generated_df = normalize_df(correct_expected_df_generated, sort_rows=sort_rows)
 
             if not norm_current_json_df.equals(norm_correct_generated_df):
                 print(f"    MISMATCH: 'expected_output' for '{challenge_title}' differs from query result.")
@@ -143,8 +226,12 @@ def process_challenge_file(filepath, db_conn, auto_correct=False):
                     # Update the 'expected_output' in the modified_data structure
                     modified_data["challenges"][i]["expected_output"] = correct_expected_output_records
                     file_corrections += 1
+                    if db_sha256: # Known good once the file is saved (dropped below if saving fails)
+                        validated[challenge_key(filepath, i)] = challenge_content_hash(modified_data["challenges"][i], db_sha256)
             else:
                 print(f"    INFO: 'expected_output' for '{challenge_title}' matches query result.")
+                if content_hash:
+                    validated[challenge_key(filepath, i)] = content_hash
 
         except Exception as e:
             print(f"    ERROR: SQL query execution or DataFrame processing failed for '{challenge_title}': {e}")
@@ -169,52 +256,126 @@ def process_challenge_file(filepath, db_conn, auto_correct=False):
         except Exception as e:
             print(f"  ERROR: Could not write updated JSON to '{filepath}': {e}")
             file_errors += 1 # Failed to save correction
+            validated = {} # The file on disk may be the old one, or half written
 
     elif file_corrections == 0 and file_errors == 0:
         print("  INFO: No corrections needed and no errors found in this file.")
     elif file_errors > 0:
         print(f"  SUMMARY: Found {file_errors} issues in this file. Corrections made: {file_corrections} (if auto_correct was True).")
+    if skipped:
+        print(f"  INFO: Skipped {skipped} unchanged challenge(s) that validated previously.")
+
+    return file_errors, file_corrections, validated
+
+# --- Process pool mode: one read-only connection per worker process ---
+_worker_conn = None
 
+def _init_worker(db_path):
+    global _worker_conn
+    _worker_conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
 
-    return file_errors, file_corrections
+def _process_file_in_worker(filepath, auto_correct, db_sha256, known_hashes):
+    # Each file's log is captured and printed by the parent, so files don't interleave
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        result = process_challenge_file(filepath, _worker_conn, auto_correct, db_sha256, known_hashes)
+    return log.getvalue(), result
+
+def confirm_auto_correct():
+    # The original interactive flow, used when no mode flag is given
+    confirm = input("Do you want to enable AUTO-CORRECTION mode? This will modify JSON files. (yes/no): ").strip().lower()
+    if confirm != 'yes':
+        print("\nRunning in validation-only mode. No files will be modified.\n")
+        return False
+    return confirm_really()
+
+def confirm_really():
+    confirm_again = input("ARE YOU SURE you want to auto-correct files? Make sure you have backups! (yes/no): ").strip().lower()
+    if confirm_again == 'yes':
+        print("\n*** AUTO-CORRECTION ENABLED. Files will be modified. ***\n")
+        return True
+    print("\nAuto-correction cancelled by user.\n")
+    return False
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Check every challenge's expected_output against its expected_query.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--validate-only", action="store_true", help="Never modify files (no prompt)")
+    mode.add_argument("--auto-correct", action="store_true", help="Write query results back to mismatching challenges")
+    parser.add_argument("--yes", action="store_true", help="With --auto-correct: skip the confirmation prompt")
+    parser.add_argument("--incremental", action="store_true",
+                        help=f"Skip challenges unchanged since they last validated (manifest: {VALIDATION_MANIFEST_PATH})")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Validate day files in this many worker processes (0: one per CPU; default 1)")
+    parser.add_argument("--challenges-dir", default=CHALLENGES_DIR)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--manifest", default=VALIDATION_MANIFEST_PATH)
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
     # --- User Confirmation for Auto-Correction ---
-    auto_correct_mode = False
-    confirm = input("Do you want to enable AUTO-CORRECTION mode? This will modify JSON files. (yes/no): ").strip().lower()
-    if confirm == 'yes':
-        confirm_again = input("ARE YOU SURE you want to auto-correct files? Make sure you have backups! (yes/no): ").strip().lower()
-        if confirm_again == 'yes':
-            auto_correct_mode = True
+    if args.validate_only:
+        auto_correct_mode = False
+        print("\nRunning in validation-only mode. No files will be modified.\n")
+    elif args.auto_correct:
+        auto_correct_mode = True if args.yes else confirm_really()
+        if args.yes:
             print("\n*** AUTO-CORRECTION ENABLED. Files will be modified. ***\n")
-        else:
-            print("\nAuto-correction cancelled by user.\n")
+    elif not sys.stdin.isatty():
+        # Nobody to answer the prompt: the safe choice
+        auto_correct_mode = False
+        print("\nNo mode flag and no terminal: running in validation-only mode. No files will be modified.\n")
     else:
-        print("\nRunning in validation-only mode. No files will be modified.\n")
-
+        auto_correct_mode = confirm_auto_correct()
 
-    db_conn = None
-    try:
-        db_conn = sqlite3.connect(DB_PATH)
-        print(f"INFO: Connected to database at {DB_PATH}")
-    except Exception as e:
-        print(f"CRITICAL ERROR: Could not connect to database at {DB_PATH}: {e}")
+    if not os.path.exists(args.db):
+        print(f"CRITICAL ERROR: Could not connect to database at {args.db}: file not found")
         exit(1)
+    db_sha256 = file_sha256(args.db)
+    known_hashes = load_validation_manifest(args.manifest) if args.incremental else None
+
+    filepaths = [
+        os.path.join(args.challenges_dir, filename)
+        for filename in sorted(os.listdir(args.challenges_dir)) # Sort for consistent processing order
+        if filename.startswith("day") and filename.endswith(".json")
+    ]
+    jobs = args.jobs or os.cpu_count() or 1
+    results = []
+    if jobs > 1 and len(filepaths) > 1:
+        print(f"INFO: Validating {len(filepaths)} files in {min(jobs, len(filepaths))} worker processes")
+        with ProcessPoolExecutor(max_workers=min(jobs, len(filepaths)), initializer=_init_worker, initargs=(args.db,)) as pool:
+            futures = [pool.submit(_process_file_in_worker, filepath, auto_correct_mode, db_sha256, known_hashes)
+                       for filepath in filepaths]
+            for future in futures: # Printed in file order
+                log, result = future.result()
+                print(log, end="")
+                results.append(result)
+    else:
+        db_conn = None
+        try:
+            db_conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+            print(f"INFO: Connected to database at {args.db}")
+        except Exception as e:
+            print(f"CRITICAL ERROR: Could not connect to database at {args.db}: {e}")
+            exit(1)
+        for filepath in filepaths:
+            results.append(process_challenge_file(filepath, db_conn, auto_correct_mode, db_sha256, known_hashes))
+        db_conn.close()
 
-    total_files_processed = 0
+    total_files_processed = len(results)
     total_file_level_errors = 0 # Files that had at least one error (schema or output mismatch)
     total_output_corrections = 0
-
-    for filename in sorted(os.listdir(CHALLENGES_DIR)): # Sort for consistent processing order
-        if filename.startswith("day") and filename.endswith(".json"):
-            filepath = os.path.join(CHALLENGES_DIR, filename)
-            errors_in_file, corrections_in_file = process_challenge_file(filepath, db_conn, auto_correct_mode)
-            if errors_in_file > 0:
-                total_file_level_errors +=1
-            total_output_corrections += corrections_in_file
-            total_files_processed += 1
-    
-    db_conn.close()
+    challenge_hashes = {}
+    for errors_in_file, corrections_in_file, validated in results:
+        if errors_in_file > 0:
+            total_file_level_errors +=1
+        total_output_corrections += corrections_in_file
+        challenge_hashes.update(validated)
+    # Always written, so a full run seeds the manifest for later --incremental runs.
+    # Only known-good challenges are in it: anything that failed is checked again next time.
+    save_validation_manifest(challenge_hashes, args.manifest)
+    print(f"INFO: Recorded {len(challenge_hashes)} validated challenge(s) in {args.manifest}")
 
     print("\n--- SCRIPT SUMMARY ---")
     print(f"Total files processed: {total_files_processed}")